@@ -0,0 +1,55 @@
+"""
+Compares the CPU cost of turning an account document into an AccountInDB
+with full validation against the trusted to_account path, for a document
+from the database and for a cached JSON value.
+
+Run from the app directory:
+    python -m benchmarks.account_read_benchmark
+"""
+from core.helper.db_helper import to_account
+from core.model.account_model import AccountInDB
+import json
+import timeit
+
+
+ROUNDS = 20_000
+
+document = {
+    '_id': '7845941214687',
+    'email': 'johndoe@example.com',
+    'firstname': 'John',
+    'lastname': 'Doe',
+    'phone_number': '915 1234 789',
+    'country_code': '+234',
+    'country': 'Nigeria',
+    'username': 'johndoe',
+    'display_pics': None,
+    'hashed_password': '$2b$12$' + 'x' * 53,
+    'version': 1,
+    'disabled': False,
+    'email_verified': True,
+    'phone_verified': True,
+    'is_active': True,
+    'active_device_count': 3,
+    'active_devices': ['device-1', 'device-2', 'device-3'],
+    'role': {'name': 'user', 'permissions': ['read', 'write']},
+}
+cached = json.dumps(document)
+
+
+def report(name: str, seconds: float) -> None:
+    print(f"{name:<36} {seconds / ROUNDS * 1e6:8.2f} us/lookup")
+
+
+def main() -> None:
+    assert to_account(document) == AccountInDB(**document)
+
+    print(f"Account deserialization, {ROUNDS} rounds")
+    report('database, validated', timeit.timeit(lambda: AccountInDB(**document), number=ROUNDS))
+    report('database, trusted', timeit.timeit(lambda: to_account(document), number=ROUNDS))
+    report('cache json, validated', timeit.timeit(lambda: AccountInDB(**json.loads(cached)), number=ROUNDS))
+    report('cache json, trusted', timeit.timeit(lambda: to_account(json.loads(cached)), number=ROUNDS))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""
+Compares wire size and CPU cost per compression codec on record batches
+of AccountAvroOut and OTPAvroOut events, built the way the producer builds them.
+
+Run from the app directory:
+    python -m benchmarks.compression_benchmark
+"""
+from aiokafka.producer.producer import AIOKafkaProducer
+from aiokafka.record.default_records import DefaultRecordBatchBuilder
+from core.model.account_model import AccountAvroOut
+from core.model.otp_model import OTPAvroOut
+from core.utils.settings import settings
+import time
+import uuid
+
+
+ROUNDS = 200
+
+
+def account_event(i: int) -> bytes:
+    return AccountAvroOut(
+        password=f'stringst{i}',
+        confirm_password=f'stringst{i}',
+        email=f'johndoe{i}@example.com',
+        firstname='John',
+        lastname='Doe',
+        phone_number=f'915 1234 {i:04d}',
+        country_code='+234',
+        country='Nigeria',
+        username='ID used to retrieve the account username',
+        device={
+            'device_name': 'Samsong s23 ultra',
+            'platform': 'IOS',
+            'ip_address': '127.0.0.1',
+            'device_model': 'SM-S918B',
+            'device_id': str(uuid.uuid4()),
+            'screen_info': {'height': 1920, 'width': 720, 'resolution': 1200},
+            'device_serial_number': '124578963',
+            'is_active': True,
+        },
+        display_pics='https://example.com/',
+    ).serialize()
+
+
+def otp_event(i: int) -> bytes:
+    return OTPAvroOut(
+        purpose='forgot password',
+        firstname='John',
+        email=f'johndoe{i}@example.com',
+        phone_number=f'915 1234 {i:04d}',
+    ).serialize()
+
+
+def build_batch(codec: int, events: list[bytes]) -> bytes:
+    builder = DefaultRecordBatchBuilder(
+        magic=2, compression_type=codec, is_transactional=0,
+        producer_id=-1, producer_epoch=-1, base_sequence=-1,
+        batch_size=settings.api_event_max_batch_size)
+
+    timestamp = int(time.time() * 1000)
+    for offset, value in enumerate(events):
+        builder.append(offset, timestamp=timestamp, key=str(uuid.uuid4()).encode(), value=value, headers=[])
+    return bytes(builder.build())
+
+
+def report(name: str, events: list[bytes]) -> None:
+    raw_size = sum(len(event) for event in events)
+    print(f"\n{name}: {len(events)} events per batch, {raw_size} bytes of Avro")
+    print(f"{'codec':<8} {'batch bytes':>12} {'ratio':>7} {'us/batch':>10} {'us/event':>10}")
+
+    for codec_name in ('none', 'gzip', 'snappy', 'lz4', 'zstd'):
+        if codec_name == 'none':
+            codec = 0
+        else:
+            checker, codec = AIOKafkaProducer._COMPRESSORS[codec_name]
+            if not checker():
+                print(f"{codec_name:<8} library not installed")
+                continue
+
+        batch = build_batch(codec, events)
+        start = time.perf_counter()
+        for _ in range(ROUNDS):
+            build_batch(codec, events)
+        elapsed = (time.perf_counter() - start) / ROUNDS * 1e6
+
+        print(f"{codec_name:<8} {len(batch):>12} {len(batch) / raw_size:>7.2f} {elapsed:>10.1f} {elapsed / len(events):>10.2f}")
+
+
+def main() -> None:
+    for batch_events in (1, 50):
+        report('AccountAvroOut', [account_event(i) for i in range(batch_events)])
+        report('OTPAvroOut', [otp_event(i) for i in range(batch_events)])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+"""
+Measures how long the email filter takes to build and how often it
+answers "maybe" for emails that are not registered.
+
+Run from the app directory:
+    python -m benchmarks.email_filter_benchmark
+"""
+from core.helper.bloom_filter import BloomFilter
+from core.utils.settings import settings
+import time
+
+
+REGISTERED = 1_000_000
+PROBES = 200_000
+
+
+def main() -> None:
+    bloom = BloomFilter.for_capacity(capacity=settings.api_email_filter_capacity, error_rate=settings.api_email_filter_error_rate)
+
+    started_at = time.perf_counter()
+    for i in range(REGISTERED):
+        bloom.add(f"user{i}@example.com")
+    build_seconds = time.perf_counter() - started_at
+
+    started_at = time.perf_counter()
+    false_positives = sum(f"new{i}@example.com" in bloom for i in range(PROBES))
+    check_seconds = time.perf_counter() - started_at
+
+    print(f"{REGISTERED} emails, {bloom.size_bits} bits ({len(bloom.bits) / 1024 / 1024:.2f} MiB), {bloom.hash_count} hashes")
+    print(f"build: {build_seconds:.2f}s ({build_seconds / REGISTERED * 1e6:.2f} us/email, excludes the database scan)")
+    print(f"check: {check_seconds / PROBES * 1e6:.2f} us/email")
+    print(f"false positives: observed {false_positives / PROBES:.4%}, expected {bloom.false_positive_rate():.4%}")
+    print(f"database queries skipped for new emails: {1 - false_positives / PROBES:.2%}")
+
+
+if __name__ == '__main__':
+    main()
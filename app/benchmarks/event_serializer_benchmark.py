@@ -0,0 +1,62 @@
+"""
+Compares per-event CPU of AvroBaseModel.serialize() with the precompiled
+fastavro serializer registry.
+
+Run from the app directory:
+    python -m benchmarks.event_serializer_benchmark
+"""
+from core.event.event_serializer import serialize_event, load_event_serializers
+from core.model.account_model import AccountAvroOut, Disable_Enable_Account
+from core.model.otp_model import OTPAvroOut
+import timeit
+
+
+ROUNDS = 5_000
+
+account_data = {
+    'password': 'stringst',
+    'confirm_password': 'stringst',
+    'email': 'johndoe@example.com',
+    'firstname': 'John',
+    'lastname': 'Doe',
+    'phone_number': '915 1234 789',
+    'country_code': '+234',
+    'country': 'Nigeria',
+    'username': 'ID used to retrieve the account username',
+    'device': {
+        'device_name': 'Samsong s23 ultra',
+        'platform': 'IOS',
+        'ip_address': '127.0.0.1',
+        'device_model': 'string',
+        'device_id': 'string',
+        'screen_info': {'height': 1920, 'width': 720, 'resolution': 1200},
+        'device_serial_number': '124578963',
+        'is_active': True,
+    },
+    'display_pics': 'https://example.com/',
+}
+
+otp_data = {
+    'purpose': 'forgot password',
+    'firstname': 'John',
+    'email': 'johndoe@example.com',
+    'phone_number': '915 1234 789',
+}
+
+disable_data = {'id': '7845941214687', 'disabled': True}
+
+
+def main() -> None:
+    load_event_serializers()
+
+    print(f"{'event':<24} {'serialize() us':>15} {'registry us':>12} {'speedup':>8}")
+    for model, data in ((AccountAvroOut, account_data), (OTPAvroOut, otp_data), (Disable_Enable_Account, disable_data)):
+        assert model(**data).serialize() == serialize_event(model, data)
+
+        model_time = timeit.timeit(lambda: model(**data).serialize(), number=ROUNDS) / ROUNDS * 1e6
+        registry_time = timeit.timeit(lambda: serialize_event(model, data), number=ROUNDS) / ROUNDS * 1e6
+        print(f"{model.__name__:<24} {model_time:>15.1f} {registry_time:>12.1f} {model_time / registry_time:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
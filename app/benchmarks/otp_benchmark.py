@@ -0,0 +1,95 @@
+"""
+Compares OTP validations per second over redis:
+GET, Avro decode and expires_on check, the path before the consume script;
+consume_otp on a v1 key, which still decodes and checks expires_on;
+consume_otp on a v2 key written by store_otp, answered from the key TTL.
+
+Also reports the CPU cost of the decode alone, which the v2 path skips.
+The redis runs need redis reachable at api_redis_host_local.
+
+Run from the app directory:
+    python -m benchmarks.otp_benchmark
+"""
+from core.connection.cache_connection import redis
+from core.helper.otp_helper import OTP_KEY_V1, OTP_KEY_V2, consume_otp, otp_key, store_otp
+from core.utils.settings import settings
+from core.model.otp_model import OTPAvroIn
+from datetime import datetime, timedelta, timezone
+import asyncio
+import time
+import timeit
+
+
+ROUNDS = 20_000
+KEYS = 5_000
+
+otp_obj = OTPAvroIn(
+    purpose='email verification',
+    firstname='John',
+    email='johndoe@example.com',
+    phone_number='915 1234 789',
+    otp='123456',
+    created_on=datetime.now(timezone.utc),
+    expires_on=datetime.now(timezone.utc) + timedelta(minutes=10),
+)
+otp_bytes = otp_obj.serialize()
+
+def decode_check() -> bool:
+    return datetime.now(timezone.utc) < OTPAvroIn.deserialize(data=otp_bytes).expires_on
+
+
+def report(name: str, seconds: float, count: int) -> None:
+    print(f"{name:<36} {count / seconds:12,.0f} validations/s")
+
+
+async def legacy_validate(key: bytes) -> bool:
+    # GET, decode and compare expires_on, as before TTL-native keys
+    data = await redis.get(key)
+    return data is not None and datetime.now(timezone.utc) < OTPAvroIn.deserialize(data=data).expires_on
+
+
+async def timed(name: str, validate) -> None:
+    started_at = time.perf_counter()
+    for i in range(KEYS):
+        assert await validate(i)
+    report(name, time.perf_counter() - started_at, KEYS)
+
+
+async def end_to_end() -> None:
+    try:
+        await asyncio.wait_for(redis.ping(), timeout=1)
+    except Exception:
+        print('\nredis not reachable, skipping end-to-end run')
+        return
+
+    # v2 keys need a secret, store_otp writes the configured version
+    settings.api_otp_key_secret = 'benchmark-secret'
+    settings.api_otp_key_version = OTP_KEY_V2
+
+    def v1_key(i: int, purpose: str) -> bytes:
+        return otp_key(otp=str(i), email_or_phone_number='johndoe@example.com', purpose=purpose, version=OTP_KEY_V1).encode()
+
+    print(f"\nEnd-to-end over redis, {KEYS} keys")
+    for i in range(KEYS):
+        await redis.set(v1_key(i, 'legacy'), otp_bytes)
+        await redis.set(v1_key(i, 'v1'), otp_bytes)
+        await store_otp(otp_obj=otp_obj, otp=str(i), email_or_phone_number='johndoe@example.com', purpose='v2')
+
+    await timed('GET + decode', lambda i: legacy_validate(v1_key(i, 'legacy')))
+    await timed('consume_otp, v1 key', lambda i: consume_otp(otp=str(i), email_or_phone_number='johndoe@example.com', purpose='v1'))
+    await timed('consume_otp, v2 key', lambda i: consume_otp(otp=str(i), email_or_phone_number='johndoe@example.com', purpose='v2'))
+
+    for i in range(KEYS):
+        await redis.delete(v1_key(i, 'legacy'))
+    await redis.aclose()
+
+
+def main() -> None:
+    print(f"CPU per validation, {ROUNDS} rounds")
+    report('decode expires_on', timeit.timeit(decode_check, number=ROUNDS), ROUNDS)
+
+    asyncio.run(end_to_end())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Compares OTP key schemes: version 1 (SHA3-512 hex) and version 2 (keyed
+BLAKE2b, url safe base64). Reports key build time and the memory 1M keys
+take in redis.
+
+Memory is measured on a live redis when --redis is given (it writes and
+deletes 1M keys per scheme, use a scratch instance), otherwise it is
+estimated from key sizes and jemalloc size classes.
+
+Run from the app directory:
+    python -m benchmarks.otp_key_benchmark [--redis]
+"""
+from core.connection.cache_connection import redis
+from core.helper.otp_helper import OTP_KEY_V1, OTP_KEY_V2, otp_key
+from core.utils.settings import settings
+import asyncio
+import bisect
+import sys
+import timeit
+
+
+ROUNDS = 100_000
+KEYS = 1_000_000
+BATCH = 10_000
+
+# jemalloc small size classes
+SIZE_CLASSES = [8, 16, 32, 48, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384, 448, 512]
+
+# Main dict entry and key object overhead per key, value excluded
+ENTRY_BYTES = 24 + 16
+
+
+def allocation(size: int) -> int:
+    return SIZE_CLASSES[bisect.bisect_left(SIZE_CLASSES, size)]
+
+
+def key_for(i: int, version: int) -> str:
+    return otp_key(otp=f"{i % 1_000_000:06d}", email_or_phone_number=f"user{i}@example.com", purpose='email verification', version=version)
+
+
+def estimated_bytes(key: str) -> int:
+    # sds8 header (3 bytes) and terminator around the key
+    return ENTRY_BYTES + allocation(len(key) + 4)
+
+
+async def measured_bytes(version: int) -> int:
+    before = (await redis.info('memory'))['used_memory']
+    for start in range(0, KEYS, BATCH):
+        async with redis.pipeline(transaction=False) as pipe:
+            for i in range(start, start + BATCH):
+                pipe.set(key_for(i, version).encode(), b'1', px=600_000)
+            await pipe.execute()
+    after = (await redis.info('memory'))['used_memory']
+
+    for start in range(0, KEYS, BATCH):
+        await redis.delete(*(key_for(i, version).encode() for i in range(start, start + BATCH)))
+    return after - before
+
+
+def main() -> None:
+    # A secret is needed for version 2 keys
+    settings.api_otp_key_secret = settings.api_otp_key_secret or 'benchmark-secret'
+
+    print(f"Key build time, {ROUNDS} rounds")
+    for version in (OTP_KEY_V1, OTP_KEY_V2):
+        seconds = timeit.timeit(lambda: key_for(123, version), number=ROUNDS)
+        print(f"v{version}: {seconds / ROUNDS * 1e6:6.2f} us/key, {len(key_for(123, version)):3d} bytes, e.g. {key_for(123, version)[:48]}")
+
+    print(f"\nRedis memory for {KEYS:,} keys (keys only)")
+    for version in (OTP_KEY_V1, OTP_KEY_V2):
+        if '--redis' in sys.argv:
+            total = asyncio.run(measured_bytes(version))
+            label = 'measured'
+        else:
+            total = KEYS * estimated_bytes(key_for(123, version))
+            label = 'estimated'
+        print(f"v{version}: {total / 1024 / 1024:8.1f} MiB {label}")
+
+
+if __name__ == '__main__':
+    main()
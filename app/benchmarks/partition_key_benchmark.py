@@ -0,0 +1,62 @@
+"""
+Shows how events spread across the partitions create_topic provisions.
+
+Run from the app directory:
+    python -m benchmarks.partition_key_benchmark
+"""
+from aiokafka.partitioner import DefaultPartitioner
+from core.event.partition_key import ConsistentHashPartitioner
+from core.utils.settings import settings
+import random
+import statistics
+import uuid
+
+
+EVENTS = 100_000
+ACCOUNTS = 20_000
+
+
+def spread(keys: list[str], partitioner, partitions: int) -> list[int]:
+    all_partitions = list(range(partitions))
+    counts = [0] * partitions
+    for key in keys:
+        counts[partitioner(key.encode(), all_partitions, all_partitions)] += 1
+    return counts
+
+
+def report(name: str, counts: list[int]) -> None:
+    mean = statistics.mean(counts)
+    skew = max(counts) / mean
+    print(f"{name:<32} max/mean={skew:5.2f} stdev={statistics.pstdev(counts):9.1f} {counts}")
+
+
+def moved(keys: list[str], partitioner, before: int, after: int) -> float:
+    old = [partitioner(key.encode(), list(range(before)), list(range(before))) for key in keys]
+    new = [partitioner(key.encode(), list(range(after)), list(range(after))) for key in keys]
+    return sum(1 for a, b in zip(old, new) if a != b) / len(keys)
+
+
+def main() -> None:
+    partitions = settings.api_topic_partitions
+    accounts = [str(uuid.uuid4()) for _ in range(ACCOUNTS)]
+    account_keys = [random.choice(accounts) for _ in range(EVENTS)]
+
+    # Old behaviour, one key evaluated at import for every event
+    import_time_key = str(uuid.uuid4())
+    old_keys = [import_time_key] * EVENTS
+
+    murmur2 = DefaultPartitioner()
+    consistent = ConsistentHashPartitioner()
+
+    print(f"{EVENTS} events from {ACCOUNTS} accounts over {partitions} partitions")
+    report('import-time uuid key', spread(old_keys, murmur2, partitions))
+    report('account key, murmur2', spread(account_keys, murmur2, partitions))
+    report('account key, consistent hash', spread(account_keys, consistent, partitions))
+
+    print(f"\nKeys moved when growing {partitions} -> {partitions + 2} partitions")
+    print(f"{'murmur2':<32} {moved(accounts, murmur2, partitions, partitions + 2):6.1%}")
+    print(f"{'consistent hash':<32} {moved(accounts, consistent, partitions, partitions + 2):6.1%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,98 @@
 # from aredis_om import get_redis_connection
 from core.utils.settings import settings
+from core.utils.init_log import logger
 from  redis import asyncio as aioredis
+import asyncio
+import time
 
 
-redis = aioredis.from_url(
-    url=settings.api_redis_host_local,    
-    )
\ No newline at end of file
+class MeteredConnectionPool(aioredis.BlockingConnectionPool):
+    """
+    Bounded connection pool that records how it is used.
+    Requests wait for a free connection instead of opening new ones past max_connections.
+    Unlike BlockingConnectionPool, a failed connect gives its slot back to the pool.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.peak_in_use = 0
+        self.wait_seconds = 0.0
+
+    async def get_connection(self, command_name, *keys, **options):
+        started_at = time.perf_counter()
+        try:
+            # Wait for a free slot
+            async with asyncio.timeout(self.timeout):
+                async with self._condition:
+                    await self._condition.wait_for(self.can_get_connection)
+                    connection = self._checkout()
+        except asyncio.TimeoutError as err:
+            self.timeouts += 1
+            raise aioredis.ConnectionError("No connection available.") from err
+        finally:
+            self.wait_seconds += time.perf_counter() - started_at
+
+        # Connect outside the condition, releasing a failed connection needs it
+        try:
+            await self.ensure_connection(connection)
+        except BaseException:
+            await self.release(connection)
+            raise
+
+        self.checkouts += 1
+        self.peak_in_use = max(self.peak_in_use, len(self._in_use_connections))
+        return connection
+
+    def _checkout(self):
+        try:
+            connection = self._available_connections.pop()
+        except IndexError:
+            connection = self.make_connection()
+        self._in_use_connections.add(connection)
+        return connection
+
+    def metrics(self) -> dict:
+        return {
+            'max_connections': self.max_connections,
+            'in_use': len(self._in_use_connections),
+            'idle': len(self._available_connections),
+            'peak_in_use': self.peak_in_use,
+            'checkouts': self.checkouts,
+            'timeouts': self.timeouts,
+            'wait_seconds': self.wait_seconds,
+        }
+
+
+# Connections are opened lazily, the pool is shared by every helper for the process
+pool = MeteredConnectionPool.from_url(
+    url=settings.api_redis_host_local,
+    max_connections=settings.api_redis_max_connections,
+    timeout=settings.api_redis_pool_timeout,
+    health_check_interval=settings.api_redis_health_check_interval,
+    socket_timeout=settings.api_redis_socket_timeout,
+    socket_connect_timeout=settings.api_redis_socket_connect_timeout,
+    )
+
+redis = aioredis.Redis(connection_pool=pool)
+
+
+async def start_cache() -> None:
+    try:
+        # Open the first connection before serving requests
+        logger.info('Connecting to redis.')
+        await redis.ping()
+    except Exception as err:
+        # Connections are retried on use
+        logger.error(f"Failed to connect to redis due to error: {str(err)}")
+
+
+async def stop_cache() -> None:
+    logger.info(f"Closing redis connection pool: {pool.metrics()}")
+    await redis.aclose()
+    await pool.disconnect()
+
+
+def cache_pool_metrics() -> dict:
+    return pool.metrics()
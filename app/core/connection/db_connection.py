@@ -1,14 +1,72 @@
 import motor.motor_asyncio
+from pymongo.read_preferences import make_read_preference, read_pref_mode_from_name
 from core.utils.settings import settings
+from core.utils.init_log import logger
 
 
-# Initialize database
-client = motor.motor_asyncio.AsyncIOMotorClient(settings.api_db_url)
+# Shared database client, created in the app lifespan
+client: motor.motor_asyncio.AsyncIOMotorClient | None = None
 
-# Create database
-account_db = client.account_db
+# Accounts collection on the primary and for reads that may be served by a secondary
+account_col: motor.motor_asyncio.AsyncIOMotorCollection | None = None
+account_read_col: motor.motor_asyncio.AsyncIOMotorCollection | None = None
 
-# Create accounts collection
-account_col = account_db.accounts
 
+def create_db_client() -> motor.motor_asyncio.AsyncIOMotorClient:
+    return motor.motor_asyncio.AsyncIOMotorClient(
+        settings.api_db_url,
+        maxPoolSize=settings.api_db_max_pool_size,
+        minPoolSize=settings.api_db_min_pool_size,
+        waitQueueTimeoutMS=settings.api_db_wait_queue_timeout_ms,
+        serverSelectionTimeoutMS=settings.api_db_server_selection_timeout_ms,
+        connectTimeoutMS=settings.api_db_connect_timeout_ms,
+    )
 
+
+def get_db_client() -> motor.motor_asyncio.AsyncIOMotorClient:
+    global client, account_col, account_read_col
+
+    # Client used outside the app lifespan
+    if client is None:
+        client = create_db_client()
+
+        # Create accounts collection
+        account_col = client.account_db.accounts
+        account_read_col = account_col.with_options(
+            read_preference=make_read_preference(read_pref_mode_from_name(settings.api_db_read_preference), None)
+        )
+    return client
+
+
+def get_account_col() -> motor.motor_asyncio.AsyncIOMotorCollection:
+    # Writes and reads that must see the latest data
+    get_db_client()
+    return account_col
+
+
+def get_account_read_col() -> motor.motor_asyncio.AsyncIOMotorCollection:
+    # Existence and validation reads, routed by api_db_read_preference
+    get_db_client()
+    return account_read_col
+
+
+async def start_db() -> None:
+    logger.info('Connecting to database.')
+    try:
+        # Open the connection pool before the first request needs it
+        await get_db_client().admin.command('ping')
+    except Exception as err:
+        logger.error(f"Failed to connect to database due to error: {str(err)}")
+
+
+async def stop_db() -> None:
+    global client, account_col, account_read_col
+
+    if client is None:
+        return
+
+    logger.info('Closing database connection.')
+    client.close()
+    client = None
+    account_col = None
+    account_read_col = None
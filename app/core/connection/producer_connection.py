@@ -0,0 +1,170 @@
+from aiokafka import AIOKafkaProducer
+from core.utils.settings import settings
+from core.utils.init_log import logger
+from core.event.partition_key import get_partitioner
+from contextlib import asynccontextmanager
+import asyncio
+import socket
+
+
+# Shared producers keyed by compression type, created in the app lifespan.
+# Compression is a producer setting in Kafka, so each codec in use gets one producer.
+producers: dict[str | None, AIOKafkaProducer] = {}
+
+# Guards lazy start when the lifespan hook did not run (scripts, tests)
+_producer_lock = asyncio.Lock()
+
+# Transactional producers, a producer runs one transaction at a time.
+# An empty slot (None) is filled with a fresh producer on checkout.
+transactional_producers: asyncio.Queue | None = None
+
+
+def compression_for(topic: str | None) -> str | None:
+    compression_type = settings.api_event_topic_compression.get(topic, settings.api_event_compression_type)
+
+    # 'none' in Settings disables compression for a topic
+    if not compression_type or compression_type == 'none':
+        return None
+    return compression_type
+
+
+def compression_types() -> set[str | None]:
+    # Every codec the configured topics need
+    return {compression_for(None)} | {compression_for(topic) for topic in settings.api_event_topic_compression}
+
+
+def create_producer(compression_type: str | None = None, transactional_id: str | None = None) -> AIOKafkaProducer:
+    return AIOKafkaProducer(
+        client_id=settings.api_event_streaming_client_id,
+        bootstrap_servers=settings.api_event_streaming_host,
+        partitioner=get_partitioner(),
+        compression_type=compression_type,
+        # Sends from concurrent requests share a batch per partition,
+        # flushed once it is full or has waited linger_ms
+        linger_ms=settings.api_event_linger_ms,
+        max_batch_size=settings.api_event_max_batch_size,
+        # Fail fast so undeliverable events reach the spool quickly
+        request_timeout_ms=settings.api_event_request_timeout_ms,
+        # Broker drops retried duplicates
+        enable_idempotence=settings.api_event_enable_idempotence,
+        transactional_id=transactional_id,
+        transaction_timeout_ms=settings.api_event_transaction_timeout_ms,
+    )
+
+
+async def _start_producer(compression_type: str | None) -> AIOKafkaProducer:
+    if compression_type in producers:
+        return producers[compression_type]
+
+    # Start the producer and get brokers metadata once per process
+    logger.info(f'Starting kafka producer with compression:{compression_type}.')
+    new_producer = create_producer(compression_type=compression_type)
+    try:
+        await new_producer.start()
+    except Exception:
+        await new_producer.stop()
+        raise
+
+    producers[compression_type] = new_producer
+    return new_producer
+
+
+async def start_producer() -> None:
+    async with _producer_lock:
+        for compression_type in compression_types():
+            try:
+                await _start_producer(compression_type=compression_type)
+            except Exception as err:
+                # Events are spooled until the broker is reachable
+                logger.error(f"Failed to start Kafka producer due to error: {str(err)}")
+
+
+async def get_producer(topic: str | None = None) -> AIOKafkaProducer:
+    compression_type = compression_for(topic)
+
+    producer = producers.get(compression_type)
+    if producer is not None:
+        return producer
+
+    async with _producer_lock:
+        return await _start_producer(compression_type=compression_type)
+
+
+async def stop_producer() -> None:
+    async with _producer_lock:
+        while producers:
+            compression_type, producer = producers.popitem()
+            try:
+                # Deliver pending batches before closing
+                logger.info(f'Flushing kafka producer with compression:{compression_type}.')
+                await producer.flush()
+            finally:
+                logger.info('Closing Kafka producer.')
+                await producer.stop()
+
+
+def transactional_id_for(slot: int) -> str:
+    # Stable per pod and slot so the broker fences zombie transactions
+    prefix = settings.api_event_transactional_id or f"{settings.api_event_streaming_client_id}-{socket.gethostname()}"
+    return f"{prefix}-{slot}"
+
+
+def _get_transactional_producers() -> asyncio.Queue:
+    global transactional_producers
+
+    if transactional_producers is None:
+        transactional_producers = asyncio.Queue()
+        for slot in range(settings.api_event_transactional_producers):
+            transactional_producers.put_nowait((slot, None))
+
+    return transactional_producers
+
+
+@asynccontextmanager
+async def transactional_producer():
+    """
+    This is used to check out a transactional producer for one transaction.
+    A producer that fails or is cancelled in a transaction is closed and replaced on next checkout.
+    """
+
+    pool = _get_transactional_producers()
+    slot, producer = await pool.get()
+
+    try:
+        if producer is None:
+            logger.info(f'Starting transactional kafka producer:{slot}.')
+            producer = create_producer(compression_type=compression_for(None), transactional_id=transactional_id_for(slot))
+            try:
+                await producer.start()
+            except BaseException:
+                failed, producer = producer, None
+                await failed.stop()
+                raise
+
+        yield producer
+
+    except BaseException:
+        # Failed or cancelled, the transaction may still be open so the producer is not reused.
+        # The slot is emptied before stopping in case the stop is cancelled too
+        if producer is not None:
+            failed, producer = producer, None
+            await failed.stop()
+        raise
+
+    finally:
+        pool.put_nowait((slot, producer))
+
+
+async def stop_transactional_producers() -> None:
+    global transactional_producers
+
+    if transactional_producers is None:
+        return
+
+    while not transactional_producers.empty():
+        _, producer = transactional_producers.get_nowait()
+        if producer is not None:
+            logger.info('Closing transactional Kafka producer.')
+            await producer.stop()
+
+    transactional_producers = None
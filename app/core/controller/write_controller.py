@@ -3,6 +3,8 @@ from fastapi import HTTPException, status
 from fastapi.responses import JSONResponse
 from core.helper.password_helper import verify_password
 from core.event.produce_event import *
+from core.event.partition_key import event_key
+from core.event.event_serializer import encode_event
 from core.helper.account_helper import *
 from core.model.update_request_model import *
 
@@ -11,10 +13,14 @@ from core.model.otp_model import *
 from core.model.revoke_token import *
 from core.model.invalidate_cache_model import *
 from core.utils.init_log import logger
-from core.helper.otp_helper import is_valid_otp
+from core.helper.otp_helper import is_valid_otp, get_valid_otp, consume_read_otp
 from core.helper.encryption_helper import encrypt
 from core.helper.db_helper import *
 from core.helper.get_account_helper import get_account
+from core.helper.cache_helper import invalidate_account
+from core.helper.negative_cache_helper import forget_missing
+from core.helper.email_filter_helper import add_registered_email
+from core.helper.email_reservation_helper import reserve_email, release_email
 
 
 async def create_new_account_controller(new_account: CreateAccount) -> None:
@@ -26,31 +32,52 @@ async def create_new_account_controller(new_account: CreateAccount) -> None:
             detail='Password must be an alphanumeric string.'
         )
     
-    # Check if account exists
-    logging.info('Validating email address')
-    account_found = await account_exists(key='email', value=new_account.email)
-    if account_found:
-        logging.warning('Account registration failed because email already exist')
+    # Reserve the email, concurrent sign-ups with the same email stop here
+    logging.info('Reserving email address')
+    reservation = await reserve_email(email=new_account.email)
+    if reservation is None:
+        logging.warning('Account registration failed because email is already being registered')
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail=f"Account with email:{new_account.email} already exists"
         )
-    
-    # Convert to dict
-    account_dict = new_account.model_dump()
-    
-    # Convert Uri to str
-    account_dict.update({'display_pics': str(new_account.display_pics)})
-    
-    # Create new account obj
-    account_obj = AccountAvroOut(**account_dict)
 
-    # Serialize
-    new_account_event = account_obj.serialize()
+    try:
+        # Check if account exists
+        logging.info('Validating email address')
+        account_found = await account_exists(key='email', value=new_account.email)
+        if account_found:
+            logging.warning('Account registration failed because email already exist')
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"Account with email:{new_account.email} already exists"
+            )
+        
+        # Convert to dict
+        account_dict = new_account.model_dump()
+        
+        # Convert Uri to str
+        account_dict.update({'display_pics': str(new_account.display_pics)})
+        
+        # Serialize
+        new_account_event = await encode_event(settings.api_create_account_topic, AccountAvroOut, account_dict)
+
+        # Emit event
+        logging.info('Emitting create account event...')
+        await produce_event(
+            topic=settings.api_create_account_topic,
+            value=new_account_event,
+            key=event_key(topic=settings.api_create_account_topic, email=new_account.email)
+        )
+    except BaseException:
+        # Nothing was emitted, free the email for a retry
+        await release_email(email=new_account.email, token=reservation)
+        raise
 
-    # Emit event
-    logging.info('Emitting create account event...')
-    await produce_event(topic=settings.api_create_account_topic, value=new_account_event)
+    # The email and phone number are no longer missing
+    await forget_missing(field='email', value=new_account.email)
+    await forget_missing(field='phone_number', value=new_account.phone_number)
+    await add_registered_email(email=new_account.email)
     
     return JSONResponse(
         status_code=status.HTTP_200_OK,
@@ -60,27 +87,28 @@ async def create_new_account_controller(new_account: CreateAccount) -> None:
 
 async def forgot_password_ctrl(email: EmailStr):
     # Check if account exists
-    account_found = await get_account_by_email(email=email)
+    account_found = await get_account_contact(field='email', value=email)
     if not account_found:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Account with email:{email} does not exist"
         )
     
-    # Create otp obj
-    otp_obj = OTPAvroOut(
-        purpose=OTP_Purpose.forgot_password.value.lower(),
-        firstname=account_found.firstname,
-        email=email,
-        phone_number=account_found.phone_number
-    )
-
-    # Serialize
-    otp_event = otp_obj.serialize()
+    # Serialize otp event
+    otp_event = await encode_event(settings.api_otp_topic, OTPAvroOut, {
+        'purpose': OTP_Purpose.forgot_password.value.lower(),
+        'firstname': account_found.firstname,
+        'email': email,
+        'phone_number': account_found.phone_number
+    })
 
     # Emit event
     logger.info('Emitting otp event.')
-    await produce_event(topic=settings.api_otp_topic, value=otp_event)
+    await produce_event(
+        topic=settings.api_otp_topic,
+        value=otp_event,
+        key=event_key(topic=settings.api_otp_topic, email=email)
+    )
     
     return JSONResponse(
         status_code=status.HTTP_200_OK,
@@ -94,7 +122,7 @@ async def reset_password_ctrl(current_password, current_account: VerifyTokenResp
 
     # Check if current passoword is valid
     logger.info('Verifying password.')
-    valid_password = verify_password(hashed_password=account_data.get('hashed_password'), plain_password=current_password.current_password)
+    valid_password = verify_password(hashed_password=account_data.hashed_password, plain_password=current_password.current_password)
     if not valid_password:
         logger.warning('Password verification failed.')
         raise HTTPException(
@@ -102,20 +130,21 @@ async def reset_password_ctrl(current_password, current_account: VerifyTokenResp
             detail="Invalid password"
         )
     
-    # Create otp obj
-    otp_obj = OTPAvroOut(
-        purpose=OTP_Purpose.reset_password.value.lower(),
-        firstname=account_data.get('firstname'),
-        email=account_data.get('email'),
-        phone_number=account_data.get('phone_number')
-    )
-
-    # Serialize
-    otp_event = otp_obj.serialize()
+    # Serialize otp event
+    otp_event = await encode_event(settings.api_otp_topic, OTPAvroOut, {
+        'purpose': OTP_Purpose.reset_password.value.lower(),
+        'firstname': account_data.firstname,
+        'email': account_data.email,
+        'phone_number': account_data.phone_number
+    })
 
     # Emit event
     logger.info('Emitting otp event.')
-    await produce_event(topic=settings.api_otp_topic, value=otp_event)
+    await produce_event(
+        topic=settings.api_otp_topic,
+        value=otp_event,
+        key=event_key(topic=settings.api_otp_topic, account_id=current_account.id, email=current_account.email)
+    )
     
     return JSONResponse(
         status_code=status.HTTP_200_OK,
@@ -134,18 +163,19 @@ async def update_password_ctrl(update: UpdatePasswordIn) -> None:
             detail='Invalid auth token'
         )
     
-    # Create new password update obj
-    password_obj = UpdatePasswordOut(
-        email=update.email,
-        password=update.password,
-    )
-
-    # Serialize
-    password_update_event = password_obj.serialize()
+    # Serialize new password update
+    password_update_event = await encode_event(settings.api_update_password_topic, UpdatePasswordOut, {
+        'email': update.email,
+        'password': update.password,
+    })
     
     # Produce password update event
     logger.info('Emitting account password event.')
-    await produce_event(topic=settings.api_update_password_topic, value=password_update_event)
+    await produce_event(
+        topic=settings.api_update_password_topic,
+        value=password_update_event,
+        key=event_key(topic=settings.api_update_password_topic, email=update.email)
+    )
 
     return JSONResponse(
         status_code=status.HTTP_200_OK,
@@ -172,15 +202,19 @@ async def delete_account_ctrl(id: str, current_account: VerifyTokenResponse) ->
             detail="Invalid account id."
         )
     
-    # Create objs
-    delete_obj = AccountID(id=id)
-
     # Serialize
-    delete_event = delete_obj.serialize()
+    delete_event = await encode_event(settings.api_delete_account_topic, AccountID, {'id': id})
 
     # produce delete account event
     logger.info(f'Emitting delete account:{id} event.')
-    await produce_event(topic=settings.api_delete_account_topic, value=delete_event)
+    await produce_event(
+        topic=settings.api_delete_account_topic,
+        value=delete_event,
+        key=event_key(topic=settings.api_delete_account_topic, account_id=id)
+    )
+
+    # Drop the cached copies of the changed account
+    await invalidate_account(id=id)
 
     return JSONResponse(
         status_code=status.HTTP_200_OK,
@@ -210,7 +244,7 @@ async def disable_account_ctrl(account_id: str, current_account):
     
     # Check if account is already disabled
     logger.info('Checking if account is already diabled.')
-    if account_data.get('disabled'):
+    if account_data.disabled:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Account already disabled"
@@ -218,14 +252,19 @@ async def disable_account_ctrl(account_id: str, current_account):
     
     # Disable account
     logger.info(f'Disabling account: {account_id}')
-    disable_account_obj = Disable_Enable_Account(
-        id=account_id, 
-        disabled=True
+    disable_account_event = await encode_event(settings.api_disable_enable_account_topic, Disable_Enable_Account, {
+        'id': account_id, 
+        'disabled': True
+    })
+
+    await produce_event(
+        topic=settings.api_disable_enable_account_topic,
+        value=disable_account_event,
+        key=event_key(topic=settings.api_disable_enable_account_topic, account_id=account_id)
     )
 
-    # Serialize
-    disable_account_event = disable_account_obj.serialize()
-    await produce_event(topic=settings.api_disable_enable_account_topic, value=disable_account_event)
+    # Drop the cached copies of the changed account
+    await invalidate_account(id=account_id)
   
     return JSONResponse(
         status_code=status.HTTP_200_OK,
@@ -254,7 +293,7 @@ async def enable_account_ctrl(account_id: str, current_account):
     
     # Check if account is already enabled
     logger.info('Checking if account is already enabled.')
-    if not account_data.get('disabled'):
+    if not account_data.disabled:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Account already enabled"
@@ -262,14 +301,19 @@ async def enable_account_ctrl(account_id: str, current_account):
     
      # Enable account
     logger.info(f'Enabling account: {account_id}')
-    enable_account_obj = Disable_Enable_Account(
-        id=account_id,
-        disabled=False
+    enable_account_event = await encode_event(settings.api_disable_enable_account_topic, Disable_Enable_Account, {
+        'id': account_id,
+        'disabled': False
+    })
+
+    await produce_event(
+        topic=settings.api_disable_enable_account_topic,
+        value=enable_account_event,
+        key=event_key(topic=settings.api_disable_enable_account_topic, account_id=account_id)
     )
 
-    # Serialize
-    enable_account_event = enable_account_obj.serialize()
-    await produce_event(topic=settings.api_disable_enable_account_topic, value=enable_account_event)
+    # Drop the cached copies of the changed account
+    await invalidate_account(id=account_id)
   
     return JSONResponse(
         status_code=status.HTTP_200_OK,
@@ -280,7 +324,7 @@ async def enable_account_ctrl(account_id: str, current_account):
 async def verify_account_email_ctrl(data: VerifyAccountEmail):
     # Validate email
     logger.info('Validating email.')
-    valid_email = await get_account_by_email(email=data.email)
+    valid_email = await has_account(field='email', value=data.email)
     if not valid_email:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -303,15 +347,16 @@ async def verify_account_email_ctrl(data: VerifyAccountEmail):
     # Encrypt OTP
     encrypted_otp = encrypt(value=data.otp)
 
-    # Create an account update obj
-    account_update_obj = AccountEmailUpdate(email=data.email, otp=encrypted_otp, purpose=OTP_Purpose.email_verification)
-
-    # Serialize
-    account_update_event = account_update_obj.serialize()
+    # Serialize account update
+    account_update_event = await encode_event(settings.api_email_verified_topic, AccountEmailUpdate, {'email': data.email, 'otp': encrypted_otp, 'purpose': OTP_Purpose.email_verification.value})
 
     # Emit event
     logger.info(f'Emitting email verification event.')
-    await produce_event(topic=settings.api_email_verified_topic, value=account_update_event)
+    await produce_event(
+        topic=settings.api_email_verified_topic,
+        value=account_update_event,
+        key=event_key(topic=settings.api_email_verified_topic, email=data.email)
+    )
 
     return JSONResponse(
         status_code=status.HTTP_200_OK,
@@ -322,7 +367,7 @@ async def verify_account_email_ctrl(data: VerifyAccountEmail):
 async def verify_account_phone_ctrl(data: VerifyAccountPhoneNumber):
     # Validate phone number
     logger.info('Validating phone number.')
-    valid_phone_number = await get_account_by_phone_number(phone_number=data.phone_number)
+    valid_phone_number = await get_account_contact(field='phone_number', value=data.phone_number)
     if not valid_phone_number:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -331,7 +376,7 @@ async def verify_account_phone_ctrl(data: VerifyAccountPhoneNumber):
     
     logger.info('Validating OTP')
     # Validating OTP
-    valid_otp = is_valid_otp(otp=data.otp, email_or_phone_number=data.phone_number, purpose=OTP_Purpose.phone_verification.value)
+    valid_otp = await is_valid_otp(otp=data.otp, email_or_phone_number=data.phone_number, purpose=OTP_Purpose.phone_verification.value)
     
     # Check if otp is valid
     if not valid_otp:
@@ -345,15 +390,16 @@ async def verify_account_phone_ctrl(data: VerifyAccountPhoneNumber):
     # Encrypt OTP
     encrypted_otp = encrypt(value=data.otp)
     
-    # Create an account update obj
-    account_update_obj = AccountPhoneUpdate(email=valid_phone_number.get('email'), otp=encrypted_otp, purpose=OTP_Purpose.phone_verification.value, phone_number=data.phone_number)
-
-    # Serialize
-    account_update_event = account_update_obj.serialize()
+    # Serialize account update
+    account_update_event = await encode_event(settings.api_phone_number_verified_topic, AccountPhoneUpdate, {'email': valid_phone_number.email, 'otp': encrypted_otp, 'purpose': OTP_Purpose.phone_verification.value, 'phone_number': data.phone_number})
 
     # Emit event
     logger.info(f'Emitting phone number verification event.')
-    await produce_event(topic=settings.api_phone_number_verified_topic, value=account_update_event)
+    await produce_event(
+        topic=settings.api_phone_number_verified_topic,
+        value=account_update_event,
+        key=event_key(topic=settings.api_phone_number_verified_topic, email=valid_phone_number.email)
+    )
 
     return JSONResponse(
         status_code=status.HTTP_200_OK,
@@ -368,14 +414,22 @@ async def update_account_ctrl(current_account, updates: AccountUpdate) -> None:
     # Add id to update dict
     update_dict.update({'id': current_account.id})
 
-    # create update out obj
-    update_out_obj = AccountUpdateOut(**update_dict)
+    # Convert Uri to str
+    if updates.display_pics is not None:
+        update_dict.update({'display_pics': str(updates.display_pics)})
 
     # Serialize
-    update_request_event = update_out_obj.serialize()
+    update_request_event = await encode_event(settings.api_account_update_request, AccountUpdateOut, update_dict)
 
     # Emit update request event
-    await produce_event(topic=settings.api_account_update_request, value=update_request_event)
+    await produce_event(
+        topic=settings.api_account_update_request,
+        value=update_request_event,
+        key=event_key(topic=settings.api_account_update_request, account_id=current_account.id)
+    )
+
+    # Drop the cached copies of the changed account
+    await invalidate_account(id=current_account.id)
 
     return JSONResponse(
         status_code=status.HTTP_200_OK,
@@ -384,20 +438,21 @@ async def update_account_ctrl(current_account, updates: AccountUpdate) -> None:
 
 
 async def reset_phone_number_ctrl(current_account, phone_number: str):
-    # Create reset phone number obj
-    reset_phone_number = UpdatePhoneNumberOut(
-        id=current_account.id,
-        new_phone_number=phone_number,
-        email=current_account.email,
-        firstname=current_account.firstname
-    )
-
-    # Serialize
-    reset_phone_number_event = reset_phone_number.serialize()
+    # Serialize reset phone number
+    reset_phone_number_event = await encode_event(settings.api_reset_phone_number, UpdatePhoneNumberOut, {
+        'id': current_account.id,
+        'new_phone_number': phone_number,
+        'email': current_account.email,
+        'firstname': current_account.firstname
+    })
 
     # Emit reset event
     logger.info('Emitting phone number update event.')
-    await produce_event(topic=settings.api_reset_phone_number, value=reset_phone_number_event)
+    await produce_event(
+        topic=settings.api_reset_phone_number,
+        value=reset_phone_number_event,
+        key=event_key(topic=settings.api_reset_phone_number, account_id=current_account.id, email=current_account.email)
+    )
 
     return JSONResponse(
         status_code=status.HTTP_200_OK,
@@ -405,11 +460,11 @@ async def reset_phone_number_ctrl(current_account, phone_number: str):
     )
 
 async def update_phone_number_ctrl(current_account, phone_number_update: UpdatePhoneNumber):
-    # Validate auth token
+    # Validate OTP
     logger.info('Validating OTP.')
-    valid_otp = await is_valid_one_time_password(
+    valid_otp = await get_valid_otp(
         otp=phone_number_update.otp, 
-        email=current_account.email, 
+        email_or_phone_number=current_account.email, 
         purpose=OTP_Purpose.phone_verification.value.lower()
     )
 
@@ -420,30 +475,40 @@ async def update_phone_number_ctrl(current_account, phone_number_update: UpdateP
         )
     
     # Validate phone number
-    valid_phone_number = valid_otp.phone_number == phone_number_update.new_phone_number
+    keys, otp_payload, otp_obj = valid_otp
+    valid_phone_number = otp_obj.phone_number == phone_number_update.new_phone_number
     if not valid_phone_number:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Phone number is different from the validated phone number."
         )
-    
-    # Invalidate OTP
-    await invalidate_otp(otp=phone_number_update.otp, email=current_account.email, purpose=OTP_Purpose.phone_verification.value.lower())
-    
-    # Create update phone number obj
-    update_phone_number = UpdatePhoneNumberOut(
-        id=current_account.id,
-        firstname=current_account.firstname,
-        email=current_account.email,
-        new_phone_number=phone_number_update.new_phone_number
-    )
 
-    # Serialize
-    update_phone_number_event = update_phone_number.serialize()
+    # Consume OTP, fails if another request used it first
+    if not await consume_read_otp(keys=keys, payload=otp_payload):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail='Invalid OTP.'
+        )
+    
+    # Serialize update phone number
+    update_phone_number_event = await encode_event(settings.api_update_phone_number, UpdatePhoneNumberOut, {
+        'id': current_account.id,
+        'firstname': current_account.firstname,
+        'email': current_account.email,
+        'new_phone_number': phone_number_update.new_phone_number
+    })
 
-    # Emit reset event
+    # Emit event
     logger.info('Emitting phone number update event.')
-    await produce_event(topic=settings.api_update_phone_number, value=update_phone_number_event)
+    await produce_event(
+        topic=settings.api_update_phone_number,
+        value=update_phone_number_event,
+        key=event_key(topic=settings.api_update_phone_number, account_id=current_account.id, email=current_account.email)
+    )
+
+    # Drop the cached copies of the changed account
+    await invalidate_account(id=current_account.id)
+    await forget_missing(field='phone_number', value=phone_number_update.new_phone_number)
 
     return JSONResponse(
         status_code=status.HTTP_200_OK,
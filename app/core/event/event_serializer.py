@@ -0,0 +1,207 @@
+from dataclasses_avroschema.pydantic import AvroBaseModel
+from core.model.account_model import AccountAvroOut, AccountID, Disable_Enable_Account, AccountUpdateOut, UpdatePhoneNumberOut
+from core.model.avro_model import AccountEmailUpdate, AccountPhoneUpdate
+from core.model.otp_model import OTPAvroOut
+from core.model.update_request_model import UpdatePasswordOut
+from core.model.invalidate_cache_model import InvalidateCache
+from core.helper.schema_registry_helper import register_schema, register_schemas
+from core.utils.settings import settings
+from core.utils.init_log import logger
+from core.utils.error import event_unavailable_error
+from typing import Type
+import asyncio
+import fastavro
+import io
+import struct
+import time
+
+
+# Every event model this service produces
+EVENT_MODELS: list[Type[AvroBaseModel]] = [
+    AccountAvroOut,
+    OTPAvroOut,
+    UpdatePasswordOut,
+    AccountID,
+    Disable_Enable_Account,
+    AccountEmailUpdate,
+    AccountPhoneUpdate,
+    AccountUpdateOut,
+    UpdatePhoneNumberOut,
+    InvalidateCache,
+]
+
+# Confluent wire format: magic byte 0 and a big endian schema id
+WIRE_HEADER = struct.Struct('>bI')
+MAGIC_BYTE = 0
+
+
+def event_topic_models() -> dict[str, Type[AvroBaseModel]]:
+    # Event model produced to each topic
+    return {
+        settings.api_create_account_topic: AccountAvroOut,
+        settings.api_otp_topic: OTPAvroOut,
+        settings.api_update_password_topic: UpdatePasswordOut,
+        settings.api_delete_account_topic: AccountID,
+        settings.api_disable_enable_account_topic: Disable_Enable_Account,
+        settings.api_email_verified_topic: AccountEmailUpdate,
+        settings.api_phone_number_verified_topic: AccountPhoneUpdate,
+        settings.api_account_update_request: AccountUpdateOut,
+        settings.api_reset_phone_number: UpdatePhoneNumberOut,
+        settings.api_update_phone_number: UpdatePhoneNumberOut,
+        settings.api_invalidate_cache_topic: InvalidateCache,
+    }
+
+
+# Wire header per (topic, model), resolved once from the schema registry
+wire_headers: dict[tuple[str, Type[AvroBaseModel]], bytes] = {}
+
+# One lock per (topic, model), a slow lookup only holds up requests for the same event
+_wire_header_locks: dict[tuple[str, Type[AvroBaseModel]], asyncio.Lock] = {}
+
+# Monotonic time until which a failed lookup is not retried
+_failed_lookups: dict[tuple[str, Type[AvroBaseModel]], float] = {}
+
+# Background task retrying the startup schema id load
+_load_task: asyncio.Task | None = None
+
+# Parsed Avro schema per model
+parsed_schemas: dict[Type[AvroBaseModel], dict] = {}
+
+# Reused output buffer, serialization is synchronous so one buffer is enough
+_buffer = io.BytesIO()
+
+
+def register_event_model(model: Type[AvroBaseModel]) -> dict:
+    parsed_schema = fastavro.parse_schema(model.avro_schema_to_python())
+    parsed_schemas[model] = parsed_schema
+    return parsed_schema
+
+
+def load_event_serializers() -> None:
+    # Parse every event schema once at startup
+    logger.info('Parsing event schemas.')
+    for model in EVENT_MODELS:
+        register_event_model(model=model)
+
+
+def serialize_event(model: Type[AvroBaseModel], data: dict) -> bytes:
+    """
+    This is used to serialize an event without building the pydantic model.
+    The data must already be valid, it is written as is against the model's Avro schema.
+    @params {model} - The AvroBaseModel describing the event.
+    @params {data} - A dict with the event fields.
+    @returns {bytes} - The schemaless Avro encoded event, identical to model(**data).serialize().
+    """
+
+    parsed_schema = parsed_schemas.get(model)
+    if parsed_schema is None:
+        parsed_schema = register_event_model(model=model)
+
+    _buffer.seek(0)
+    _buffer.truncate()
+    fastavro.schemaless_writer(_buffer, parsed_schema, data)
+    return _buffer.getvalue()
+
+
+def subject_for(topic: str) -> str:
+    # Confluent topic name strategy
+    return f"{topic}-value"
+
+
+async def resolve_wire_header(topic: str, model: Type[AvroBaseModel]) -> bytes:
+    key = (topic, model)
+    lock = _wire_header_locks.setdefault(key, asyncio.Lock())
+
+    async with lock:
+        header = wire_headers.get(key)
+        if header is not None:
+            return header
+
+        # Fail fast while the registry is backing off, instead of waiting out its timeout on every request
+        if _failed_lookups.get(key, 0) > time.monotonic():
+            raise event_unavailable_error
+
+        try:
+            # Registering an existing schema returns its id
+            schema_id = await register_schema(schema_registry_subject=subject_for(topic), new_schema=model.avro_schema())
+        except Exception as err:
+            logger.error(f"Failed to resolve schema id for topic:{topic} due to error: {str(err)}")
+            _failed_lookups[key] = time.monotonic() + settings.api_schema_registry_retry_interval
+            raise event_unavailable_error
+
+        logger.info(f"Resolved schema id:{schema_id} for topic:{topic}.")
+        _failed_lookups.pop(key, None)
+
+        header = WIRE_HEADER.pack(MAGIC_BYTE, schema_id)
+        wire_headers[key] = header
+        return header
+
+
+async def load_missing_schema_ids() -> bool:
+    # Resolve every event schema without a wire header, one registry lookup per subject
+    topic_models = {topic: model for topic, model in event_topic_models().items() if (topic, model) not in wire_headers}
+    try:
+        schema_ids = await register_schemas({subject_for(topic): model.avro_schema() for topic, model in topic_models.items()})
+    except Exception as err:
+        logger.error(f"Failed to resolve event schema ids due to error: {str(err)}", exc_info=1)
+        return False
+
+    for topic, model in topic_models.items():
+        wire_headers[(topic, model)] = WIRE_HEADER.pack(MAGIC_BYTE, schema_ids[subject_for(topic)])
+        _failed_lookups.pop((topic, model), None)
+    return True
+
+
+async def _retry_load_schema_ids() -> None:
+    global _load_task
+
+    while not await load_missing_schema_ids():
+        await asyncio.sleep(settings.api_schema_registry_retry_interval)
+
+    logger.info('Resolved every event schema id.')
+    _load_task = None
+
+
+async def load_schema_ids() -> None:
+    global _load_task
+
+    if settings.api_event_wire_format != 'confluent':
+        return
+
+    logger.info('Resolving event schema ids.')
+    if await load_missing_schema_ids():
+        return
+
+    # Keep retrying in the background, requests resolve their own topic in the meantime
+    if _load_task is None:
+        _load_task = asyncio.create_task(_retry_load_schema_ids())
+
+
+async def stop_schema_ids() -> None:
+    global _load_task
+
+    if _load_task is not None:
+        _load_task.cancel()
+        _load_task = None
+
+
+async def encode_event(topic: str, model: Type[AvroBaseModel], data: dict) -> bytes:
+    """
+    This is used to encode an event for a topic in the configured wire format.
+    Schema ids are cached, the registry is only called the first time a topic is seen.
+    @params {topic} - The topic the event is produced to.
+    @params {model} - The AvroBaseModel describing the event.
+    @params {data} - A dict with the event fields.
+    @returns {bytes} - The encoded event.
+    """
+
+    payload = serialize_event(model=model, data=data)
+
+    if settings.api_event_wire_format != 'confluent':
+        return payload
+
+    header = wire_headers.get((topic, model))
+    if header is None:
+        header = await resolve_wire_header(topic=topic, model=model)
+
+    return header + payload
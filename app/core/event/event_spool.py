@@ -0,0 +1,343 @@
+from core.utils.settings import settings
+from core.utils.init_log import logger
+import mmap
+import os
+import struct
+import zlib
+
+
+# Segment header: magic, format version, write position, read position
+SEGMENT_HEADER = struct.Struct('>4sB3xQQ')
+SEGMENT_MAGIC = b'AWSP'
+SEGMENT_VERSION = 1
+
+# Record header: body length, body crc32
+RECORD_HEADER = struct.Struct('>II')
+
+# Event header: topic length, key length (-1 for no key), value length, header count
+EVENT_HEADER = struct.Struct('>HiIH')
+EVENT_COUNT = struct.Struct('>H')
+HEADER_FIELD = struct.Struct('>HI')
+
+
+class SpoolFullError(Exception):
+    pass
+
+
+def encode_events(events: list[tuple]) -> bytes:
+    """
+    This is used to encode a group of events into one spool record.
+    @params {events} - A list of (topic, value, key, headers) tuples.
+    @returns {bytes} - The record body.
+    """
+
+    parts = [EVENT_COUNT.pack(len(events))]
+    for topic, value, key, headers in events:
+        topic_bytes = topic.encode()
+        key_bytes = key.encode() if key is not None else b''
+        headers = headers or ()
+
+        parts.append(EVENT_HEADER.pack(len(topic_bytes), len(key_bytes) if key is not None else -1, len(value), len(headers)))
+        parts.append(topic_bytes)
+        parts.append(key_bytes)
+        parts.append(value)
+
+        for name, header_value in headers:
+            name_bytes = name.encode()
+            parts.append(HEADER_FIELD.pack(len(name_bytes), len(header_value)))
+            parts.append(name_bytes)
+            parts.append(header_value)
+
+    return b''.join(parts)
+
+
+def decode_events(body: bytes) -> list[tuple]:
+    view = memoryview(body)
+    (count,) = EVENT_COUNT.unpack_from(view, 0)
+    pos = EVENT_COUNT.size
+
+    events = []
+    for _ in range(count):
+        topic_len, key_len, value_len, header_count = EVENT_HEADER.unpack_from(view, pos)
+        pos += EVENT_HEADER.size
+
+        topic = bytes(view[pos:pos + topic_len]).decode()
+        pos += topic_len
+
+        key = None
+        if key_len >= 0:
+            key = bytes(view[pos:pos + key_len]).decode()
+            pos += key_len
+
+        value = bytes(view[pos:pos + value_len])
+        pos += value_len
+
+        headers = []
+        for _ in range(header_count):
+            name_len, header_value_len = HEADER_FIELD.unpack_from(view, pos)
+            pos += HEADER_FIELD.size
+            name = bytes(view[pos:pos + name_len]).decode()
+            pos += name_len
+            headers.append((name, bytes(view[pos:pos + header_value_len])))
+            pos += header_value_len
+
+        events.append((topic, value, key, headers or None))
+
+    return events
+
+
+class SpoolSegment:
+    """
+    A fixed size, memory-mapped, append-only segment file.
+    The header keeps the write and read positions so the spool survives restarts.
+    """
+
+    def __init__(self, path: str, size: int):
+        self.path = path
+        self.size = size
+
+        exists = os.path.exists(path)
+        self._file = open(path, 'r+b' if exists else 'w+b')
+        if not exists:
+            self._file.truncate(size)
+        else:
+            self.size = os.path.getsize(path)
+
+        self._map = mmap.mmap(self._file.fileno(), self.size)
+
+        magic, version, write_pos, read_pos = SEGMENT_HEADER.unpack_from(self._map, 0)
+        if magic != SEGMENT_MAGIC:
+            # New segment
+            write_pos = read_pos = SEGMENT_HEADER.size
+            SEGMENT_HEADER.pack_into(self._map, 0, SEGMENT_MAGIC, SEGMENT_VERSION, write_pos, read_pos)
+
+        self.write_pos = write_pos
+        self.read_pos = read_pos
+
+    @property
+    def pending_bytes(self) -> int:
+        return self.write_pos - self.read_pos
+
+    def count_records(self) -> int:
+        count = 0
+        record = self.read(self.read_pos)
+        while record is not None:
+            count += 1
+            record = self.read(record[1])
+        return count
+
+    def _write_header(self) -> None:
+        SEGMENT_HEADER.pack_into(self._map, 0, SEGMENT_MAGIC, SEGMENT_VERSION, self.write_pos, self.read_pos)
+
+    def append(self, body: bytes) -> bool:
+        record_size = RECORD_HEADER.size + len(body)
+        if self.write_pos + record_size > self.size:
+            return False
+
+        # Write the record before publishing the new write position,
+        # a crash mid-write leaves the record invisible
+        RECORD_HEADER.pack_into(self._map, self.write_pos, len(body), zlib.crc32(body))
+        start = self.write_pos + RECORD_HEADER.size
+        self._map[start:start + len(body)] = body
+
+        self.write_pos += record_size
+        self._write_header()
+
+        if settings.api_event_spool_fsync:
+            self._map.flush()
+        return True
+
+    def read(self, pos: int) -> tuple[bytes, int] | None:
+        if pos >= self.write_pos:
+            return None
+
+        length, crc = RECORD_HEADER.unpack_from(self._map, pos)
+        start = pos + RECORD_HEADER.size
+        body = self._map[start:start + length]
+
+        if zlib.crc32(body) != crc:
+            # Torn tail, drop everything after the last good record
+            logger.error(f"Corrupt record in spool segment:{self.path} at {pos}, truncating.")
+            self.write_pos = pos
+            self._write_header()
+            return None
+
+        return body, start + length
+
+    def commit(self, pos: int) -> None:
+        self.read_pos = pos
+        self._write_header()
+
+    def close(self) -> None:
+        self._map.flush()
+        self._map.close()
+        self._file.close()
+
+
+class EventSpool:
+    """
+    Bounded on-disk queue of events the broker rejected or timed out on.
+    Appends are O(1) writes into the active memory-mapped segment.
+    """
+
+    def __init__(self, directory: str, segment_bytes: int, max_segments: int):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.max_segments = max_segments
+        self.segments: list[tuple[int, SpoolSegment]] = []
+
+        # Metrics
+        self.appended_records = 0
+        self.replayed_records = 0
+        self.rejected_records = 0
+        self.pending_records = 0
+        self.dead_letter_records = 0
+
+    def _segment_path(self, sequence: int) -> str:
+        return os.path.join(self.directory, f"{sequence:010d}.spool")
+
+    @property
+    def dead_letter_path(self) -> str:
+        return os.path.join(self.directory, 'dead_letter.log')
+
+    def open(self) -> None:
+        if self.segments:
+            return
+
+        os.makedirs(self.directory, exist_ok=True)
+
+        # Reopen segments left by a previous run, oldest first
+        sequences = sorted(int(name.split('.')[0]) for name in os.listdir(self.directory) if name.endswith('.spool'))
+        for sequence in sequences:
+            segment = SpoolSegment(path=self._segment_path(sequence), size=self.segment_bytes)
+            self.segments.append((sequence, segment))
+            self.pending_records += segment.count_records()
+
+        if not self.segments:
+            self._roll()
+
+        if self.pending_records:
+            logger.warning(f"Event spool has {self.pending_records} records left from a previous run.")
+
+    def close(self) -> None:
+        for _, segment in self.segments:
+            segment.close()
+        self.segments.clear()
+
+    def _roll(self) -> SpoolSegment:
+        sequence = self.segments[-1][0] + 1 if self.segments else 1
+        segment = SpoolSegment(path=self._segment_path(sequence), size=self.segment_bytes)
+        self.segments.append((sequence, segment))
+        return segment
+
+    @property
+    def pending(self) -> bool:
+        return self.pending_records > 0
+
+    def append(self, events: list[tuple]) -> None:
+        """
+        This is used to spool a group of events as a single record.
+        @params {events} - A list of (topic, value, key, headers) tuples.
+        @raises {SpoolFullError} - When the spool reached its size bound.
+        """
+
+        body = encode_events(events)
+
+        # Spool used outside the app lifespan
+        if not self.segments:
+            self.open()
+
+        segment = self.segments[-1][1]
+        if not segment.append(body):
+            self._drop_replayed()
+            if len(self.segments) >= self.max_segments or RECORD_HEADER.size + len(body) > self.segment_bytes - SEGMENT_HEADER.size:
+                self.rejected_records += 1
+                raise SpoolFullError(f"Event spool is full ({self.max_segments} segments of {self.segment_bytes} bytes).")
+
+            segment = self._roll()
+            segment.append(body)
+
+        self.appended_records += 1
+        self.pending_records += 1
+
+    def peek(self) -> tuple[list[tuple], SpoolSegment, int] | None:
+        """
+        This is used to read the oldest spooled record without removing it.
+        @returns {tuple} - The events, their segment and the position after the record.
+        """
+
+        self._drop_replayed()
+
+        for _, segment in self.segments:
+            record = segment.read(segment.read_pos)
+            if record is not None:
+                body, next_pos = record
+                return decode_events(body), segment, next_pos
+
+        return None
+
+    def peek_many(self, limit: int) -> list[tuple[list[tuple], SpoolSegment, int]]:
+        """
+        This is used to read up to limit of the oldest spooled records without removing them.
+        @params {limit} - The maximum number of records.
+        @returns {list} - The records as returned by peek, oldest first.
+        """
+
+        self._drop_replayed()
+
+        records = []
+        for _, segment in self.segments:
+            pos = segment.read_pos
+            while len(records) < limit:
+                record = segment.read(pos)
+                if record is None:
+                    break
+                body, pos = record
+                records.append((decode_events(body), segment, pos))
+
+        return records
+
+    def dead_letter(self, events: list[tuple]) -> None:
+        """
+        This is used to set aside a record the broker will never accept, so replay can move past it.
+        Records are appended to the dead letter file in the spool record format.
+        @params {events} - The events of the record.
+        """
+
+        body = encode_events(events)
+        with open(self.dead_letter_path, 'ab') as dead_letter_file:
+            dead_letter_file.write(RECORD_HEADER.pack(len(body), zlib.crc32(body)))
+            dead_letter_file.write(body)
+
+        self.dead_letter_records += 1
+
+    def commit(self, segment: SpoolSegment, next_pos: int) -> None:
+        segment.commit(pos=next_pos)
+        self.replayed_records += 1
+        self.pending_records -= 1
+
+    def _drop_replayed(self) -> None:
+        # Remove fully replayed segments, keep the active one
+        while len(self.segments) > 1 and self.segments[0][1].pending_bytes == 0:
+            _, segment = self.segments.pop(0)
+            segment.close()
+            os.remove(segment.path)
+
+    def metrics(self) -> dict:
+        return {
+            'appended_records': self.appended_records,
+            'replayed_records': self.replayed_records,
+            'rejected_records': self.rejected_records,
+            'pending_records': self.pending_records,
+            'dead_letter_records': self.dead_letter_records,
+            'pending_bytes': sum(segment.pending_bytes for _, segment in self.segments),
+            'segments': len(self.segments),
+            'max_bytes': self.segment_bytes * self.max_segments,
+        }
+
+
+event_spool = EventSpool(
+    directory=settings.api_event_spool_dir,
+    segment_bytes=settings.api_event_spool_segment_bytes,
+    max_segments=settings.api_event_spool_max_segments,
+)
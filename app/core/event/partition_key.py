@@ -0,0 +1,97 @@
+from aiokafka.partitioner import DefaultPartitioner
+from core.utils.settings import settings
+from pydantic import EmailStr
+import hashlib
+import random
+import uuid
+
+
+# Key strategies
+KEY_BY_ID = 'id'
+KEY_BY_EMAIL = 'email'
+KEY_BY_RANDOM = 'random'
+
+
+def default_topic_strategies() -> dict[str, str]:
+    # Topics whose producers do not always know the account id are keyed by email
+    return {
+        settings.api_create_account_topic: KEY_BY_EMAIL,
+        settings.api_otp_topic: KEY_BY_EMAIL,
+        settings.api_update_password_topic: KEY_BY_EMAIL,
+        settings.api_email_verified_topic: KEY_BY_EMAIL,
+        settings.api_phone_number_verified_topic: KEY_BY_EMAIL,
+        settings.api_invalidate_cache_topic: KEY_BY_EMAIL,
+        settings.api_delete_account_topic: KEY_BY_ID,
+        settings.api_disable_enable_account_topic: KEY_BY_ID,
+        settings.api_account_update_request: KEY_BY_ID,
+        settings.api_reset_phone_number: KEY_BY_ID,
+        settings.api_update_phone_number: KEY_BY_ID,
+    }
+
+
+# Strategy per topic, Settings overrides win
+topic_strategies = default_topic_strategies() | settings.api_event_key_overrides
+
+
+def normalize_email(email: EmailStr) -> str:
+    return str(email).strip().lower()
+
+
+def event_key(topic: str, account_id: str | None = None, email: EmailStr | None = None) -> str:
+    """
+    This is used to build the partition key of an event.
+    @params {topic} - The topic the event is produced to.
+    @params {account_id} - The id of the account the event belongs to.
+    @params {email} - The email of the account the event belongs to.
+    @returns {str} - The partition key. Events of one account share a key per topic.
+    """
+
+    strategy = topic_strategies.get(topic, settings.api_event_key_strategy)
+
+    if strategy == KEY_BY_RANDOM:
+        return str(uuid.uuid4())
+
+    # Use the preferred field and fall back to the other one
+    if strategy == KEY_BY_EMAIL:
+        candidates = (email and normalize_email(email), account_id)
+    else:
+        candidates = (account_id, email and normalize_email(email))
+
+    for candidate in candidates:
+        if candidate:
+            return str(candidate)
+
+    return str(uuid.uuid4())
+
+
+def jump_consistent_hash(key: int, buckets: int) -> int:
+    # Lamping and Veach jump consistent hash
+    b, j = -1, 0
+    while j < buckets:
+        b = j
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        j = int((b + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return b
+
+
+class ConsistentHashPartitioner:
+    """
+    Maps keys to partitions with jump consistent hashing, so only about
+    1/n of the keys move when a topic grows to n partitions.
+    """
+
+    def __call__(self, key, all_partitions, available):
+        if key is None:
+            return random.choice(available or all_partitions)
+
+        digest = hashlib.blake2b(key, digest_size=8).digest()
+        idx = jump_consistent_hash(int.from_bytes(digest, 'big'), len(all_partitions))
+        return all_partitions[idx]
+
+
+def get_partitioner():
+    if settings.api_event_partitioner == 'consistent':
+        return ConsistentHashPartitioner()
+
+    # aiokafka murmur2 partitioner, compatible with the java client
+    return DefaultPartitioner()
@@ -1,34 +1,218 @@
-from aiokafka import AIOKafkaProducer
+from core.connection.producer_connection import get_producer
 from core.utils.settings import settings
+import asyncio
 import uuid
 from core.helper.producer_helper import *
+from core.connection.producer_connection import transactional_producer
+from core.event.event_spool import event_spool, SpoolFullError
+from core.model.event_model import EventOut
+from core.utils.error import event_unavailable_error
 from core.utils.init_log import logger
+from aiokafka.errors import KafkaError, KafkaTimeoutError, ProducerClosed
 
 
-async def produce_event(topic: str, value, key: str = str(uuid.uuid4()), headers: tuple | None = None) -> None:
+# Background task replaying spooled events
+_replay_task: asyncio.Task | None = None
+
+# Failures a later retry can get past, timeouts are not flagged retriable by aiokafka
+RETRIABLE_ERRORS = (KafkaTimeoutError, ProducerClosed, asyncio.TimeoutError, ConnectionError, OSError)
+
+
+def is_retriable(err: BaseException) -> bool:
+    # Anything else, e.g. a message over max_request_size, fails the same way every time
+    if isinstance(err, RETRIABLE_ERRORS):
+        return True
+    return isinstance(err, KafkaError) and err.retriable
+
+
+async def enqueue_event(topic: str, value, key: str, headers: tuple | None = None) -> asyncio.Future:
+    # Get the shared producer for the topic's compression
+    producer = await get_producer(topic=topic)
+
+    # Make sure the topic exists, only unknown topics reach the admin API
+    await ensure_topic(topic=topic)
+
+    # Enqueue the message into the current batch, the future resolves on delivery
+    return await producer.send(key=key.encode(), value=value, topic=topic, headers=headers)
+
+
+async def send_event(topic: str, value, key: str, headers: tuple | None = None) -> None:
+    delivery = await enqueue_event(topic=topic, value=value, key=key, headers=headers)
+
+    # Wait for this message's own delivery report
+    await delivery
+
+
+async def send_events(events: list[tuple]) -> None:
+    # Make sure every topic exists before opening the transaction
+    for topic in {topic for topic, _, _, _ in events}:
+        await ensure_topic(topic=topic)
+
+    async with transactional_producer() as producer:
+        # Events share the producer batches and commit or abort together
+        async with producer.transaction():
+            for topic, value, key, headers in events:
+                await producer.send(key=key.encode(), value=value, topic=topic, headers=headers)
+
+
+def spool_events(events: list[tuple]) -> None:
+    try:
+        event_spool.append(events=events)
+    except SpoolFullError as err:
+        logger.error(f"Failed to spool events due to error: {str(err)}")
+        raise event_unavailable_error
+
+
+async def produce_event(topic: str, value, key: str | None = None, headers: tuple | None = None) -> None:
+    # Unkeyed events are spread randomly
+    if key is None:
+        key = str(uuid.uuid4())
+
+    # Queue behind spooled events so they are delivered in order
+    if event_spool.pending:
+        logger.warning(f"Broker recovering, spooling event to topic:{topic}.")
+        spool_events(events=[(topic, value, key, headers)])
+        return
+
+    try:
+        await send_event(topic=topic, value=value, key=key, headers=headers)
+
+    except Exception as err:
+        logger.error(f"Failed to produce event to topic:{topic} due to error: {str(err)}", exc_info=1)
+        if not is_retriable(err):
+            raise
+        spool_events(events=[(topic, value, key, headers)])
+
+
+async def produce_events(events: list[EventOut]) -> None:
+    """
+    This is used to emit a group of related events atomically.
+    Consumers reading committed events see all of them or none.
+    @params {events} - The events to emit, in order.
+    """
+
+    # Unkeyed events are spread randomly
+    records = [(event.topic, event.value, event.key or str(uuid.uuid4()), event.headers) for event in events]
+
+    # Queue behind spooled events so they are delivered in order
+    if event_spool.pending:
+        logger.warning('Broker recovering, spooling event group.')
+        spool_events(events=records)
+        return
+
     try:
-        # Get the producer
-        producer = AIOKafkaProducer(
-            client_id=settings.api_event_streaming_client_id,
-            bootstrap_servers=settings.api_event_streaming_host, 
-        )
-
-        # Start the producer and get brokers metedata
-        logger.info('Starting kafka producer.')
-        await producer.start()
-
-        # Check if topic already exists
-        topic_exist = await topic_exists(topic=topic)
-        logger.info(f"Checking if topic:{topic} exists.")
-        if not topic_exist:
-            logger.info(f"Topic: {topic} not found.")
-            await create_topic(topic=topic)
-
-        # Produce message
-        await producer.send_and_wait(key=key.encode(), value=value, topic=topic, headers=headers)
+        await send_events(events=records)
 
     except Exception as err:
-        logger.error(f"Failed to start Kafka producer due to error: {str(err)}", exc_info=1)
-    finally:
-        logger.info('Closing Kafka producer.')
-        await producer.stop()
\ No newline at end of file
+        logger.error(f"Failed to produce event group due to error: {str(err)}", exc_info=1)
+        if not is_retriable(err):
+            raise
+        spool_events(events=records)
+
+
+def dead_letter(events: list[tuple], err: BaseException) -> None:
+    # Set the record aside so the records behind it are not blocked forever
+    logger.error(f"Moving {len(events)} spooled events to the dead letter file due to error: {str(err)}")
+    event_spool.dead_letter(events=events)
+
+
+async def replay_group(record: tuple) -> bool:
+    events, segment, next_pos = record
+    try:
+        await send_events(events=events)
+    except Exception as err:
+        if is_retriable(err):
+            logger.warning(f"Failed to replay spooled events due to error: {str(err)}")
+            return False
+        dead_letter(events=events, err=err)
+
+    event_spool.commit(segment=segment, next_pos=next_pos)
+    return True
+
+
+async def replay_window(records: list[tuple]) -> bool:
+    """
+    This is used to replay single event records without waiting on each delivery.
+    Every record is enqueued first, then deliveries are awaited and committed in spool order.
+    The idempotent producer keeps the order within each partition.
+    @params {records} - Spooled records of one event each, oldest first.
+    @returns {bool} - False if a retriable failure stopped the replay.
+    """
+
+    # Enqueue the whole window into the producer batches
+    deliveries = []
+    for events, _, _ in records:
+        topic, value, key, headers = events[0]
+        try:
+            deliveries.append(await enqueue_event(topic=topic, value=value, key=key, headers=headers))
+        except Exception as err:
+            deliveries.append(err)
+            if is_retriable(err):
+                break
+
+    for index, delivery in enumerate(deliveries):
+        events, segment, next_pos = records[index]
+        try:
+            if isinstance(delivery, BaseException):
+                raise delivery
+            await delivery
+        except Exception as err:
+            if is_retriable(err):
+                logger.warning(f"Failed to replay spooled events due to error: {str(err)}")
+                # Collect the remaining reports, those records are sent again on the next attempt
+                await asyncio.gather(*(pending for pending in deliveries[index + 1:] if not isinstance(pending, BaseException)), return_exceptions=True)
+                return False
+            dead_letter(events=events, err=err)
+
+        event_spool.commit(segment=segment, next_pos=next_pos)
+
+    return len(deliveries) == len(records)
+
+
+async def replay_spooled_events() -> None:
+    while True:
+        records = event_spool.peek_many(limit=settings.api_event_spool_replay_window)
+        if not records:
+            await asyncio.sleep(settings.api_event_spool_replay_interval)
+            continue
+
+        if len(records[0][0]) > 1:
+            # Event groups are replayed in their own transaction
+            replayed = await replay_group(record=records[0])
+        else:
+            window = []
+            for record in records:
+                if len(record[0]) > 1:
+                    break
+                window.append(record)
+            replayed = await replay_window(records=window)
+
+        if not replayed:
+            await asyncio.sleep(settings.api_event_spool_replay_interval)
+            continue
+
+        if not event_spool.pending:
+            logger.info(f"Event spool drained: {event_spool.metrics()}")
+
+
+def spool_metrics() -> dict:
+    return event_spool.metrics()
+
+
+async def start_event_spool() -> None:
+    global _replay_task
+
+    event_spool.open()
+
+    if _replay_task is None:
+        _replay_task = asyncio.create_task(replay_spooled_events())
+
+
+async def stop_event_spool() -> None:
+    global _replay_task
+
+    if _replay_task is not None:
+        _replay_task.cancel()
+        _replay_task = None
+
+    event_spool.close()
@@ -10,57 +10,30 @@ from core.model.revoke_token import *
 from datetime import timezone
 from core.utils.init_log import logger
 from core.utils.error import credential_error
-from core.helper.db_helper import get_account_by_email, get_account_by_id
-from core.helper.encryption_helper import encrypt
-from core.event.produce_event import produce_event
-from core.model.invalidate_cache_model import InvalidateCache
-import json
-
-
-async def get_account_from_cache(id: str):
-    logger.info(f'Fetching account:{id} from cache')
-
-    # Create key
-    key = f"account:{id}"
-
-    try:
-        # Get account from cache
-        account_bytes = await redis.get(key.encode())
-        
-        if not account_bytes:
-            logger.warning(f"Account:{id} not fount in cache.")
-            return None
-        
-        logger.info(f"Account:{id} found in cache.")
-        logger.info(f"Deserializing account:{id}")
-        
-        # Deserialize
-        account_data = json.loads(s=account_bytes)
-
-        return account_data
-    except Exception as err:
-        logger.error(f"Failed to retrieve account:{id} from cache due to error:{str(err)}")
+from core.helper.db_helper import has_account
+from core.helper.cache_helper import get_account_read_through, get_account_from_cache
+from core.helper.email_filter_helper import email_filter_ready, email_may_exist, record_false_positive
 
 
 async def get_account_from_cache_or_db_by_id(id: str):
-    account_data = {}
-
-    # Check if account is in Cache
-    account_data: dict = await get_account_from_cache(id=id)
-    
-    if account_data:
-        return account_data
-    else:
-        account_data = await get_account_by_id(id=id)
-        return account_data
+    # Check if account is in Cache, loading it from the database on a miss
+    return await get_account_read_through(id=id)
 
 
 async def account_exists(key: str, value) -> bool:
     try:
+        # Emails missing from the filter are definitely not registered
+        filtered = key == 'email' and email_filter_ready()
+        if filtered and not await email_may_exist(email=value):
+            logger.info('Account not found')
+            return False
+
         logger.info('Fetching account data from database.')
-        account_exists = await get_account_by_email(email=value)
+        account_exists = await has_account(field=key, value=value)
         if not account_exists:
             logger.info('Account not found')
+            if filtered:
+                record_false_positive()
             return False
         logger.info('Account found.')
         return True
@@ -68,61 +41,6 @@ async def account_exists(key: str, value) -> bool:
         logger.error(f"Failed to Fetch account due to error: {str(err)}")
 
 
-async def is_valid_one_time_password(otp: str, email: EmailStr, purpose: str) -> dict:
-    # Encrypt OTP
-    encrypted_otp = encrypt(value=otp)
-    
-    # Retrieve the otp
-    key = f"otp:{email}-{encrypted_otp}-{purpose}"
-    try:  
-        logger.info('fetching one time password.')
-        
-        # Fetch otp
-        otp_exists_bytes = await redis.get(key.encode())
-        
-        # Check if otp does not exists
-        if not otp_exists_bytes:
-            return None
-        
-        logger.info('OTP found.')
-        
-        # Deserialize OTP
-        otp_obj = OTPAvroIn.deserialize(data=otp_exists_bytes)
-
-        # Check if OTP have expired
-        logger.info('Checking if OTP have expired.')
-
-        if datetime.now(timezone.utc) >= otp_obj.expires_on:
-            logger.info('Expired OTP')
-            return None
-        
-        return otp_obj
-            
-    except Exception as err:
-        logger.error(f'Failed to validate OTP due to error {str(err)}')
-
-
-async def invalidate_otp(email: EmailStr, otp: str, purpose: str):
-    # Invalidate auth token
-    logger.info('Invalidating OTP')
-
-    # Encrypt auth token
-    encrypted_otp = encrypt(value=otp)
-
-    # Create key
-    key = f"otp:{email}-{encrypted_otp}-{purpose.lower()}"
-    
-    # Create
-    invalidate_token = InvalidateCache(key=key)
-
-    # Create event
-    invalidate_token_event = invalidate_token.serialize()
-
-    # Emit auth token invalidate
-    logger.info('Emitting invalidate otp event.')
-    await produce_event(topic=settings.api_invalidate_cache_topic, value=invalidate_token_event)
-     
-
 async def is_valid_auth_token(auth_token: str, email: EmailStr) -> dict:
     # request body
     body = {
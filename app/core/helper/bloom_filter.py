@@ -0,0 +1,65 @@
+import hashlib
+import math
+import struct
+
+
+# Serialized header: magic, hash count, bit count, item count
+BLOOM_HEADER = struct.Struct('>4sBQQ')
+BLOOM_MAGIC = b'BLM1'
+
+
+class BloomFilter:
+    """
+    Space efficient set membership with no false negatives.
+    Bits are numbered most significant first in each byte, matching redis SETBIT offsets.
+    """
+
+    def __init__(self, size_bits: int, hash_count: int, bits: bytearray | None = None, count: int = 0):
+        self.size_bits = size_bits
+        self.hash_count = hash_count
+        self.bits = bits if bits is not None else bytearray((size_bits + 7) // 8)
+        self.count = count
+
+    @classmethod
+    def for_capacity(cls, capacity: int, error_rate: float) -> 'BloomFilter':
+        # Optimal bit and hash counts for the expected number of items
+        size_bits = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        hash_count = max(1, round(size_bits / capacity * math.log(2)))
+        return cls(size_bits=size_bits, hash_count=hash_count)
+
+    def positions(self, item: str) -> list[int]:
+        # Double hashing, k positions from one 128 bit digest
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'big')
+        h2 = int.from_bytes(digest[8:], 'big') | 1
+        return [(h1 + i * h2) % self.size_bits for i in range(self.hash_count)]
+
+    def add(self, item: str) -> None:
+        for position in self.positions(item):
+            self.bits[position >> 3] |= 0x80 >> (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[position >> 3] & (0x80 >> (position & 7)) for position in self.positions(item))
+
+    def false_positive_rate(self) -> float:
+        # Expected rate for the number of items added
+        return (1 - math.exp(-self.hash_count * self.count / self.size_bits)) ** self.hash_count
+
+    def header(self) -> bytes:
+        return BLOOM_HEADER.pack(BLOOM_MAGIC, self.hash_count, self.size_bits, self.count)
+
+    def to_bytes(self) -> bytes:
+        return self.header() + bytes(self.bits)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'BloomFilter':
+        magic, hash_count, size_bits, count = BLOOM_HEADER.unpack_from(data, 0)
+        if magic != BLOOM_MAGIC:
+            raise ValueError('Not a serialized bloom filter.')
+
+        bits = bytearray(data[BLOOM_HEADER.size:])
+        if len(bits) != (size_bits + 7) // 8:
+            raise ValueError('Bloom filter size does not match its header.')
+
+        return cls(size_bits=size_bits, hash_count=hash_count, bits=bits, count=count)
@@ -1,7 +1,54 @@
 from core.model.token_model import *
 from core.connection.cache_connection import redis
+from core.helper.db_helper import get_account_by_id, get_account_document_by_id, get_account_documents_by_ids, account_lookups, to_account
+from core.model.account_model import AccountInDB
+from core.helper.local_cache import LocalCache
+from core.helper.single_flight import SingleFlight
+from core.helper.negative_cache_helper import is_missing_locally, missing_account_key, remember_missing, remember_missing_locally
+from core.utils.settings import settings
 from core.utils.init_log import logger
+import asyncio
 import json
+import math
+import random
+import time
+import uuid
+
+
+# Deletes a lock only if it is still held by the caller
+RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+release_lock = redis.register_script(RELEASE_LOCK_SCRIPT)
+
+# Caches an account unless this service changed it recently, the database may not have the change yet
+CACHE_ACCOUNT_SCRIPT = """
+if redis.call('EXISTS', KEYS[2]) == 1 then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+return 1
+"""
+cache_account_script = redis.register_script(CACHE_ACCOUNT_SCRIPT)
+
+# Moving average of the database load time, used for early refresh
+load_seconds = 0.05
+
+# Decoded accounts by id, kept coherent by a short TTL and invalidation on account events
+local_accounts = LocalCache(max_bytes=settings.api_account_local_cache_max_bytes, ttl=settings.api_account_local_cache_ttl)
+
+# Accounts this pod emitted a change for, not kept in process until the change is applied
+changed_accounts = LocalCache(max_bytes=1024 * 1024, ttl=settings.api_account_changed_ttl)
+
+# Concurrent lookups of the same account share one redis and database read
+account_reads = SingleFlight()
+
+
+def changed_account_key(id: str) -> str:
+    return f"changed:account:{id}"
 
 
 async def get_account_from_cache(id: str):
@@ -21,9 +68,265 @@ async def get_account_from_cache(id: str):
         logger.info(f"Account:{id} found in cache.")
         logger.info(f"Deserializing account:{id}")
         
-        # Deserialize
-        account_data = json.loads(s=account_bytes)
+        # Deserialize, accounts in the cache come from our own database
+        account_data = to_account(json.loads(s=account_bytes))
 
         return account_data
     except Exception as err:
         logger.error(f"Failed to retrieve account:{id} from cache due to error:{str(err)}")
+
+
+async def get_accounts_from_cache(ids: list[str]) -> dict[str, AccountInDB]:
+    """
+    This is used to retrieve many accounts from the cache in one round-trip.
+    @params {ids} - The ids of the accounts.
+    @returns {dict} - A dict of id to account, ids not in the cache are left out.
+    """
+
+    if not ids:
+        return {}
+
+    # Get every account with one MGET
+    accounts_bytes = await redis.mget([f"account:{id}".encode() for id in ids])
+
+    # Deserialize
+    return {id: to_account(json.loads(s=account_bytes)) for id, account_bytes in zip(ids, accounts_bytes) if account_bytes}
+
+
+async def cache_account(id: str, account_document: dict) -> bool:
+    # Skipped while the account is marked changed
+    keys = [f"account:{id}".encode(), changed_account_key(id=id).encode()]
+    return bool(await cache_account_script(keys=keys, args=[json.dumps(account_document, default=str), jittered_ttl()]))
+
+
+async def cache_accounts(accounts: dict[str, dict]) -> None:
+    # Each account gets its own jittered TTL, changed accounts are skipped
+    await asyncio.gather(*(cache_account(id=id, account_document=account_document) for id, account_document in accounts.items()))
+
+
+async def get_accounts_read_through(ids: list[str]) -> dict[str, AccountInDB | None]:
+    """
+    This is used to retrieve many accounts, filling cache misses from one database query.
+    The returned accounts are shared with the in-process cache and must not be modified.
+    @params {ids} - The ids of the accounts.
+    @returns {dict} - A dict of id to account, None for ids without an account.
+    """
+
+    ids = list(dict.fromkeys(ids))
+    accounts: dict[str, AccountInDB | None] = {id: None for id in ids}
+
+    # Check the in-process cache first
+    pending = []
+    for id in ids:
+        account_data = local_accounts.get(id)
+        if account_data is not None:
+            accounts[id] = account_data
+        elif not is_missing_locally(field='id', value=id):
+            pending.append(id)
+
+    if not pending:
+        return accounts
+
+    try:
+        found = await get_accounts_from_cache(ids=pending)
+    except Exception as err:
+        logger.error(f"Failed to retrieve {len(pending)} accounts from cache due to error:{str(err)}")
+        found = {}
+
+    # Fill the misses from the database, no lock is taken so a concurrent miss may load an account twice
+    misses = [id for id in pending if id not in found]
+    if misses:
+        logger.info(f"Loading {len(misses)} accounts from database.")
+        loaded = await get_account_documents_by_ids(ids=misses)
+        if loaded:
+            try:
+                await cache_accounts(accounts=loaded)
+            except Exception as err:
+                logger.error(f"Failed to cache {len(loaded)} accounts due to error:{str(err)}")
+        found.update({id: to_account(document) for id, document in loaded.items()})
+
+    for id, account_data in found.items():
+        if changed_accounts.get(id) is None:
+            local_accounts.set(id, account_data, size=account_size(account_data))
+        accounts[id] = account_data
+
+    return accounts
+
+
+def account_size(account: AccountInDB) -> int:
+    # Approximate in-process size, the length of the account as JSON
+    return len(json.dumps(account.__dict__, default=str))
+
+
+def jittered_ttl() -> int:
+    # Spread expiries so accounts cached together do not expire together
+    jitter = settings.api_account_cache_ttl * settings.api_account_cache_ttl_jitter
+    return max(1, round(settings.api_account_cache_ttl + random.uniform(-jitter, jitter)))
+
+
+def should_refresh_early(ttl_ms: int) -> bool:
+    # Keys without a TTL are owned by another writer
+    if ttl_ms < 0:
+        return False
+
+    # Probabilistic early expiration, more likely as the key nears expiry
+    gap_ms = -load_seconds * settings.api_account_cache_refresh_beta * math.log(1.0 - random.random()) * 1000
+    return gap_ms >= ttl_ms
+
+
+async def fetch_account_with_ttl(id: str) -> tuple[AccountInDB | None, int, bool, bool]:
+    key = f"account:{id}"
+    missing_key = missing_account_key(field='id', value=id)
+
+    # Get account, its remaining TTL, whether it is known missing and whether it was just changed in one round-trip
+    async with redis.pipeline(transaction=False) as pipe:
+        pipe.get(key.encode())
+        pipe.pttl(key.encode())
+        pipe.exists(missing_key.encode())
+        pipe.exists(changed_account_key(id=id).encode())
+        account_bytes, ttl_ms, missing, changed = await pipe.execute()
+
+    if missing:
+        remember_missing_locally(key=missing_key)
+
+    if not account_bytes:
+        return None, ttl_ms, bool(missing), bool(changed)
+    return to_account(json.loads(s=account_bytes)), ttl_ms, False, bool(changed)
+
+
+async def load_account(id: str) -> AccountInDB | None:
+    global load_seconds
+
+    # Get account from database
+    started_at = time.perf_counter()
+    account_document = await get_account_document_by_id(id=id)
+    load_seconds = 0.8 * load_seconds + 0.2 * (time.perf_counter() - started_at)
+
+    if account_document:
+        logger.info(f"Caching account:{id}")
+        if not await cache_account(id=id, account_document=account_document):
+            logger.info(f"Account:{id} was changed recently, not caching it.")
+    else:
+        await remember_missing(field='id', value=id)
+
+    return to_account(account_document)
+
+
+async def try_load_account(id: str) -> tuple[bool, AccountInDB | None]:
+    """
+    This is used to load an account into the cache if no other request is loading it.
+    @params {id} - The id of the account.
+    @returns {tuple} - Whether the lock was acquired and the loaded account.
+    """
+
+    lock_key = f"lock:account:{id}"
+    token = uuid.uuid4().hex
+
+    # Only one request per account reaches the database
+    if not await redis.set(lock_key.encode(), token, nx=True, px=settings.api_account_cache_lock_ms):
+        return False, None
+
+    try:
+        return True, await load_account(id=id)
+    finally:
+        await release_lock(keys=[lock_key.encode()], args=[token])
+
+
+async def get_account_read_through(id: str) -> AccountInDB | None:
+    """
+    This is used to retrieve an account from the cache, loading it from the database on a miss.
+    The returned account is shared with the in-process cache and must not be modified.
+    @params {id} - The id of the account.
+    @returns {AccountInDB} - The account or None if it does not exist.
+    """
+
+    # Check the in-process cache first
+    account_data = local_accounts.get(id)
+    if account_data is not None:
+        return account_data
+
+    account_data = await account_reads.do(f"id:{id}", lambda: get_account_from_redis_or_db(id=id))
+    if account_data and changed_accounts.get(id) is None:
+        local_accounts.set(id, account_data, size=account_size(account_data))
+
+    return account_data
+
+
+def invalidate_local_account(id: str) -> None:
+    local_accounts.invalidate(id)
+
+
+async def invalidate_account(id: str) -> None:
+    """
+    This is used to drop an account this service emitted a change for.
+    The database is updated later by the event consumer, so until api_account_changed_ttl
+    passes the account is read from the database and not cached again.
+    @params {id} - The id of the account.
+    """
+
+    invalidate_local_account(id=id)
+    changed_accounts.set(id, True, size=len(id))
+
+    try:
+        # Mark the account changed before dropping it, so no reader caches the old document in between
+        async with redis.pipeline(transaction=True) as pipe:
+            pipe.set(changed_account_key(id=id).encode(), 1, ex=settings.api_account_changed_ttl)
+            pipe.delete(f"account:{id}".encode())
+            await pipe.execute()
+    except Exception as err:
+        logger.error(f"Failed to remove account:{id} from cache due to error:{str(err)}")
+
+
+def local_cache_metrics() -> dict:
+    return local_accounts.metrics()
+
+
+def single_flight_metrics() -> dict:
+    return {
+        'account_reads': account_reads.metrics(),
+        'account_lookups': account_lookups.metrics(),
+    }
+
+
+async def get_account_from_redis_or_db(id: str) -> AccountInDB | None:
+    # Recently looked up and not found
+    if is_missing_locally(field='id', value=id):
+        return None
+
+    try:
+        account_data, ttl_ms, missing, changed = await fetch_account_with_ttl(id=id)
+        if missing:
+            return None
+
+        if changed:
+            # The cache is not filled until the change is applied, no lock holder would fill it
+            return await get_account_by_id(id=id)
+
+        if account_data is not None:
+            # Refresh a hot account before it expires, other requests keep using the cached copy
+            if should_refresh_early(ttl_ms=ttl_ms):
+                logger.info(f"Refreshing account:{id} before expiry.")
+                acquired, fresh_account = await try_load_account(id=id)
+                if acquired:
+                    return fresh_account
+            return account_data
+
+        logger.warning(f"Account:{id} not fount in cache.")
+        deadline = time.monotonic() + settings.api_account_cache_lock_ms / 1000
+
+        while time.monotonic() < deadline:
+            acquired, account_data = await try_load_account(id=id)
+            if acquired:
+                return account_data
+
+            # Wait for the request holding the lock to fill the cache
+            await asyncio.sleep(settings.api_account_cache_lock_poll_ms / 1000)
+            account_data, _, missing, _ = await fetch_account_with_ttl(id=id)
+            if account_data is not None or missing:
+                return account_data
+
+    except Exception as err:
+        logger.error(f"Failed to read account:{id} through cache due to error:{str(err)}")
+
+    # Cache unavailable or the lock holder is too slow
+    return await get_account_by_id(id=id)
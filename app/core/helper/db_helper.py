@@ -1,11 +1,178 @@
-from core.connection.db_connection import account_col
+from core.connection.db_connection import get_account_col, get_account_read_col
 
-from core.model.account_model import AccountInDB
+from core.model.account_model import AccountInDB, AccountContact
+
+from core.model.role_model import Role
+
+from core.helper.single_flight import SingleFlight
+
+from core.helper.negative_cache_helper import is_known_missing, is_missing_locally, remember_missing, remember_missing_many
 
 from pydantic import EmailStr
 
+from core.utils.settings import settings
+
 from core.utils.init_log import logger
 
+import asyncio
+
+
+# Fields returned for each kind of lookup, None is the whole document
+ACCOUNT_FIELDS: dict[str, dict | None] = {
+    'account': None,
+    'contact': {'_id': 1, 'email': 1, 'firstname': 1, 'phone_number': 1},
+}
+
+# Document key of every AccountInDB field, e.g. _id for id
+ACCOUNT_DOCUMENT_KEYS = tuple((field.alias or name, name) for name, field in AccountInDB.model_fields.items())
+
+# Concurrent lookups of the same account share one query
+account_lookups = SingleFlight()
+
+
+def account_projection(field: str, fields: str) -> dict | None:
+    # An existence check only returns the looked up field, so its index covers the query
+    if fields == 'exists':
+        return {'_id': 0, field: 1}
+    return ACCOUNT_FIELDS[fields]
+
+
+def to_account(document: dict | None) -> AccountInDB | None:
+    """
+    This is used to build an account from a document of our own database or cache without validating it.
+    Only the model fields are kept, other document keys are dropped.
+    @params {document} - The account document.
+    @returns {AccountInDB} - The account, None if there is no document.
+    """
+
+    if not document:
+        return None
+
+    values = {name: document[key] for key, name in ACCOUNT_DOCUMENT_KEYS if key in document}
+    if isinstance(values.get('role'), dict):
+        values['role'] = Role.model_construct(**values['role'])
+    return AccountInDB.model_construct(**values)
+
+
+def lookup_collection(fields: str):
+    # Lean lookups only check or validate, so they can be served by a secondary
+    if fields == 'account':
+        return get_account_col()
+    return get_account_read_col()
+
+
+async def find_account(field: str, value: str, fields: str = 'account'):
+    # Skip the query for recent misses
+    if await is_known_missing(field=field, value=value):
+        return None
+
+    # Query
+    response = await lookup_collection(fields=fields).find_one(filter={field: value}, projection=account_projection(field=field, fields=fields))
+
+    # Remember the miss
+    if not response:
+        await remember_missing(field=field, value=value)
+
+    return response
+
+
+async def lookup_account(field: str, value: str, fields: str = 'account'):
+    # Query, concurrent and recently missed lookups are answered without the database
+    return await account_lookups.do(f"{fields}:{field}:{value}", lambda: find_account(field=field, value=value, fields=fields))
+
+
+async def has_account(field: str, value: str) -> bool:
+    """
+    This is used to check if an account exists without fetching it.
+    @params {field} - The field to match, e.g. email or phone_number.
+    @params {value} - The value registered to the account.
+    @returns {bool} - True if an account has the value.
+    """
+
+    response = await lookup_account(field=field, value=value, fields='exists')
+    return response is not None
+
+
+async def get_account_contact(field: str, value: str) -> AccountContact | None:
+    """
+    This is used to retrieve the id, email, firstname and phone number of an account.
+    @params {field} - The field to match, e.g. email or phone_number.
+    @params {value} - The value registered to the account.
+    @returns {AccountContact} - The contact fields of the account, None if not found.
+    """
+
+    response = await lookup_account(field=field, value=value, fields='contact')
+    if not response:
+        return None
+
+    return AccountContact.model_construct(**response)
+
+
+async def find_accounts(field: str, values: list[str], fields: str = 'account', missing_field: str | None = None) -> dict[str, dict]:
+    """
+    This is used to retrieve many accounts with $in queries of at most api_db_batch_size values.
+    @params {field} - The field to match, e.g. _id or email.
+    @params {values} - The values registered to the accounts.
+    @params {fields} - The named field set to return.
+    @params {missing_field} - The negative cache name of the field, defaults to the field.
+    @returns {dict} - A dict of value to account document, values without an account are left out.
+    """
+
+    missing_field = missing_field or field
+
+    # Skip duplicates and recent misses
+    values = [value for value in dict.fromkeys(values) if not is_missing_locally(field=missing_field, value=value)]
+    if not values:
+        return {}
+
+    collection = lookup_collection(fields=fields)
+    projection = account_projection(field=field, fields=fields)
+    batch_size = settings.api_db_batch_size
+
+    async def find_chunk(chunk: list[str]) -> list[dict]:
+        cursor = collection.find({field: {'$in': chunk}}, projection=projection)
+        return await cursor.to_list(length=None)
+
+    # Query every chunk concurrently
+    chunks = await asyncio.gather(*(find_chunk(values[i:i + batch_size]) for i in range(0, len(values), batch_size)))
+    accounts = {account[field]: account for chunk in chunks for account in chunk}
+
+    # Remember the misses
+    missing = [value for value in values if value not in accounts]
+    if missing:
+        await remember_missing_many(field=missing_field, values=missing)
+
+    return accounts
+
+
+async def get_account_documents_by_ids(ids: list[str]) -> dict[str, dict]:
+    # Raw documents, used to fill the cache
+    return await find_accounts(field='_id', values=ids, missing_field='id')
+
+
+async def get_accounts_by_ids(ids: list[str]) -> dict[str, AccountInDB]:
+    """
+    This is used to retrieve many accounts from the database using their ids.
+    @params {ids} - The ids of the accounts.
+    @returns {dict} - A dict of id to account, ids without an account are left out.
+    """
+
+    documents = await get_account_documents_by_ids(ids=ids)
+    return {id: to_account(document) for id, document in documents.items()}
+
+
+async def get_accounts_by_emails(emails: list[EmailStr]) -> dict[str, AccountInDB]:
+    """
+    This is used to retrieve many accounts from the database using their emails.
+    @params {emails} - The emails registered to the accounts.
+    @returns {dict} - A dict of email to account, emails without an account are left out.
+    """
+
+    accounts = await find_accounts(field='email', values=[str(email) for email in emails])
+
+    # Deserialize
+    return {email: to_account(account) for email, account in accounts.items()}
+
 
 async def get_account_by_email(email: EmailStr):
     """    
@@ -15,27 +182,24 @@ async def get_account_by_email(email: EmailStr):
     
     """
     
-    # Filter
-    filter = {"email": email}
-
     # Query
-    response = await account_col.find_one(filter=filter)
+    response = await lookup_account(field='email', value=email)
 
     # Check if response is None
     if not response:
         return None
     
-    # Deserialize
-    account_obj = AccountInDB(**response)
+    # Deserialize, documents from our own database are trusted
+    account_obj = to_account(response)
 
     return account_obj
 
 
-async def get_account_by_id(id: str):
+async def get_account_document_by_id(id: str) -> dict | None:
     logger.info('Fetching account from database')
 
     """
-    This is used to retrieve accounts from the database using the id.
+    This is used to retrieve the raw account document from the database using the id.
     @params {id} - The id registered to the account.
     @returns {object} - A dict containing the account data
     """
@@ -44,8 +208,8 @@ async def get_account_by_id(id: str):
     filter = {"_id": id}
 
     # Query
-    response = await account_col.find_one(filter=filter)
-    print(response)
+    response = await get_account_col().find_one(filter=filter)
+
     # Check if response is None
     if not response:
         return None
@@ -53,6 +217,16 @@ async def get_account_by_id(id: str):
     return response
 
 
+async def get_account_by_id(id: str) -> AccountInDB | None:
+    """
+    This is used to retrieve accounts from the database using the id.
+    @params {id} - The id registered to the account.
+    @returns {AccountInDB} - The account, None if not found.
+    """
+
+    return to_account(await get_account_document_by_id(id=id))
+
+
 async def get_account_by_phone_number(phone_number: str):
     """
     This is used to retrieve accounts from the database using the id.
@@ -60,18 +234,15 @@ async def get_account_by_phone_number(phone_number: str):
     @returns {object} - A dict containing the account data
     """
     
-    # Filter
-    filter = {"phone_number": phone_number}
-
     # Query
-    response = await account_col.find_one(filter=filter)
+    response = await lookup_account(field='phone_number', value=phone_number)
 
     # Check if response is None
     if not response:
         return None
     
-    # Deserialize
-    account_obj = AccountInDB(**response)
+    # Deserialize, documents from our own database are trusted
+    account_obj = to_account(response)
 
     return account_obj
 
@@ -0,0 +1,351 @@
+from core.connection.db_connection import get_account_col
+from core.connection.cache_connection import redis
+from core.helper.bloom_filter import BloomFilter, BLOOM_HEADER
+from core.utils.settings import settings
+from core.utils.init_log import logger
+import asyncio
+import time
+import uuid
+
+
+# Shared bitmap, its header and generation, and creates waiting for a bitmap to be published
+EMAIL_FILTER_KEY = 'bloom:emails'
+EMAIL_FILTER_META_KEY = 'bloom:emails:meta'
+EMAIL_FILTER_PENDING_KEY = 'bloom:emails:pending'
+
+# Sets bits on the bitmap of the caller's generation, while no bitmap is published the email is
+# buffered for the publisher. Returns 1 if added, 0 if buffered and -1 for another generation
+ADD_EMAIL_SCRIPT = """
+local meta = redis.call('GET', KEYS[2])
+if not meta or redis.call('EXISTS', KEYS[1]) == 0 then
+    redis.call('SADD', KEYS[3], ARGV[2])
+    return 0
+end
+if string.sub(meta, -string.len(ARGV[1])) ~= ARGV[1] then
+    return -1
+end
+for i = 3, #ARGV do
+    redis.call('SETBIT', KEYS[1], ARGV[i], 1)
+end
+return 1
+"""
+add_email_script = redis.register_script(ADD_EMAIL_SCRIPT)
+
+# Publishes the header only once no create is buffered, later creates then go to the bitmap
+PUBLISH_EMAIL_FILTER_SCRIPT = """
+if redis.call('SCARD', KEYS[2]) > 0 then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[1])
+return 1
+"""
+publish_email_filter_script = redis.register_script(PUBLISH_EMAIL_FILTER_SCRIPT)
+
+# Passes over buffered creates before giving up on publishing
+PUBLISH_ATTEMPTS = 10
+
+# Emails of registered accounts, None until the first build finishes
+registered_emails: BloomFilter | None = None
+
+# Filter being built, creates during the scan are added to it too
+_building: BloomFilter | None = None
+_build_task: asyncio.Task | None = None
+
+# Shared bitmap is complete and can answer checks, and the generation it was read for
+shared_filter_ready = False
+shared_generation: bytes | None = None
+
+# Creates this pod failed to add to the shared bitmap, added again by the next build
+_unsynced_emails: set[str] = set()
+
+# Metrics
+rebuild_seconds: float | None = None
+checks = 0
+skipped_queries = 0
+false_positives = 0
+
+
+def new_email_filter() -> BloomFilter:
+    return BloomFilter.for_capacity(capacity=settings.api_email_filter_capacity, error_rate=settings.api_email_filter_error_rate)
+
+
+async def scan_registered_emails() -> BloomFilter:
+    global _building
+
+    _building = new_email_filter()
+    try:
+        # Stream the email of every account in batches, from the primary so no recent account is missed
+        cursor = get_account_col().find({}, projection={'_id': 0, 'email': 1}, batch_size=settings.api_email_filter_batch_size)
+        async for account in cursor:
+            email = account.get('email')
+            if email:
+                _building.add(str(email))
+        return _building
+    finally:
+        _building = None
+
+
+def meta_generation(meta: bytes | None) -> bytes | None:
+    return meta[BLOOM_HEADER.size:] if meta else None
+
+
+async def shared_filter_matches(email_filter: BloomFilter) -> bytes | None:
+    # Header and generation of the shared bitmap if it exists with the same parameters
+    async with redis.pipeline(transaction=False) as pipe:
+        pipe.get(EMAIL_FILTER_META_KEY.encode())
+        pipe.exists(EMAIL_FILTER_KEY.encode())
+        meta, exists = await pipe.execute()
+
+    # Headers written before generations were added are replaced too
+    if not exists or not meta_generation(meta=meta):
+        return None
+
+    _, hash_count, size_bits, _ = BLOOM_HEADER.unpack_from(meta, 0)
+    if hash_count != email_filter.hash_count or size_bits != email_filter.size_bits:
+        return None
+    return meta
+
+
+async def merge_pending_emails(email_filter: BloomFilter) -> None:
+    # Creates buffered while no bitmap was published
+    emails = await redis.smembers(EMAIL_FILTER_PENDING_KEY.encode())
+    if not emails:
+        return
+
+    async with redis.pipeline(transaction=True) as pipe:
+        for email in emails:
+            email = email.decode()
+            email_filter.add(email)
+            for position in email_filter.positions(email):
+                pipe.setbit(EMAIL_FILTER_KEY.encode(), position, 1)
+        pipe.srem(EMAIL_FILTER_PENDING_KEY.encode(), *emails)
+        await pipe.execute()
+
+
+async def publish_email_filter(email_filter: BloomFilter) -> bytes:
+    """
+    This is used to merge a scanned filter into the shared bitmap.
+    @params {email_filter} - The filter built from the database.
+    @returns {bytes} - The published header and generation.
+    """
+
+    meta = await shared_filter_matches(email_filter=email_filter)
+    if meta is None:
+        # Sized differently or missing, start a new generation. Pods probing the old one
+        # see the header change and reload, creates are buffered until it is published
+        logger.warning('Replacing shared email filter.')
+        async with redis.pipeline(transaction=True) as pipe:
+            pipe.delete(EMAIL_FILTER_META_KEY.encode())
+            pipe.delete(EMAIL_FILTER_KEY.encode())
+            await pipe.execute()
+        generation = uuid.uuid4().bytes
+    else:
+        generation = meta_generation(meta=meta)
+
+    # Merge into the shared bitmap, bits are only added so creates on other pods are kept
+    staging_key = f"{EMAIL_FILTER_KEY}:{uuid.uuid4().hex}".encode()
+    async with redis.pipeline(transaction=True) as pipe:
+        pipe.set(staging_key, bytes(email_filter.bits), ex=60)
+        pipe.bitop('OR', EMAIL_FILTER_KEY.encode(), EMAIL_FILTER_KEY.encode(), staging_key)
+        pipe.delete(staging_key)
+        await pipe.execute()
+
+    # Creates buffered meanwhile are merged on the next pass
+    for _ in range(PUBLISH_ATTEMPTS):
+        await merge_pending_emails(email_filter=email_filter)
+        meta = email_filter.header() + generation
+        keys = [EMAIL_FILTER_META_KEY.encode(), EMAIL_FILTER_PENDING_KEY.encode()]
+        if await publish_email_filter_script(keys=keys, args=[meta]):
+            return meta
+
+    raise RuntimeError('Creates kept being buffered, shared email filter not published.')
+
+
+async def add_shared_email(email: str) -> int:
+    # Positions are only valid for the generation they were computed for
+    email_filter = registered_emails or new_email_filter()
+    keys = [EMAIL_FILTER_KEY.encode(), EMAIL_FILTER_META_KEY.encode(), EMAIL_FILTER_PENDING_KEY.encode()]
+    return await add_email_script(keys=keys, args=[shared_generation or b'', str(email), *email_filter.positions(str(email))])
+
+
+async def add_unsynced_emails() -> None:
+    while _unsynced_emails:
+        email = next(iter(_unsynced_emails))
+        if await add_shared_email(email=email) != 1:
+            raise RuntimeError('Shared email filter changed while adding unsynced emails.')
+        _unsynced_emails.discard(email)
+
+
+async def build_email_filter() -> None:
+    """
+    This is used to build the filter of registered emails from the database.
+    In shared mode an existing bitmap with the same parameters is reused.
+    """
+
+    global registered_emails, rebuild_seconds, shared_filter_ready, shared_generation
+
+    started_at = time.perf_counter()
+
+    if settings.api_email_filter_shared:
+        email_filter = new_email_filter()
+        meta = await shared_filter_matches(email_filter=email_filter)
+        if meta is not None:
+            logger.info('Using shared email filter.')
+            email_filter.count = BLOOM_HEADER.unpack_from(meta, 0)[3]
+            registered_emails = email_filter
+            shared_generation = meta_generation(meta=meta)
+            await add_unsynced_emails()
+            shared_filter_ready = True
+            rebuild_seconds = time.perf_counter() - started_at
+            return
+
+    logger.info('Building email filter.')
+    email_filter = await scan_registered_emails()
+
+    if settings.api_email_filter_shared:
+        meta = await publish_email_filter(email_filter=email_filter)
+        shared_generation = meta_generation(meta=meta)
+        await add_unsynced_emails()
+        shared_filter_ready = True
+
+    registered_emails = email_filter
+    rebuild_seconds = time.perf_counter() - started_at
+    logger.info(f"Built email filter: {email_filter_metrics()}")
+
+
+def email_filter_ready() -> bool:
+    return registered_emails is not None and (shared_filter_ready or not settings.api_email_filter_shared)
+
+
+async def email_may_exist(email: str) -> bool:
+    """
+    This is used to check if an email might belong to an account.
+    @params {email} - The email to check.
+    @returns {bool} - False only if no account has the email.
+    """
+
+    global checks, skipped_queries, shared_filter_ready
+
+    # Not built yet, the database has to answer
+    if not email_filter_ready():
+        if settings.api_email_filter_shared and registered_emails is not None:
+            start_build()
+        return True
+
+    checks += 1
+    positions = registered_emails.positions(str(email))
+
+    if settings.api_email_filter_shared:
+        try:
+            # Check every bit in one round-trip
+            async with redis.pipeline(transaction=False) as pipe:
+                pipe.get(EMAIL_FILTER_META_KEY.encode())
+                pipe.exists(EMAIL_FILTER_KEY.encode())
+                for position in positions:
+                    pipe.getbit(EMAIL_FILTER_KEY.encode(), position)
+                meta, exists, *bits = await pipe.execute()
+        except Exception as err:
+            logger.error(f"Failed to check shared email filter due to error: {str(err)}")
+            return True
+
+        if not exists or meta_generation(meta=meta) != shared_generation:
+            # An evicted bitmap would answer "not present" for everything, a replaced one
+            # has other parameters or lacks creates buffered while it was rebuilt
+            logger.error('Shared email filter is missing or was replaced, reloading.')
+            shared_filter_ready = False
+            start_build()
+            return True
+
+        present = all(bits)
+    else:
+        present = str(email) in registered_emails
+
+    if not present:
+        skipped_queries += 1
+    return present
+
+
+def record_false_positive() -> None:
+    # The filter answered maybe and the database found nothing
+    global false_positives
+    false_positives += 1
+
+
+async def add_registered_email(email: str) -> None:
+    # Called when this service emits a create account event
+    global shared_filter_ready
+
+    if registered_emails is not None:
+        registered_emails.add(str(email))
+    if _building is not None:
+        _building.add(str(email))
+
+    if settings.api_email_filter_shared:
+        try:
+            added = await add_shared_email(email=email)
+        except Exception as err:
+            logger.error(f"Failed to add email to shared email filter due to error: {str(err)}")
+            added = None
+
+        if added != 1:
+            # Buffered emails are merged by the publisher, others are added again by the next build.
+            # Until then this pod cannot answer from the shared bitmap
+            if added != 0:
+                _unsynced_emails.add(str(email))
+            shared_filter_ready = False
+            start_build()
+
+
+def email_filter_metrics() -> dict:
+    absent_checks = skipped_queries + false_positives
+    return {
+        'ready': email_filter_ready(),
+        'shared': settings.api_email_filter_shared,
+        'rebuild_seconds': rebuild_seconds,
+        'items': registered_emails.count if registered_emails is not None else 0,
+        'size_bytes': len(registered_emails.bits) if registered_emails is not None else 0,
+        'expected_false_positive_rate': registered_emails.false_positive_rate() if registered_emails is not None else None,
+        'observed_false_positive_rate': false_positives / absent_checks if absent_checks else None,
+        'checks': checks,
+        'skipped_queries': skipped_queries,
+        'false_positives': false_positives,
+        'unsynced_emails': len(_unsynced_emails),
+    }
+
+
+async def _build() -> None:
+    try:
+        await build_email_filter()
+    except Exception as err:
+        # Checks go to the database until a build succeeds
+        logger.error(f"Failed to build email filter due to error: {str(err)}")
+
+
+def start_build() -> None:
+    global _build_task
+
+    if _build_task is None or _build_task.done():
+        _build_task = asyncio.create_task(_build())
+
+
+async def start_email_filter() -> None:
+    if not settings.api_email_filter_enabled:
+        return
+
+    if not settings.api_email_filter_shared:
+        logger.warning('Email filter is local to this pod, other replicas\' sign-ups will not be seen.')
+
+    # Build in the background, large collections take a while to scan
+    start_build()
+
+
+async def stop_email_filter() -> None:
+    global _build_task
+
+    if _build_task is not None:
+        _build_task.cancel()
+        try:
+            await _build_task
+        except asyncio.CancelledError:
+            pass
+        _build_task = None
@@ -0,0 +1,47 @@
+from core.connection.cache_connection import redis
+from core.helper.cache_helper import release_lock
+from core.event.partition_key import normalize_email
+from core.utils.settings import settings
+from core.utils.init_log import logger
+from pydantic import EmailStr
+import uuid
+
+
+# Token used when redis is unavailable, the database check still runs
+UNRESERVED = ''
+
+
+def email_reservation_key(email: EmailStr) -> str:
+    return f"reservation:email:{normalize_email(email)}"
+
+
+async def reserve_email(email: EmailStr) -> str | None:
+    """
+    This is used to reserve an email for a sign-up, only one concurrent sign-up per email succeeds.
+    @params {email} - The email to reserve.
+    @returns {str} - The reservation token, None if the email is already reserved.
+    """
+
+    token = uuid.uuid4().hex
+
+    try:
+        # Expires once the create event had time to reach the database
+        reserved = await redis.set(email_reservation_key(email=email).encode(), token, nx=True, ex=settings.api_email_reservation_ttl)
+    except Exception as err:
+        logger.error(f"Failed to reserve email due to error: {str(err)}")
+        return UNRESERVED
+
+    if not reserved:
+        return None
+    return token
+
+
+async def release_email(email: EmailStr, token: str) -> None:
+    if token == UNRESERVED:
+        return
+
+    try:
+        # Delete only our own reservation
+        await release_lock(keys=[email_reservation_key(email=email).encode()], args=[token])
+    except Exception as err:
+        logger.error(f"Failed to release email reservation due to error: {str(err)}")
@@ -1,6 +1,11 @@
+import binascii
 import hashlib
 
 
+# Standard to url safe base64 alphabet
+URLSAFE_ALPHABET = bytes.maketrans(b'+/', b'-_')
+
+
 def encrypt(value: str) -> str:
     # encode string
     encoded_str = value.encode()
@@ -10,4 +15,10 @@ def encrypt(value: str) -> str:
 
     
     # return the hashed_str
-    return encrypted_str_obj.hexdigest()
\ No newline at end of file
+    return encrypted_str_obj.hexdigest()
+
+
+def keyed_digest(value: str, key: bytes, digest_size: int = 16) -> str:
+    # Keyed BLAKE2b, url safe base64 without padding
+    digest = hashlib.blake2b(value.encode(), key=key, digest_size=digest_size).digest()
+    return binascii.b2a_base64(digest, newline=False).rstrip(b'=').translate(URLSAFE_ALPHABET).decode()
@@ -0,0 +1,83 @@
+from core.connection.db_connection import get_account_col
+from core.helper.db_helper import account_projection, lookup_collection
+from core.utils.settings import settings
+from core.utils.init_log import logger
+from pymongo import ASCENDING, IndexModel
+
+
+# Indexes every account lookup relies on
+ACCOUNT_INDEXES = [
+    IndexModel([('email', ASCENDING)], name='email_unique', unique=True),
+    IndexModel([('phone_number', ASCENDING)], name='phone_number'),
+]
+
+# Lookup shapes checked at startup: name, field, field set and whether the index alone should answer it
+QUERY_SHAPES = [
+    ('email exists', 'email', 'exists', True),
+    ('phone_number exists', 'phone_number', 'exists', True),
+    ('email contact', 'email', 'contact', False),
+    ('phone_number contact', 'phone_number', 'contact', False),
+    ('email account', 'email', 'account', False),
+    ('phone_number account', 'phone_number', 'account', False),
+]
+
+
+def plan_stages(plan: dict) -> list[str]:
+    # Stage names of a winning plan, from the root down
+    stages = []
+    pending = [plan]
+    while pending:
+        stage = pending.pop()
+        stages.append(stage.get('stage'))
+        if 'inputStage' in stage:
+            pending.append(stage['inputStage'])
+        pending.extend(stage.get('inputStages', []))
+    return stages
+
+
+def winning_plan(explain: dict) -> dict:
+    # The slot based engine nests the plan under queryPlan
+    plan = explain['queryPlanner']['winningPlan']
+    return plan.get('queryPlan', plan)
+
+
+def plan_problem(stages: list[str], covered: bool) -> str | None:
+    if 'COLLSCAN' in stages or 'IXSCAN' not in stages:
+        return 'not indexed'
+    if covered and 'FETCH' in stages:
+        return 'not covered by its index'
+    return None
+
+
+async def ensure_indexes() -> None:
+    # Creating an index that already exists with the same spec is a no-op
+    logger.info('Ensuring account indexes.')
+    names = await get_account_col().create_indexes(ACCOUNT_INDEXES)
+    logger.info(f"Account indexes: {names}")
+
+
+async def check_query_plans() -> list[str]:
+    """
+    This is used to check that every account lookup is answered by an index.
+    @returns {list} - The names of the lookups with a problem.
+    """
+
+    problems = []
+    for name, field, fields, covered in QUERY_SHAPES:
+        explain = await lookup_collection(fields=fields).find({field: ''}, projection=account_projection(field=field, fields=fields)).limit(1).explain()
+        problem = plan_problem(stages=plan_stages(winning_plan(explain)), covered=covered)
+        if problem:
+            logger.warning(f"Account lookup by {name} is {problem}.")
+            problems.append(name)
+    return problems
+
+
+async def start_indexes() -> None:
+    try:
+        if settings.api_db_ensure_indexes:
+            await ensure_indexes()
+        if settings.api_db_check_query_plans:
+            await check_query_plans()
+    except Exception as err:
+        # Lookups still work without the indexes, only slower
+        logger.error(f"Failed to manage account indexes due to error: {str(err)}")
@@ -0,0 +1,91 @@
+from collections import OrderedDict
+import time
+import typing
+
+
+class LocalCache:
+    """
+    Bounded in-process LRU cache with a per-entry TTL and a memory budget.
+    Entry sizes are given by the caller, usually the length of the serialized value.
+    """
+
+    # Rough bookkeeping cost of one entry, so tiny values still count against the budget
+    ENTRY_OVERHEAD = 256
+
+    def __init__(self, max_bytes: int, ttl: float, clock: typing.Callable[[], float] = time.monotonic):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.clock = clock
+        self.entries: OrderedDict[str, tuple[float, int, typing.Any]] = OrderedDict()
+        self.size_bytes = 0
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key: str) -> typing.Any:
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, _, value = entry
+        if self.clock() >= expires_at:
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value: typing.Any, size: int) -> None:
+        size += self.ENTRY_OVERHEAD
+
+        # Values larger than the whole budget are not cached
+        if size > self.max_bytes:
+            return
+
+        if key in self.entries:
+            self._remove(key)
+
+        self.entries[key] = (self.clock() + self.ttl, size, value)
+        self.size_bytes += size
+
+        # Evict least recently used entries until within budget
+        while self.size_bytes > self.max_bytes:
+            oldest_key = next(iter(self.entries))
+            self._remove(oldest_key)
+            self.evictions += 1
+
+    def invalidate(self, key: str) -> None:
+        if key in self.entries:
+            self._remove(key)
+            self.invalidations += 1
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self.size_bytes = 0
+
+    def _remove(self, key: str) -> None:
+        _, size, _ = self.entries.pop(key)
+        self.size_bytes -= size
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def metrics(self) -> dict:
+        return {
+            'entries': len(self.entries),
+            'size_bytes': self.size_bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'invalidations': self.invalidations,
+        }
@@ -0,0 +1,66 @@
+from schema_registry.client import schema as registry_schema
+from schema_registry.client.utils import SchemaVersion
+import typing
+
+
+class LocalSchemaRegistryClient:
+    """
+    In-process stand-in for AsyncSchemaRegistryClient, used when
+    api_schema_registry_local is set (offline development and tests).
+    Like the real registry, an identical schema gets the same id under every subject.
+    """
+
+    def __init__(self) -> None:
+        self.requests = 0
+        self._ids: dict[str, int] = {}
+        self._schemas: dict[int, registry_schema.AvroSchema] = {}
+        self._subjects: dict[str, list[int]] = {}
+
+    async def register(self, subject: str, schema: typing.Union[registry_schema.AvroSchema, str, dict], **kwargs) -> int:
+        self.requests += 1
+
+        if not isinstance(schema, registry_schema.AvroSchema):
+            schema = registry_schema.AvroSchema(schema)
+
+        schema_key = str(schema)
+        schema_id = self._ids.get(schema_key)
+        if schema_id is None:
+            schema_id = len(self._ids) + 1
+            self._ids[schema_key] = schema_id
+            self._schemas[schema_id] = schema
+
+        versions = self._subjects.setdefault(subject, [])
+        if schema_id not in versions:
+            versions.append(schema_id)
+
+        return schema_id
+
+    async def get_subjects(self, **kwargs) -> list:
+        self.requests += 1
+        return list(self._subjects)
+
+    async def get_by_id(self, schema_id: int, **kwargs) -> registry_schema.AvroSchema | None:
+        self.requests += 1
+        return self._schemas.get(schema_id)
+
+    async def get_schema(self, subject: str, version: typing.Union[int, str] = 'latest', **kwargs) -> SchemaVersion | None:
+        self.requests += 1
+
+        versions = self._subjects.get(subject)
+        if not versions:
+            return None
+
+        index = len(versions) if version == 'latest' else int(version)
+        if index < 1 or index > len(versions):
+            return None
+
+        schema_id = versions[index - 1]
+        return SchemaVersion(subject=subject, schema_id=schema_id, schema=self._schemas[schema_id], version=index)
+
+    async def delete_subject(self, subject: str, **kwargs) -> list:
+        self.requests += 1
+        versions = self._subjects.pop(subject, [])
+        return list(range(1, len(versions) + 1))
+
+    async def aclose(self) -> None:
+        return None
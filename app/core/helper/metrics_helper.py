@@ -0,0 +1,59 @@
+from core.connection.cache_connection import cache_pool_metrics
+from core.event.produce_event import spool_metrics
+from core.helper.cache_helper import local_cache_metrics, single_flight_metrics
+from core.helper.email_filter_helper import email_filter_metrics
+from core.helper.negative_cache_helper import negative_cache_metrics
+from core.utils.settings import settings
+from core.utils.init_log import logger
+import asyncio
+import json
+
+
+# Background task logging the service metrics
+_metrics_task: asyncio.Task | None = None
+
+
+def service_metrics() -> dict:
+    """
+    This is used to collect the cache, lookup and event delivery metrics of the service.
+    @returns {dict} - The metrics of each component.
+    """
+
+    return {
+        'redis_pool': cache_pool_metrics(),
+        'local_accounts': local_cache_metrics(),
+        'single_flight': single_flight_metrics(),
+        'missing_accounts': negative_cache_metrics(),
+        'email_filter': email_filter_metrics(),
+        'event_spool': spool_metrics(),
+    }
+
+
+async def _log_metrics_periodically() -> None:
+    while True:
+        await asyncio.sleep(settings.api_metrics_log_interval)
+        try:
+            logger.info(f"Service metrics: {json.dumps(service_metrics(), default=str)}")
+        except Exception as err:
+            logger.warning(f"Failed to collect service metrics due to error: {str(err)}")
+
+
+async def start_metrics_log() -> None:
+    global _metrics_task
+
+    if settings.api_metrics_log_interval <= 0:
+        return
+
+    if _metrics_task is None:
+        _metrics_task = asyncio.create_task(_log_metrics_periodically())
+
+
+async def stop_metrics_log() -> None:
+    global _metrics_task
+
+    if _metrics_task is not None:
+        _metrics_task.cancel()
+        _metrics_task = None
+
+    # Final snapshot, counters are lost on shutdown
+    logger.info(f"Service metrics: {json.dumps(service_metrics(), default=str)}")
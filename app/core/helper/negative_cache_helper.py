@@ -0,0 +1,83 @@
+from core.connection.cache_connection import redis
+from core.helper.local_cache import LocalCache
+from core.utils.settings import settings
+from core.utils.init_log import logger
+
+
+# Lookups known to find no account, kept in process and shared through redis
+missing_accounts = LocalCache(max_bytes=settings.api_missing_account_local_max_bytes, ttl=settings.api_missing_account_local_ttl)
+
+
+def missing_account_key(field: str, value: str) -> str:
+    return f"missing:account:{field}:{value}"
+
+
+def is_missing_locally(field: str, value: str) -> bool:
+    return missing_accounts.get(missing_account_key(field=field, value=value)) is not None
+
+
+def remember_missing_locally(key: str) -> None:
+    missing_accounts.set(key, True, size=len(key))
+
+
+async def is_known_missing(field: str, value: str) -> bool:
+    """
+    This is used to check if a lookup recently found no account.
+    @params {field} - The account field looked up, id, email or phone_number.
+    @params {value} - The value looked up.
+    @returns {bool} - True if no account was found within the negative TTL.
+    """
+
+    key = missing_account_key(field=field, value=value)
+    if missing_accounts.get(key) is not None:
+        return True
+
+    try:
+        missing = await redis.exists(key.encode())
+    except Exception as err:
+        logger.error(f"Failed to check missing account:{key} due to error:{str(err)}")
+        return False
+
+    if missing:
+        remember_missing_locally(key=key)
+    return bool(missing)
+
+
+async def remember_missing(field: str, value: str) -> None:
+    key = missing_account_key(field=field, value=value)
+    remember_missing_locally(key=key)
+
+    try:
+        await redis.set(key.encode(), 1, ex=settings.api_missing_account_ttl)
+    except Exception as err:
+        logger.error(f"Failed to cache missing account:{key} due to error:{str(err)}")
+
+
+async def remember_missing_many(field: str, values: list[str]) -> None:
+    keys = [missing_account_key(field=field, value=value) for value in values]
+    for key in keys:
+        remember_missing_locally(key=key)
+
+    try:
+        # One round-trip for every miss of a batched lookup
+        async with redis.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.set(key.encode(), 1, ex=settings.api_missing_account_ttl)
+            await pipe.execute()
+    except Exception as err:
+        logger.error(f"Failed to cache {len(keys)} missing accounts due to error:{str(err)}")
+
+
+async def forget_missing(field: str, value: str) -> None:
+    # Called when this service emits an event that creates the account or field
+    key = missing_account_key(field=field, value=value)
+    missing_accounts.invalidate(key)
+
+    try:
+        await redis.delete(key.encode())
+    except Exception as err:
+        logger.error(f"Failed to remove missing account:{key} due to error:{str(err)}")
+
+
+def negative_cache_metrics() -> dict:
+    return missing_accounts.metrics()
@@ -1,41 +1,199 @@
 from core.connection.cache_connection import redis
 from pydantic import EmailStr
 from core.utils.init_log import logger
-from core.helper.encryption_helper import encrypt
+from core.helper.encryption_helper import encrypt, keyed_digest
+from core.utils.settings import settings
 from fastapi import HTTPException, status
 from core.model.otp_model import OTPAvroIn
 from datetime import datetime, timezone
 
 
+# Reads and deletes an OTP in one step, so concurrent or replayed checks cannot both succeed.
+# KEYS are the OTP key in every accepted scheme, the first existing one is used and all are deleted.
+# ARGV[i] is '1' when the TTL of KEYS[i] is trusted to end at expires_on, those keys are answered
+# without the payload. Every other key, or one without a TTL (-1), is returned for an expires_on check.
+CONSUME_OTP_SCRIPT = """
+for index, key in ipairs(KEYS) do
+    local ttl = redis.call('PTTL', key)
+    if ttl ~= -2 then
+        local otp = false
+        if ttl < 0 or ARGV[index] ~= '1' then
+            otp = redis.call('GET', key)
+        end
+        redis.call('DEL', unpack(KEYS))
+        if otp then
+            return {ttl, otp}
+        end
+        return {ttl}
+    end
+end
+return nil
+"""
+consume_otp_script = redis.register_script(CONSUME_OTP_SCRIPT)
+
+# Deletes an OTP read earlier only if it is unchanged, so it can still be used once.
+# KEYS[1] is the key the OTP was read from, the other KEYS are its other schemes.
+CONSUME_READ_OTP_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', unpack(KEYS))
+end
+return 0
+"""
+consume_read_otp_script = redis.register_script(CONSUME_READ_OTP_SCRIPT)
+
+
+# OTP key scheme versions
+OTP_KEY_V1 = 1
+OTP_KEY_V2 = 2
+
+
+def otp_key(otp: str, email_or_phone_number: str, purpose: str, version: int = OTP_KEY_V1) -> str:
+    if version == OTP_KEY_V2:
+        # Keyed digest over every part, 22 characters instead of the 128 hex characters of v1
+        digest = keyed_digest(value=f"{email_or_phone_number}\0{purpose}\0{otp}", key=settings.api_otp_key_secret.encode())
+        return f"otp:2:{digest}"
+
+    # Encrypt otp
+    encrypted_otp = encrypt(value=otp)
+
+    # Create key
+    return f"otp:{email_or_phone_number}-{encrypted_otp}-{purpose}"
+
+
+def otp_key_versions() -> list[int]:
+    # Version 2 needs the secret, the configured version is tried first
+    if not settings.api_otp_key_secret:
+        return [OTP_KEY_V1]
+    if settings.api_otp_key_version != OTP_KEY_V2:
+        return [OTP_KEY_V1, OTP_KEY_V2]
+    if not settings.api_otp_key_accept_v1:
+        return [OTP_KEY_V2]
+    return [OTP_KEY_V2, OTP_KEY_V1]
+
+
+def otp_keys(otp: str, email_or_phone_number: str, purpose: str) -> list[bytes]:
+    # Every key the OTP may be stored under during a key scheme migration
+    return [otp_key(otp=otp, email_or_phone_number=email_or_phone_number, purpose=purpose, version=version).encode() for version in otp_key_versions()]
+
+
+def trusted_ttls() -> list[str]:
+    # Only v2 keys are written with a TTL that ends at expires_on, see store_otp
+    return ['1' if version == OTP_KEY_V2 else '0' for version in otp_key_versions()]
+
+
+def otp_ttl_ms(otp_obj: OTPAvroIn) -> int:
+    return int((otp_obj.expires_on - datetime.now(timezone.utc)).total_seconds() * 1000)
+
+
+async def store_otp(otp_obj: OTPAvroIn, otp: str, email_or_phone_number: str, purpose: str) -> None:
+    """
+    This is used to store an OTP the way the validators expect it.
+    The key expires with the OTP. For v2 keys validation trusts that TTL and skips the payload decode,
+    so every writer of v2 keys must set it to expires_on. v1 keys are always checked against expires_on.
+    @params {otp_obj} - The OTP to store.
+    @params {otp} - The plain one-time-password.
+    @params {email_or_phone_number} - The email or phone number the OTP was sent to.
+    @params {purpose} - The purpose of the OTP.
+    """
+
+    ttl_ms = otp_ttl_ms(otp_obj=otp_obj)
+    if ttl_ms <= 0:
+        return
+
+    key = otp_key(otp=otp, email_or_phone_number=email_or_phone_number, purpose=purpose, version=otp_key_versions()[0])
+    await redis.set(key.encode(), otp_obj.serialize(), px=ttl_ms)
+
+
+def is_live(otp_bytes: bytes) -> OTPAvroIn | None:
+    logger.info('Deserializing OTP')
+
+    # Deserialize OTP
+    deserialized_otp = OTPAvroIn.deserialize(data=otp_bytes)
+
+    # Check if OTP have expired
+    logger.info('Checking if OTP have expired.')
+    if datetime.now(timezone.utc) >= deserialized_otp.expires_on:
+        logger.info('Expired OTP')
+        return None
+
+    return deserialized_otp
+
+
+async def consume_otp(otp: str, email_or_phone_number: str, purpose: str) -> bool:
+    """
+    This is used to validate an OTP and consume it in one redis round-trip.
+    @params {otp} - The one-time-password sent by the client.
+    @params {email_or_phone_number} - The email or phone number the OTP was sent to.
+    @params {purpose} - The purpose of the OTP.
+    @returns {bool} - True if the OTP was valid. A valid OTP cannot be used again.
+    """
+
+    # Fetch and delete OTP
+    result = await consume_otp_script(keys=otp_keys(otp=otp, email_or_phone_number=email_or_phone_number, purpose=purpose), args=trusted_ttls())
+
+    # Check if otp was found
+    if not result:
+        return False
+
+    logger.info('OTP found.')
+
+    # No payload, redis expires the key at expires_on
+    if len(result) == 1:
+        return True
+
+    return is_live(otp_bytes=result[1]) is not None
+
+
+async def read_otp(otp: str, email_or_phone_number: str, purpose: str) -> tuple[list[bytes], bytes, OTPAvroIn] | None:
+    """
+    This is used to read a live OTP without consuming it, for checks that need its fields first.
+    @params {otp} - The one-time-password sent by the client.
+    @params {email_or_phone_number} - The email or phone number the OTP was sent to.
+    @params {purpose} - The purpose of the OTP.
+    @returns {tuple} - The OTP keys with the one it was found under first, its payload and the OTP. None if not valid.
+    """
+
+    keys = otp_keys(otp=otp, email_or_phone_number=email_or_phone_number, purpose=purpose)
+
+    # Get the OTP under every accepted key scheme
+    payloads = await redis.mget(keys)
+    for key, payload in zip(keys, payloads):
+        if payload:
+            logger.info('OTP found.')
+            otp_obj = is_live(otp_bytes=payload)
+            if otp_obj is None:
+                return None
+            return [key] + [other_key for other_key in keys if other_key != key], payload, otp_obj
+
+    return None
+
+
+async def get_valid_otp(otp: str, email_or_phone_number: str, purpose: str) -> tuple[list[bytes], bytes, OTPAvroIn] | None:
+    try:
+        # Validate the OTP, it is consumed later with consume_read_otp
+        return await read_otp(otp=otp, email_or_phone_number=email_or_phone_number, purpose=purpose)
+    except Exception as err:
+        logger.error(f"Failed to retrieve OTP due to error: {str(err)}")
+
+
+async def consume_read_otp(keys: list[bytes], payload: bytes) -> bool:
+    """
+    This is used to consume an OTP returned by get_valid_otp once the request checks passed.
+    @params {keys} - The OTP keys returned by get_valid_otp.
+    @params {payload} - The OTP payload returned by get_valid_otp.
+    @returns {bool} - False if the OTP was used or changed in the meantime, or redis failed.
+    """
+
+    try:
+        return bool(await consume_read_otp_script(keys=keys, args=[payload]))
+    except Exception as err:
+        logger.error(f"Failed to consume OTP due to error: {str(err)}")
+        return False
+
+
 async def is_valid_otp(otp: str, email_or_phone_number: str, purpose: str):
     try:
-        # Encrypt otp
-        encrypted_otp = encrypt(value=otp)
-
-        # Create key
-        key = f"otp:{email_or_phone_number}-{encrypted_otp}-{purpose}"
-
-        # Fetch OTP
-        otp_bytes = await redis.get(key.encode())
-
-        # Check if otp was found
-        if not otp_bytes:
-            return False
-        
-        logger.info('OTP found.')
-        logger.info('Deserializing OTP')
-
-        # Deserialize OTP
-        deserialized_otp = OTPAvroIn.deserialize(data=otp_bytes)
-
-        # Check if OTP have expired
-        logger.info('Checking if OTP have expired.')
-        if  datetime.now(timezone.utc) >= deserialized_otp.expires_on:
-            logger.info('Expired OTP')
-            return False
-        
-        return True
+        # Validate and consume the OTP
+        return await consume_otp(otp=otp, email_or_phone_number=email_or_phone_number, purpose=purpose)
     except Exception as err:
         logger.error(f"Failed to retrieve OTP due to error: {str(err)}")
-    finally:
-        await redis.close()
\ No newline at end of file
@@ -1,6 +1,8 @@
 from aiokafka.admin import AIOKafkaAdminClient, NewTopic
 from core.utils.settings import settings
+import asyncio
 import logging
+import time
 
 
 # Initialize logging
@@ -9,41 +11,177 @@ logging.basicConfig(level=logging.INFO,
 logger = logging.getLogger("Account Write API")
 
 
-async def topic_exists(topic: str):
-    try:
-        admin_client = AIOKafkaAdminClient(bootstrap_servers=settings.api_event_streaming_host, client_id=settings.api_event_streaming_client_id)
+# Shared admin client, created on first use or in the app lifespan
+admin_client: AIOKafkaAdminClient | None = None
+
+# Topics known to exist on the cluster
+known_topics: set[str] = set()
+topics_refreshed_at: float = 0.0
+
+_registry_lock = asyncio.Lock()
+_refresh_task: asyncio.Task | None = None
+
+
+def settings_topics() -> set[str]:
+    # Every topic this service produces to
+    return {
+        settings.api_phone_number_verified_topic,
+        settings.api_email_verified_topic,
+        settings.api_invalidate_cache_topic,
+        settings.api_create_account_topic,
+        settings.api_otp_topic,
+        settings.api_update_password_topic,
+        settings.api_cache_topic,
+        settings.api_revoke_refresh_token_topic,
+        settings.api_delete_account_topic,
+        settings.api_disable_enable_account_topic,
+        settings.api_account_update_request,
+        settings.api_reset_phone_number,
+        settings.api_update_phone_number,
+    }
+
+
+async def get_admin_client() -> AIOKafkaAdminClient:
+    global admin_client
+
+    if admin_client is None:
+        client = AIOKafkaAdminClient(bootstrap_servers=settings.api_event_streaming_host, client_id=settings.api_event_streaming_client_id)
         logger.info('Starting Kafka AdminClient.')
-        await admin_client.start()
-        
-        # Check if topic exists
-        existing_topics = await admin_client.list_topics()
-        if topic in existing_topics:
-            return True
-        return False    
-       
-    except Exception as err:
-        logger.error(f"Failed to start Kafka AdminClient due to error: {str(err)}", exc_info=1)
-    finally:
+        try:
+            await client.start()
+        except Exception:
+            await client.close()
+            raise
+        admin_client = client
+
+    return admin_client
+
+
+async def close_admin_client() -> None:
+    global admin_client
+
+    if admin_client is not None:
         logger.info('Closing Kafka AdminClient')
         await admin_client.close()
+        admin_client = None
+
+
+async def refresh_topics() -> set[str]:
+    global topics_refreshed_at
+
+    # List every topic in the cluster
+    client = await get_admin_client()
+    existing_topics = await client.list_topics()
+
+    known_topics.clear()
+    known_topics.update(existing_topics)
+    topics_refreshed_at = time.monotonic()
+    return known_topics
+
 
+def topics_are_stale() -> bool:
+    return time.monotonic() - topics_refreshed_at >= settings.api_topic_registry_refresh_interval
+
+
+async def topic_exists(topic: str) -> bool:
+    """
+    This is used to check if a topic exists, from the registry or a fresh listing once it is stale.
+    Raises if the cluster cannot be listed, an unknown answer must not lead to a create.
+    @params {topic} - The topic name.
+    @returns {bool} - True if the cluster has the topic.
+    """
+
+    # Check the registry before going to the cluster
+    if topic in known_topics:
+        return True
 
-async def create_topic(topic: str, partitions: int = 10, replication_factor: int = 3):
     try:
-        admin_client = AIOKafkaAdminClient(bootstrap_servers=settings.api_event_streaming_host, client_id=settings.api_event_streaming_client_id)
+        if topics_are_stale():
+            await refresh_topics()
+    except Exception as err:
+        logger.error(f"Failed to list topics due to error: {str(err)}", exc_info=1)
+        await close_admin_client()
+        raise
+
+    return topic in known_topics
 
-        # Start the admin client  
-        logger.info('Starting Kafka AdminClient.')  
-        await admin_client.start()
 
-        # Create a new topic
-        topic_list = []
-        topic_list.append(NewTopic(name=topic, num_partitions=partitions, replication_factor=replication_factor))
-        logger.info(f'Creating new topic:{topic} with {partitions} partition and {replication_factor} replication factor.')
-        await admin_client.create_topics(new_topics=topic_list, validate_only=False)
+async def create_topic(topic: str, partitions: int = settings.api_topic_partitions, replication_factor: int = settings.api_topic_replication_factor):
+    created_topics = await create_topics(topics=[topic], partitions=partitions, replication_factor=replication_factor)
+    if created_topics:
         return topic
+
+
+async def create_topics(topics: list[str], partitions: int = settings.api_topic_partitions, replication_factor: int = settings.api_topic_replication_factor):
+    try:
+        client = await get_admin_client()
+
+        # Create the new topics in a single request
+        topic_list = [NewTopic(name=topic, num_partitions=partitions, replication_factor=replication_factor) for topic in topics]
+        logger.info(f'Creating new topics:{topics} with {partitions} partition and {replication_factor} replication factor.')
+        await client.create_topics(new_topics=topic_list, validate_only=False)
+
+        known_topics.update(topics)
+        return topics
     except Exception as err:
-        logger.error(f"Failed to start Kafka AdminClient due to error: {str(err)}", exc_info=1)
-    finally:
-        logger.info('Closing Kafka AdminClient')
-        await admin_client.close()
\ No newline at end of file
+        logger.error(f"Failed to create topics:{topics} due to error: {str(err)}", exc_info=1)
+        await close_admin_client()
+        raise
+
+
+async def ensure_topic(topic: str) -> None:
+    # Fast path, no broker round-trip for known topics.
+    # Admin failures are raised, the event is spooled if they are retriable
+    if topic in known_topics:
+        return
+
+    async with _registry_lock:
+        if await topic_exists(topic=topic):
+            return
+
+        logger.info(f"Topic: {topic} not found.")
+        await create_topic(topic=topic)
+
+
+async def provision_topics() -> None:
+    async with _registry_lock:
+        await refresh_topics()
+
+        # Create every settings topic the cluster does not have yet
+        missing_topics = sorted(settings_topics() - known_topics)
+        if missing_topics:
+            await create_topics(topics=missing_topics)
+
+
+async def _refresh_topics_periodically() -> None:
+    while True:
+        await asyncio.sleep(settings.api_topic_registry_refresh_interval)
+        try:
+            async with _registry_lock:
+                await refresh_topics()
+        except Exception as err:
+            logger.warning(f"Failed to refresh topic registry due to error: {str(err)}")
+            await close_admin_client()
+
+
+async def start_topic_registry() -> None:
+    global _refresh_task
+
+    try:
+        logger.info('Provisioning event topics.')
+        await provision_topics()
+    except Exception as err:
+        logger.error(f"Failed to provision topics due to error: {str(err)}", exc_info=1)
+
+    if _refresh_task is None:
+        _refresh_task = asyncio.create_task(_refresh_topics_periodically())
+
+
+async def stop_topic_registry() -> None:
+    global _refresh_task
+
+    if _refresh_task is not None:
+        _refresh_task.cancel()
+        _refresh_task = None
+
+    await close_admin_client()
@@ -1,30 +1,167 @@
 from core.utils.settings import settings
-from schema_registry.client import AsyncSchemaRegistryClient, schema
+from core.utils.init_log import logger
+from core.helper.local_schema_registry import LocalSchemaRegistryClient
+from schema_registry.client import AsyncSchemaRegistryClient
+from schema_registry.client.schema import AvroSchema
+from schema_registry.client.utils import SchemaVersion
+import asyncio
+import httpx
+import time
+import typing
+
+
+class PooledSchemaRegistryClient(AsyncSchemaRegistryClient):
+    """
+    AsyncSchemaRegistryClient that keeps one HTTP connection pool open for the
+    process instead of opening a new connection per request.
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._http: httpx.AsyncClient | None = None
+
+    def _get_http_client(self) -> httpx.AsyncClient:
+        if self._http is None:
+            # Settings are defaults, timeout and limits given to the constructor win
+            client_kwargs = {
+                'timeout': settings.api_schema_registry_timeout,
+                'limits': httpx.Limits(max_connections=settings.api_schema_registry_max_connections),
+                **self.client_kwargs,
+            }
+            self._http = httpx.AsyncClient(**client_kwargs)
+        return self._http
+
+    async def request(self, url: str, method: str = 'GET', body: typing.Optional[dict] = None, params: typing.Optional[dict] = None, headers: typing.Optional[dict] = None, timeout=httpx.USE_CLIENT_DEFAULT) -> httpx.Response:
+        _headers = self.prepare_headers(body=body, headers=headers)
+        return await self._get_http_client().request(method, url, headers=_headers, json=body, params=params, timeout=timeout)
+
+    async def aclose(self) -> None:
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+
+# Shared registry client, created in the app lifespan
+registry_client: PooledSchemaRegistryClient | LocalSchemaRegistryClient | None = None
+
+# Schema ids never change for a subject and schema, so they are cached for the process
+schema_ids: dict[tuple[str, str], int] = {}
+
+# Subject list and latest versions change on deploys, so they expire
+subjects_cache: tuple[float, set[str]] | None = None
+latest_versions: dict[str, tuple[float, SchemaVersion]] = {}
+
+
+def create_registry_client() -> PooledSchemaRegistryClient | LocalSchemaRegistryClient:
+    # Local stand-in registry for offline development and tests
+    if settings.api_schema_registry_local:
+        return LocalSchemaRegistryClient()
+    return PooledSchemaRegistryClient(url=settings.api_schema_registry_host)
+
+
+def get_registry_client() -> PooledSchemaRegistryClient | LocalSchemaRegistryClient:
+    global registry_client
+
+    # Registry used outside the app lifespan
+    if registry_client is None:
+        registry_client = create_registry_client()
+    return registry_client
+
+
+def is_fresh(fetched_at: float) -> bool:
+    return time.monotonic() - fetched_at < settings.api_schema_registry_cache_ttl
+
+
+def invalidate_subject(subject: str) -> None:
+    global subjects_cache
+
+    latest_versions.pop(subject, None)
+    for key in [key for key in schema_ids if key[0] == subject]:
+        del schema_ids[key]
+    subjects_cache = None
+
+
+async def get_subjects() -> set[str]:
+    global subjects_cache
+
+    if subjects_cache is not None and is_fresh(subjects_cache[0]):
+        return subjects_cache[1]
+
+    # Get all subjects from registry
+    subjects = set(await get_registry_client().get_subjects())
+    subjects_cache = (time.monotonic(), subjects)
+    return subjects
 
 
 async def get_schema_from_schema_registry(schema_registry_subject: str):
-    # Connect to the schema registry
-    asr =  AsyncSchemaRegistryClient(url=settings.api_schema_registry_host)
+    subject = f"{schema_registry_subject}-value"
+    asr = get_registry_client()
+
+    cached = latest_versions.get(subject)
+    if cached is not None and is_fresh(cached[0]):
+        return asr, cached[1]
+
     # Get latest schema version
-    latest_version = await asr.get_schema(subject=f"{schema_registry_subject}-value") 
+    latest_version = await asr.get_schema(subject=subject)
+    if latest_version is not None:
+        latest_versions[subject] = (time.monotonic(), latest_version)
     return asr, latest_version
 
 
-async def register_schema(schema_registry_subject: str, new_schema: str):
-    # Connect to the schema registry
-    asr = AsyncSchemaRegistryClient(url=settings.api_schema_registry_host)
+async def register_schema(schema_registry_subject: str, new_schema) -> int:
     # Convert to avro schema
-    avro_schema = schema.AvroSchema(new_schema)
-    # Register schema
-    schema_id = await asr.register(subject=schema_registry_subject, schema=avro_schema)
+    avro_schema = new_schema if isinstance(new_schema, AvroSchema) else AvroSchema(new_schema)
+
+    key = (schema_registry_subject, str(avro_schema))
+    schema_id = schema_ids.get(key)
+    if schema_id is not None:
+        return schema_id
+
+    # Look the schema up and register it only if it is new, read-only credentials can still resolve ids
+    schema_id = await get_registry_client().register(subject=schema_registry_subject, schema=avro_schema)
+    schema_ids[key] = schema_id
+
+    if subjects_cache is not None:
+        subjects_cache[1].add(schema_registry_subject)
     return schema_id
 
 
+async def register_schemas(schemas: dict[str, typing.Any]) -> dict[str, int]:
+    """
+    This is used to register many schemas at once.
+    Subjects are registered concurrently over the shared connection pool.
+    @params {schemas} - A dict of subject to schema.
+    @returns {dict} - A dict of subject to schema id.
+    """
+
+    subjects = list(schemas)
+    ids = await asyncio.gather(*(register_schema(schema_registry_subject=subject, new_schema=schemas[subject]) for subject in subjects))
+    return dict(zip(subjects, ids))
+
+
 async def update_schema(schema_registry_subject: str, new_schema: str):
-    # Connect to the schema registry
-    asr = AsyncSchemaRegistryClient(url=settings.api_schema_registry_host)
     # Delete previous schema
-    await asr.delete_subject(subject=schema_registry_subject)
+    await get_registry_client().delete_subject(subject=schema_registry_subject)
+    invalidate_subject(subject=schema_registry_subject)
     # Register new schema
     schema_id = await register_schema(schema_registry_subject=schema_registry_subject, new_schema=new_schema)
-    return schema_id
\ No newline at end of file
+    return schema_id
+
+
+async def start_schema_registry() -> None:
+    logger.info('Starting schema registry client.')
+    get_registry_client()
+
+
+async def stop_schema_registry() -> None:
+    global registry_client, subjects_cache
+
+    if registry_client is None:
+        return
+
+    logger.info('Closing schema registry client.')
+    await registry_client.aclose()
+    registry_client = None
+    subjects_cache = None
+    latest_versions.clear()
+    schema_ids.clear()
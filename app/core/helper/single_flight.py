@@ -0,0 +1,49 @@
+import asyncio
+import typing
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key into one in-flight awaitable.
+    The call runs as its own task, so a cancelled caller does not cancel the others.
+    """
+
+    def __init__(self):
+        self.calls: dict[str, asyncio.Task] = {}
+
+        # Metrics
+        self.requests = 0
+        self.executions = 0
+
+    async def do(self, key: str, fn: typing.Callable[[], typing.Awaitable]) -> typing.Any:
+        """
+        This is used to run fn once for all concurrent callers of the same key.
+        @params {key} - The key identifying the call.
+        @params {fn} - A function returning the awaitable to share.
+        @returns {any} - The shared result, exceptions are raised to every caller.
+        """
+
+        self.requests += 1
+
+        task = self.calls.get(key)
+        if task is None:
+            self.executions += 1
+            task = asyncio.ensure_future(fn())
+            self.calls[key] = task
+            task.add_done_callback(lambda _: self.calls.pop(key, None))
+
+        return await asyncio.shield(task)
+
+    @property
+    def coalesced(self) -> int:
+        # Calls answered by another caller's I/O
+        return self.requests - self.executions
+
+    def metrics(self) -> dict:
+        return {
+            'requests': self.requests,
+            'executions': self.executions,
+            'coalesced': self.coalesced,
+            'in_flight': len(self.calls),
+            'coalescing_ratio': self.coalesced / self.requests if self.requests else 0.0,
+        }
@@ -54,9 +54,16 @@ class AccountAvroOut(Account):
     display_pics: Optional[str] = Field(description='Account display image',)  
 
 
+class AccountContact(AvroBaseModel):
+    id: str = Field(description="A unique string representing the account id", alias='_id')
+    email: str = Field(description="The email registered to the account")
+    firstname: str = Field(description="The user's first name")
+    phone_number: str = Field(description="The phone number registered to the account")
+
+
 class AccountInDB(AvroBaseModel):
-    _id: str = Field(description="A unique string representing the account id",
-                    json_schema_extra={'id': '7845941214687'}, alias='id')
+    id: str = Field(description="A unique string representing the account id",
+                    json_schema_extra={'id': '7845941214687'}, alias='_id')
     email: EmailStr = Field(description="An email string. This is the user's email address. It will be validated before use.", 
                             json_schema_extra={'email':'joe@example.com'},
                             examples=['johndoe@example.com'])
@@ -0,0 +1,9 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional, Tuple
+
+
+class EventOut(BaseModel):
+    topic: str = Field(description='The topic the event is produced to')
+    value: bytes = Field(description='The serialized event')
+    key: Optional[str] = Field(default=None, description='The partition key of the event')
+    headers: Optional[List[Tuple[str, bytes]]] = Field(default=None, description='Kafka record headers')
@@ -6,3 +6,9 @@ credential_error = HTTPException(
                 detail='Invalid token',
                 headers={'WWW-Authenticate': "Bearer"}
             )
+
+# Event streaming error
+event_unavailable_error = HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail='Service temporarily unavailable, please retry later.'
+            )
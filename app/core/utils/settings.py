@@ -29,6 +29,51 @@ class Settings(BaseSettings):
     api_redis_password: str
     api_redis_decode_response: bool
     api_redis_host_local: str
+    # Shared connection pool, requests wait up to api_redis_pool_timeout for a free connection
+    api_redis_max_connections: int = 50
+    api_redis_pool_timeout: float = 2.0
+    api_redis_health_check_interval: int = 30
+    api_redis_socket_timeout: float = 2.0
+    api_redis_socket_connect_timeout: float = 2.0
+
+    # Read-through account cache, TTLs are spread by +/- jitter
+    api_account_cache_ttl: int = 300
+    api_account_cache_ttl_jitter: float = 0.1
+    # Higher beta refreshes hot accounts earlier before they expire
+    api_account_cache_refresh_beta: float = 1.0
+    # One request per account loads it from the database, others wait for the cache
+    api_account_cache_lock_ms: int = 2000
+    api_account_cache_lock_poll_ms: int = 25
+    # Seconds an account changed by this service is read from the database and not cached,
+    # long enough for the event consumer to apply the change
+    api_account_changed_ttl: int = 30
+    # In-process cache ahead of redis, 0 bytes disables it
+    api_account_local_cache_ttl: float = 5.0
+    api_account_local_cache_max_bytes: int = 16 * 1024 * 1024
+    # Lookups that found no account, the local TTL bounds staleness across pods
+    api_missing_account_ttl: int = 30
+    api_missing_account_local_ttl: float = 2.0
+    api_missing_account_local_max_bytes: int = 4 * 1024 * 1024
+
+    # Seconds between logs of the cache, lookup and event spool metrics, 0 disables them
+    api_metrics_log_interval: float = 60.0
+
+    # Bloom filter of registered emails, shared through redis so every pod sees every create.
+    # A local filter only sees this pod's creates and is only safe with a single replica
+    api_email_filter_enabled: bool = True
+    api_email_filter_shared: bool = True
+    api_email_filter_capacity: int = 1_000_000
+    api_email_filter_error_rate: float = 0.01
+    api_email_filter_batch_size: int = 5000
+    # Seconds an email stays reserved after a sign-up emits its create event
+    api_email_reservation_ttl: int = 300
+
+    # OTP key scheme the OTP writer uses, laid out as in store_otp. Validation tries this version first.
+    # Version 2 keys are a keyed BLAKE2b digest, need the secret and are answered from their TTL.
+    api_otp_key_version: int = 1
+    api_otp_key_secret: str = ''
+    # Turn off once no version 1 keys are written
+    api_otp_key_accept_v1: bool = True
 
     # API constants
     min_password_length: int
@@ -40,6 +85,16 @@ class Settings(BaseSettings):
 
     # Schema Registry Server 
     api_schema_registry_host: str
+    api_schema_registry_local: bool = False
+    # Seconds subject lists and latest versions are cached, schema ids never change
+    api_schema_registry_cache_ttl: int = 300
+    api_schema_registry_timeout: float = 5.0
+    api_schema_registry_max_connections: int = 10
+    # Seconds before a failed schema id lookup is retried, requests in between fail fast
+    api_schema_registry_retry_interval: float = 5.0
+
+    # Event wire format, confluent (magic byte and schema id) or schemaless
+    api_event_wire_format: str = 'confluent'
 
     # Event Streaming Server
     api_event_streaming_host: str
@@ -62,10 +117,60 @@ class Settings(BaseSettings):
     api_reset_phone_number: str
     api_update_phone_number: str
     api_invalidate_cache_topic: str
+
+    # Topic provisioning
+    api_topic_partitions: int = 10
+    api_topic_replication_factor: int = 3
+    api_topic_registry_refresh_interval: int = 300
+
+    # Event partitioning
+    api_event_key_strategy: str = 'id'
+    api_event_key_overrides: dict[str, str] = {}
+    api_event_partitioner: str = 'default'
+
+    # Event batching
+    api_event_linger_ms: int = 5
+    api_event_max_batch_size: int = 65536
+
+    # Event compression, one of gzip, snappy, lz4, zstd or none
+    api_event_compression_type: str | None = 'lz4'
+    api_event_topic_compression: dict[str, str] = {}
+
+    # Event delivery and local spool for broker outages
+    api_event_request_timeout_ms: int = 5000
+    api_event_spool_dir: str = 'spool'
+    api_event_spool_segment_bytes: int = 16 * 1024 * 1024
+    api_event_spool_max_segments: int = 8
+    api_event_spool_replay_interval: float = 1.0
+    api_event_spool_replay_window: int = 500
+    api_event_spool_fsync: bool = False
+
+    # Idempotent and transactional delivery
+    api_event_enable_idempotence: bool = True
+    api_event_transactional_id: str | None = None
+    api_event_transactional_producers: int = 2
+    api_event_transaction_timeout_ms: int = 60000
     
     # DB credentials
     api_db_url: str
 
+    # Database connection pool, waits for a free connection fail after the queue timeout
+    api_db_max_pool_size: int = 100
+    api_db_min_pool_size: int = 10
+    api_db_wait_queue_timeout_ms: int = 2000
+    api_db_server_selection_timeout_ms: int = 5000
+    api_db_connect_timeout_ms: int = 5000
+
+    # Values per $in query of a batched account lookup
+    api_db_batch_size: int = 500
+
+    # Read preference of existence and validation lookups, writes and account loads use the primary
+    api_db_read_preference: str = 'secondaryPreferred'
+
+    # Indexes are created at startup and every lookup shape is checked with explain
+    api_db_ensure_indexes: bool = True
+    api_db_check_query_plans: bool = True
+
     # API Externa Url
     api_verify_auth_token_url: str
     api_verify_access_token_url: str
@@ -8,16 +8,45 @@ from core.utils.settings import settings
 from contextlib import asynccontextmanager
 from starlette.middleware.base import BaseHTTPMiddleware
 from core.middleware.process_time_header_middleware import add_process_time_header
+from core.connection.producer_connection import start_producer, stop_producer, stop_transactional_producers
+from core.helper.producer_helper import start_topic_registry, stop_topic_registry
+from core.event.produce_event import start_event_spool, stop_event_spool
+from core.event.event_serializer import load_event_serializers, load_schema_ids, stop_schema_ids
+from core.helper.schema_registry_helper import start_schema_registry, stop_schema_registry
+from core.connection.cache_connection import start_cache, stop_cache
+from core.connection.db_connection import start_db, stop_db
+from core.helper.email_filter_helper import start_email_filter, stop_email_filter
+from core.helper.index_helper import start_indexes
+from core.helper.metrics_helper import start_metrics_log, stop_metrics_log
 
 
 async def on_startup():
-    # await start_producer()
     print('Starting account write service api')
-    
+    load_event_serializers()
+    await start_schema_registry()
+    await load_schema_ids()
+    await start_topic_registry()
+    await start_producer()
+    await start_event_spool()
+    await start_cache()
+    await start_db()
+    await start_indexes()
+    await start_email_filter()
+    await start_metrics_log()
+
 
 async def on_shut_down():
-    # await stop_producer()fy
     print('Shutting down write service api')
+    await stop_metrics_log()
+    await stop_email_filter()
+    await stop_db()
+    await stop_cache()
+    await stop_event_spool()
+    await stop_transactional_producers()
+    await stop_producer()
+    await stop_topic_registry()
+    await stop_schema_ids()
+    await stop_schema_registry()
 
 
 # init app lifecyle
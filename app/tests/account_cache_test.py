@@ -0,0 +1,191 @@
+import asyncio
+import json
+import pytest
+from core.helper import cache_helper, db_helper, negative_cache_helper
+from core.helper.cache_helper import get_account_from_redis_or_db, get_account_read_through, get_accounts_read_through, invalidate_account, jittered_ttl, load_account, should_refresh_early
+from core.helper.db_helper import to_account
+from core.helper.local_cache import LocalCache
+from core.helper.single_flight import SingleFlight
+from core.utils.settings import settings
+from tests.fake_redis import FakeRedis
+
+
+@pytest.fixture
+def cache_settings(monkeypatch):
+    monkeypatch.setattr(settings, 'api_account_cache_ttl', 300)
+    monkeypatch.setattr(settings, 'api_account_cache_ttl_jitter', 0.1)
+    monkeypatch.setattr(settings, 'api_account_cache_refresh_beta', 1.0)
+    monkeypatch.setattr(cache_helper, 'load_seconds', 0.05)
+
+
+def test_ttl_is_jittered_within_bounds(cache_settings):
+    ttls = {jittered_ttl() for _ in range(1000)}
+
+    assert min(ttls) >= 270
+    assert max(ttls) <= 330
+    assert len(ttls) > 10
+
+
+def test_keys_far_from_expiry_are_not_refreshed(cache_settings):
+    assert not any(should_refresh_early(ttl_ms=250_000) for _ in range(1000))
+
+
+def test_keys_about_to_expire_are_refreshed(cache_settings):
+    refreshes = sum(should_refresh_early(ttl_ms=1) for _ in range(1000))
+
+    assert refreshes > 950
+
+
+def test_keys_without_ttl_are_not_refreshed(cache_settings):
+    assert not any(should_refresh_early(ttl_ms=-1) for _ in range(1000))
+
+
+@pytest.fixture(scope="session")
+def anyio_backend() -> str:
+    return 'asyncio'
+
+
+@pytest.fixture
+def fake_redis(monkeypatch) -> FakeRedis:
+    fake = FakeRedis()
+    monkeypatch.setattr(cache_helper, 'redis', fake)
+    monkeypatch.setattr(negative_cache_helper, 'redis', fake)
+    monkeypatch.setattr(cache_helper, 'release_lock', fake.register_script(cache_helper.RELEASE_LOCK_SCRIPT))
+    monkeypatch.setattr(cache_helper, 'cache_account_script', fake.register_script(cache_helper.CACHE_ACCOUNT_SCRIPT))
+    monkeypatch.setattr(cache_helper, 'local_accounts', LocalCache(max_bytes=10_000, ttl=5))
+    monkeypatch.setattr(cache_helper, 'changed_accounts', LocalCache(max_bytes=10_000, ttl=5))
+    monkeypatch.setattr(cache_helper, 'account_reads', SingleFlight())
+    monkeypatch.setattr(negative_cache_helper, 'missing_accounts', LocalCache(max_bytes=10_000, ttl=2))
+    return fake
+
+
+@pytest.fixture
+def account_db(monkeypatch) -> dict:
+    # Account documents by id and the number of reads of each
+    db = {'documents': {'1': {'_id': '1', 'email': 'old@example.com'}}, 'reads': []}
+
+    async def get_account_document_by_id(id: str) -> dict | None:
+        db['reads'].append(id)
+        await asyncio.sleep(0.01)
+        return db['documents'].get(id)
+
+    async def get_account_by_id(id: str):
+        return to_account(await get_account_document_by_id(id=id))
+
+    monkeypatch.setattr(cache_helper, 'get_account_document_by_id', get_account_document_by_id)
+    monkeypatch.setattr(cache_helper, 'get_account_by_id', get_account_by_id)
+    return db
+
+
+@pytest.mark.anyio
+async def test_changed_account_is_dropped_from_every_cache(fake_redis):
+    cache_helper.local_accounts.set('1', to_account({'_id': '1'}), size=10)
+    await fake_redis.set(b'account:1', b'{"_id": "1"}', ex=300)
+
+    await invalidate_account(id='1')
+
+    assert cache_helper.local_accounts.get('1') is None
+    assert await fake_redis.get(b'account:1') is None
+    assert await fake_redis.pttl(b'changed:account:1') > 0
+
+
+@pytest.mark.anyio
+async def test_changed_account_is_not_cached_before_the_consumer_applies_it(fake_redis, account_db):
+    await invalidate_account(id='1')
+
+    # The consumer has not written the change yet, so the database still has the old document
+    account = await get_account_read_through(id='1')
+
+    assert account.email == 'old@example.com'
+    assert await fake_redis.get(b'account:1') is None
+    assert cache_helper.local_accounts.get('1') is None
+
+    # Once applied, every read sees the new document
+    account_db['documents']['1'] = {'_id': '1', 'email': 'new@example.com'}
+    assert (await get_account_read_through(id='1')).email == 'new@example.com'
+
+
+@pytest.mark.anyio
+async def test_load_skips_the_cache_when_the_account_changes_during_the_read(fake_redis, account_db):
+    load = asyncio.create_task(load_account(id='1'))
+    await asyncio.sleep(0)
+    await invalidate_account(id='1')
+
+    await load
+
+    assert await fake_redis.get(b'account:1') is None
+
+
+@pytest.mark.anyio
+async def test_concurrent_misses_load_the_account_once(fake_redis, account_db, monkeypatch):
+    monkeypatch.setattr(settings, 'api_account_cache_lock_ms', 1000)
+    monkeypatch.setattr(settings, 'api_account_cache_lock_poll_ms', 5)
+
+    # Bypass single flight so every read competes for the redis lock
+    accounts = await asyncio.gather(*(get_account_from_redis_or_db(id='1') for _ in range(5)))
+
+    assert [account.email for account in accounts] == ['old@example.com'] * 5
+    assert account_db['reads'] == ['1']
+    assert await fake_redis.get(b'lock:account:1') is None
+    assert await fake_redis.get(b'account:1') is not None
+
+
+@pytest.mark.anyio
+async def test_read_through_fills_every_cache(fake_redis, account_db):
+    account = await get_account_read_through(id='1')
+
+    assert account.email == 'old@example.com'
+    assert cache_helper.local_accounts.get('1') is account
+    assert await fake_redis.get(b'account:1') is not None
+
+    # Later reads are served in process
+    assert await get_account_read_through(id='1') is account
+    assert account_db['reads'] == ['1']
+
+
+@pytest.mark.anyio
+async def test_read_through_remembers_missing_accounts(fake_redis, account_db):
+    assert await get_account_read_through(id='unknown') is None
+    assert await get_account_read_through(id='unknown') is None
+
+    assert account_db['reads'] == ['unknown']
+    assert await fake_redis.exists(b'missing:account:id:unknown')
+
+
+@pytest.mark.anyio
+async def test_batch_read_fills_misses_from_one_query(fake_redis, cache_settings, monkeypatch):
+    queries = []
+
+    class Cursor:
+        def __init__(self, documents: list[dict]):
+            self.documents = documents
+
+        async def to_list(self, length: int | None) -> list[dict]:
+            return self.documents
+
+    class Collection:
+        def find(self, filter: dict, projection: dict | None = None) -> Cursor:
+            queries.append(filter)
+            return Cursor([{'_id': id, 'email': f"user{id}@example.com"} for id in filter['_id']['$in'] if id != 'unknown'])
+
+    monkeypatch.setattr(db_helper, 'get_account_col', lambda: Collection())
+    cache_helper.local_accounts.set('1', to_account({'_id': '1'}), size=10)
+    await fake_redis.set(b'account:4', b'{"_id": "4", "email": "user4@example.com"}', ex=300)
+
+    accounts = await get_accounts_read_through(ids=['1', '2', '3', '4', 'unknown', '2'])
+
+    assert list(accounts) == ['1', '2', '3', '4', 'unknown']
+    assert accounts['2'].email == 'user2@example.com'
+    assert accounts['4'].email == 'user4@example.com'
+    assert accounts['unknown'] is None
+    assert queries == [{'_id': {'$in': ['2', '3', 'unknown']}}]
+
+    # Misses are written back to redis and kept in process
+    assert json.loads(await fake_redis.get(b'account:2'))['email'] == 'user2@example.com'
+    assert 0 < await fake_redis.pttl(b'account:3') <= 330_000
+    assert await fake_redis.exists(b'missing:account:id:unknown')
+    assert cache_helper.local_accounts.get('2') is accounts['2']
+
+    # A second read needs no query
+    await get_accounts_read_through(ids=['2', '3', '4', 'unknown'])
+    assert len(queries) == 1
@@ -0,0 +1,48 @@
+import pytest
+from core.helper.bloom_filter import BloomFilter
+
+
+def test_no_false_negatives():
+    bloom = BloomFilter.for_capacity(capacity=10_000, error_rate=0.01)
+    emails = [f"user{i}@example.com" for i in range(10_000)]
+    for email in emails:
+        bloom.add(email)
+
+    assert all(email in bloom for email in emails)
+
+
+def test_false_positive_rate_is_close_to_target():
+    bloom = BloomFilter.for_capacity(capacity=10_000, error_rate=0.01)
+    for i in range(10_000):
+        bloom.add(f"user{i}@example.com")
+
+    false_positives = sum(f"other{i}@example.com" in bloom for i in range(20_000))
+
+    assert false_positives / 20_000 < 0.02
+    assert bloom.false_positive_rate() == pytest.approx(0.01, rel=0.2)
+
+
+def test_round_trip():
+    bloom = BloomFilter.for_capacity(capacity=100, error_rate=0.01)
+    bloom.add('johndoe@example.com')
+
+    restored = BloomFilter.from_bytes(bloom.to_bytes())
+
+    assert 'johndoe@example.com' in restored
+    assert restored.count == 1
+    assert restored.bits == bloom.bits
+    assert (restored.size_bits, restored.hash_count) == (bloom.size_bits, bloom.hash_count)
+
+
+def test_bits_match_redis_setbit_offsets():
+    bloom = BloomFilter(size_bits=16, hash_count=1)
+    position = bloom.positions('johndoe@example.com')[0]
+    bloom.add('johndoe@example.com')
+
+    # SETBIT offset 0 is the most significant bit of the first byte
+    assert bloom.bits[position // 8] == 0x80 >> (position % 8)
+
+
+def test_rejects_invalid_data():
+    with pytest.raises(ValueError):
+        BloomFilter.from_bytes(b'XXXX' + bytes(17))
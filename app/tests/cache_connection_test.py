@@ -0,0 +1,55 @@
+import pytest
+from redis.asyncio import ConnectionError
+from core.connection import cache_connection
+from core.connection.cache_connection import MeteredConnectionPool
+from core.helper import account_helper, cache_helper, otp_helper
+
+
+@pytest.fixture(scope="session")
+def anyio_backend() -> str:
+    return 'asyncio'
+
+
+def test_helpers_share_one_client():
+    assert account_helper.redis is cache_connection.redis
+    assert cache_helper.redis is cache_connection.redis
+    assert otp_helper.redis is cache_connection.redis
+    assert cache_connection.redis.connection_pool is cache_connection.pool
+
+
+def test_pool_settings():
+    pool = MeteredConnectionPool.from_url(url='redis://localhost:6379', max_connections=5, health_check_interval=15, socket_timeout=1.5)
+
+    assert pool.max_connections == 5
+    assert pool.connection_kwargs['health_check_interval'] == 15
+    assert pool.connection_kwargs['socket_timeout'] == 1.5
+
+
+@pytest.mark.anyio
+async def test_exhausted_pool_times_out():
+    pool = MeteredConnectionPool.from_url(url='redis://localhost:6379', max_connections=1, timeout=0.01)
+    # Hold the only connection
+    pool._in_use_connections.add(pool.make_connection())
+
+    with pytest.raises(ConnectionError):
+        await pool.get_connection('GET')
+
+    metrics = pool.metrics()
+    assert metrics['timeouts'] == 1
+    assert metrics['checkouts'] == 0
+    assert metrics['in_use'] == 1
+    assert metrics['wait_seconds'] > 0
+
+
+@pytest.mark.anyio
+async def test_failed_connect_returns_the_slot():
+    # Nothing listens on this port
+    pool = MeteredConnectionPool.from_url(url='redis://localhost:1', max_connections=1, timeout=0.5)
+
+    for _ in range(3):
+        with pytest.raises(ConnectionError):
+            await pool.get_connection('GET')
+
+    metrics = pool.metrics()
+    assert metrics['in_use'] == 0
+    assert metrics['timeouts'] == 0
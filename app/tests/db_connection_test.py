@@ -0,0 +1,44 @@
+import pytest
+from core.connection import db_connection
+from core.connection.db_connection import get_account_col, get_account_read_col, stop_db
+from core.helper.db_helper import lookup_collection
+from core.utils.settings import settings
+
+
+@pytest.fixture(scope="session")
+def anyio_backend() -> str:
+    return 'asyncio'
+
+
+@pytest.fixture(autouse=True)
+async def db_client(monkeypatch):
+    monkeypatch.setattr(settings, 'api_db_read_preference', 'secondaryPreferred')
+    await stop_db()
+    yield
+    await stop_db()
+
+
+@pytest.mark.anyio
+async def test_lean_lookups_are_routed_by_read_preference():
+    assert get_account_read_col().read_preference.mongos_mode == 'secondaryPreferred'
+    assert get_account_col().read_preference.mongos_mode == 'primary'
+
+    assert lookup_collection(fields='exists') is get_account_read_col()
+    assert lookup_collection(fields='account') is get_account_col()
+
+
+@pytest.mark.anyio
+async def test_pool_is_configured_from_settings():
+    pool_options = get_account_col().database.client.options.pool_options
+
+    assert pool_options.max_pool_size == settings.api_db_max_pool_size
+    assert pool_options.min_pool_size == settings.api_db_min_pool_size
+
+
+@pytest.mark.anyio
+async def test_client_is_closed_on_shutdown():
+    get_account_col()
+    await stop_db()
+
+    assert db_connection.client is None
+    assert db_connection.account_read_col is None
@@ -0,0 +1,116 @@
+import pytest
+from core.helper import db_helper, negative_cache_helper
+from core.helper.db_helper import get_account_contact, get_accounts_by_emails, get_accounts_by_ids, has_account, to_account
+from core.helper.local_cache import LocalCache
+from core.utils.settings import settings
+
+
+class AccountCollection:
+    # In-memory collection recording the projection of each query
+    def __init__(self, documents: list[dict]):
+        self.documents = documents
+        self.projections = []
+
+    async def find_one(self, filter: dict, projection: dict | None = None):
+        self.projections.append(projection)
+        for document in self.documents:
+            if all(document.get(field) == value for field, value in filter.items()):
+                if projection is None:
+                    return dict(document)
+                return {field: value for field, value in document.items() if projection.get(field, 0)}
+        return None
+
+    def find(self, filter: dict, projection: dict | None = None):
+        self.projections.append(projection)
+        ((field, condition),) = filter.items()
+        return AccountCursor([dict(document) for document in self.documents if document.get(field) in condition['$in']])
+
+
+class AccountCursor:
+    def __init__(self, documents: list[dict]):
+        self.documents = documents
+
+    async def to_list(self, length: int | None):
+        return self.documents
+
+
+@pytest.fixture(scope="session")
+def anyio_backend() -> str:
+    return 'asyncio'
+
+
+@pytest.fixture
+def account_col(monkeypatch) -> AccountCollection:
+    collection = AccountCollection([{
+        '_id': '7845941214687',
+        'email': 'johndoe@example.com',
+        'firstname': 'John',
+        'lastname': 'Doe',
+        'phone_number': '915 1234 789',
+        'country_code': '+234',
+        'country': 'Nigeria',
+        'username': None,
+        'display_pics': None,
+        'hashed_password': 'hash',
+        'version': 1,
+        'active_device_count': 50,
+        'active_devices': [f"device-{n}" for n in range(50)],
+        'role': {'name': 'user'},
+    }] + [{'_id': str(id), 'email': f"user{id}@example.com"} for id in range(5)])
+    monkeypatch.setattr(db_helper, 'lookup_collection', lambda fields: collection)
+    monkeypatch.setattr(negative_cache_helper, 'missing_accounts', LocalCache(max_bytes=10_000, ttl=2))
+    return collection
+
+
+@pytest.mark.anyio
+async def test_existence_check_only_fetches_the_indexed_field(account_col: AccountCollection):
+    assert await has_account(field='email', value='johndoe@example.com')
+    assert not await has_account(field='email', value='janedoe@example.com')
+    assert account_col.projections == [{'_id': 0, 'email': 1}, {'_id': 0, 'email': 1}]
+
+
+@pytest.mark.anyio
+async def test_contact_lookup_skips_other_fields(account_col: AccountCollection):
+    contact = await get_account_contact(field='phone_number', value='915 1234 789')
+
+    assert contact.id == '7845941214687'
+    assert contact.email == 'johndoe@example.com'
+    assert contact.firstname == 'John'
+    assert 'active_devices' not in account_col.projections[0]
+    assert 'hashed_password' not in account_col.projections[0]
+
+
+@pytest.mark.anyio
+async def test_batched_lookup_uses_chunked_in_queries(account_col: AccountCollection, monkeypatch):
+    monkeypatch.setattr(settings, 'api_db_batch_size', 2)
+
+    accounts = await get_accounts_by_ids(ids=['0', '1', '2', '3', '1', 'unknown'])
+
+    assert sorted(accounts) == ['0', '1', '2', '3']
+    assert len(account_col.projections) == 3
+    assert negative_cache_helper.is_missing_locally(field='id', value='unknown')
+
+
+@pytest.mark.anyio
+async def test_batched_lookup_skips_recent_misses(account_col: AccountCollection):
+    await get_accounts_by_ids(ids=['unknown'])
+    assert await get_accounts_by_ids(ids=['unknown']) == {}
+    assert len(account_col.projections) == 1
+
+
+@pytest.mark.anyio
+async def test_batched_email_lookup_returns_accounts(account_col: AccountCollection):
+    accounts = await get_accounts_by_emails(emails=['johndoe@example.com', 'janedoe@example.com'])
+
+    assert list(accounts) == ['johndoe@example.com']
+    assert accounts['johndoe@example.com'].firstname == 'John'
+
+
+def test_documents_are_read_without_validation():
+    account = to_account({'_id': '1', 'email': 'not an email', 'role': {'name': 'admin'}, 'created_at': '2024-01-01'})
+
+    assert account.id == '1'
+    assert account.email == 'not an email'
+    assert account.role.name == 'admin'
+    assert account.disabled is True
+    assert 'created_at' not in account.__dict__
@@ -0,0 +1,218 @@
+import pytest
+from core.helper import email_filter_helper
+from core.helper.bloom_filter import BloomFilter
+from core.helper.email_filter_helper import EMAIL_FILTER_KEY, EMAIL_FILTER_META_KEY, EMAIL_FILTER_PENDING_KEY
+from core.helper.email_filter_helper import add_registered_email, build_email_filter, email_filter_metrics, email_filter_ready, email_may_exist, publish_email_filter, record_false_positive
+from core.utils.settings import settings
+from tests.fake_redis import FakeRedis
+
+
+@pytest.fixture(scope="session")
+def anyio_backend() -> str:
+    return 'asyncio'
+
+
+@pytest.fixture(autouse=True)
+def filter_state(monkeypatch):
+    monkeypatch.setattr(settings, 'api_email_filter_capacity', 1000)
+    monkeypatch.setattr(settings, 'api_email_filter_error_rate', 0.01)
+    for name, value in (('registered_emails', None), ('shared_filter_ready', False), ('shared_generation', None), ('_unsynced_emails', set()), ('_build_task', None), ('rebuild_seconds', None)):
+        monkeypatch.setattr(email_filter_helper, name, value)
+    for counter in ('checks', 'skipped_queries', 'false_positives'):
+        monkeypatch.setattr(email_filter_helper, counter, 0)
+
+
+@pytest.fixture
+def local_filter(monkeypatch) -> BloomFilter:
+    bloom = BloomFilter.for_capacity(capacity=1000, error_rate=0.01)
+    bloom.add('johndoe@example.com')
+    monkeypatch.setattr(settings, 'api_email_filter_shared', False)
+    monkeypatch.setattr(email_filter_helper, 'registered_emails', bloom)
+    return bloom
+
+
+@pytest.fixture
+def accounts(monkeypatch) -> list[dict]:
+    # Accounts the database scan returns
+    documents = [{'email': 'johndoe@example.com'}]
+
+    class Cursor:
+        def __init__(self):
+            self.documents = iter(list(documents))
+
+        def __aiter__(self):
+            return self
+
+        async def __anext__(self) -> dict:
+            try:
+                return next(self.documents)
+            except StopIteration:
+                raise StopAsyncIteration
+
+    class Collection:
+        def find(self, *args, **kwargs) -> Cursor:
+            return Cursor()
+
+    monkeypatch.setattr(email_filter_helper, 'get_account_col', lambda: Collection())
+    return documents
+
+
+@pytest.fixture
+def fake_redis(monkeypatch, accounts) -> FakeRedis:
+    fake = FakeRedis()
+    monkeypatch.setattr(settings, 'api_email_filter_shared', True)
+    monkeypatch.setattr(email_filter_helper, 'redis', fake)
+    monkeypatch.setattr(email_filter_helper, 'add_email_script', fake.register_script(email_filter_helper.ADD_EMAIL_SCRIPT))
+    monkeypatch.setattr(email_filter_helper, 'publish_email_filter_script', fake.register_script(email_filter_helper.PUBLISH_EMAIL_FILTER_SCRIPT))
+    return fake
+
+
+async def rebuilt():
+    # Wait for the background build started by a check or add
+    await email_filter_helper._build_task
+    return email_filter_ready()
+
+
+@pytest.mark.anyio
+async def test_unregistered_email_skips_the_database(local_filter):
+    assert await email_may_exist(email='johndoe@example.com')
+    assert not await email_may_exist(email='janedoe@example.com')
+    assert email_filter_metrics()['skipped_queries'] == 1
+
+
+@pytest.mark.anyio
+async def test_created_email_is_added(local_filter):
+    await add_registered_email(email='janedoe@example.com')
+
+    assert await email_may_exist(email='janedoe@example.com')
+
+
+@pytest.mark.anyio
+async def test_unbuilt_filter_defers_to_the_database(local_filter, monkeypatch):
+    monkeypatch.setattr(email_filter_helper, 'registered_emails', None)
+
+    assert await email_may_exist(email='janedoe@example.com')
+    assert email_filter_metrics()['checks'] == 0
+
+
+def test_observed_false_positive_rate(local_filter):
+    email_filter_helper.skipped_queries = 99
+    record_false_positive()
+
+    assert email_filter_metrics()['observed_false_positive_rate'] == 0.01
+
+
+@pytest.mark.anyio
+async def test_shared_filter_answers_from_redis(fake_redis):
+    await build_email_filter()
+
+    assert email_filter_ready()
+    assert await email_may_exist(email='johndoe@example.com')
+    assert not await email_may_exist(email='janedoe@example.com')
+    assert email_filter_metrics()['items'] == 1
+
+
+@pytest.mark.anyio
+async def test_create_is_added_to_the_shared_bitmap(fake_redis):
+    await build_email_filter()
+    await add_registered_email(email='janedoe@example.com')
+
+    # Checks only read the shared bitmap, so every pod sees the create
+    email_filter_helper.registered_emails.bits[:] = bytes(len(email_filter_helper.registered_emails.bits))
+    assert await email_may_exist(email='janedoe@example.com')
+    assert email_filter_ready()
+
+
+@pytest.mark.anyio
+async def test_reused_filter_reports_its_item_count(fake_redis, accounts, monkeypatch):
+    accounts.append({'email': 'janedoe@example.com'})
+    await build_email_filter()
+
+    # A pod starting later reuses the bitmap without scanning
+    monkeypatch.setattr(email_filter_helper, 'registered_emails', None)
+    monkeypatch.setattr(email_filter_helper, 'rebuild_seconds', None)
+    accounts.clear()
+    await build_email_filter()
+
+    metrics = email_filter_metrics()
+    assert metrics['items'] == 2
+    assert metrics['expected_false_positive_rate'] > 0
+    assert metrics['rebuild_seconds'] is not None
+    assert await email_may_exist(email='janedoe@example.com')
+
+
+@pytest.mark.anyio
+async def test_evicted_bitmap_is_rebuilt(fake_redis):
+    await build_email_filter()
+    await fake_redis.delete(EMAIL_FILTER_KEY.encode())
+
+    # Answers maybe until the bitmap is back
+    assert await email_may_exist(email='janedoe@example.com')
+    assert not email_filter_ready()
+
+    assert await rebuilt()
+    assert await email_may_exist(email='johndoe@example.com')
+    assert not await email_may_exist(email='janedoe@example.com')
+
+
+@pytest.mark.anyio
+async def test_publish_keeps_bits_set_by_other_pods(fake_redis, accounts):
+    await build_email_filter()
+    generation = email_filter_helper.shared_generation
+    await add_registered_email(email='janedoe@example.com')
+
+    # A scan that missed the create is merged, not copied over the bitmap
+    email_filter = email_filter_helper.new_email_filter()
+    email_filter.add('johndoe@example.com')
+    meta = await publish_email_filter(email_filter=email_filter)
+
+    assert meta.endswith(generation)
+    assert await email_may_exist(email='janedoe@example.com')
+    assert email_filter_ready()
+
+
+@pytest.mark.anyio
+async def test_create_while_rebuilding_is_buffered_and_merged(fake_redis, accounts):
+    await build_email_filter()
+    await fake_redis.delete(EMAIL_FILTER_KEY.encode(), EMAIL_FILTER_META_KEY.encode())
+
+    # The consumer has not written the account yet, so the rebuild scan misses it
+    await add_registered_email(email='janedoe@example.com')
+
+    assert await fake_redis.smembers(EMAIL_FILTER_PENDING_KEY.encode()) == {b'janedoe@example.com'}
+    assert await rebuilt()
+    assert await email_may_exist(email='janedoe@example.com')
+    assert await fake_redis.smembers(EMAIL_FILTER_PENDING_KEY.encode()) == set()
+
+
+@pytest.mark.anyio
+async def test_replaced_filter_is_reloaded(fake_redis):
+    await build_email_filter()
+    generation = email_filter_helper.shared_generation
+
+    # Another pod starts a new generation
+    await fake_redis.delete(EMAIL_FILTER_KEY.encode())
+    email_filter = email_filter_helper.new_email_filter()
+    email_filter.add('janedoe@example.com')
+    await publish_email_filter(email_filter=email_filter)
+
+    assert await email_may_exist(email='johndoe@example.com')
+    assert not email_filter_ready()
+    assert await rebuilt()
+    assert email_filter_helper.shared_generation != generation
+    assert await email_may_exist(email='janedoe@example.com')
+
+
+@pytest.mark.anyio
+async def test_failed_add_is_retried_by_the_next_build(fake_redis):
+    await build_email_filter()
+
+    fake_redis.available = False
+    await add_registered_email(email='janedoe@example.com')
+    fake_redis.available = True
+
+    assert not email_filter_ready()
+    assert email_filter_metrics()['unsynced_emails'] == 1
+    assert await rebuilt()
+    assert email_filter_metrics()['unsynced_emails'] == 0
+    assert await email_may_exist(email='janedoe@example.com')
@@ -0,0 +1,151 @@
+import pytest
+from fastapi import HTTPException
+from core.controller import write_controller
+from core.helper import email_reservation_helper
+from core.helper.cache_helper import RELEASE_LOCK_SCRIPT
+from core.helper.email_reservation_helper import UNRESERVED, email_reservation_key, release_email, reserve_email
+from core.model.account_model import CreateAccount
+from tests.fake_redis import FakeRedis
+
+
+@pytest.fixture(scope="session")
+def anyio_backend() -> str:
+    return 'asyncio'
+
+
+@pytest.fixture
+def fake_redis(monkeypatch) -> FakeRedis:
+    fake = FakeRedis()
+    monkeypatch.setattr(email_reservation_helper, 'redis', fake)
+    monkeypatch.setattr(email_reservation_helper, 'release_lock', fake.register_script(RELEASE_LOCK_SCRIPT))
+    return fake
+
+
+@pytest.fixture
+def new_account() -> CreateAccount:
+    return CreateAccount(
+        password='stringst',
+        confirm_password='stringst',
+        email='johndoe@example.com',
+        firstname='John',
+        lastname='Doe',
+        phone_number='915 1234 789',
+        country_code='+234',
+        country='Nigeria',
+        device={
+            'device_name': 'Samsong s23 ultra',
+            'platform': 'IOS',
+            'ip_address': '127.0.0.1',
+            'device_model': 'string',
+            'device_id': 'string',
+            'screen_info': {'height': 1920, 'width': 720, 'resolution': 1200},
+            'device_serial_number': '124578963',
+            'is_active': True,
+        },
+        display_pics='https://example.com/',
+    )
+
+
+@pytest.fixture
+def sign_up(monkeypatch) -> dict:
+    # Outcome of the account check and the produce, and the events emitted
+    state = {'account_exists': False, 'produce_error': None, 'events': []}
+
+    async def account_exists(key: str, value: str) -> bool:
+        return state['account_exists']
+
+    async def encode_event(topic: str, model, data: dict) -> bytes:
+        return b'event'
+
+    async def produce_event(topic: str, value, key: str | None = None, headers: tuple | None = None) -> None:
+        if state['produce_error'] is not None:
+            raise state['produce_error']
+        state['events'].append(topic)
+
+    async def noop(**kwargs) -> None:
+        return None
+
+    monkeypatch.setattr(write_controller, 'account_exists', account_exists)
+    monkeypatch.setattr(write_controller, 'encode_event', encode_event)
+    monkeypatch.setattr(write_controller, 'produce_event', produce_event)
+    monkeypatch.setattr(write_controller, 'forget_missing', noop)
+    monkeypatch.setattr(write_controller, 'add_registered_email', noop)
+    return state
+
+
+def test_reservation_key_is_normalized():
+    assert email_reservation_key(email=' JohnDoe@Example.com ') == 'reservation:email:johndoe@example.com'
+    assert email_reservation_key(email='johndoe@example.com') == email_reservation_key(email='JOHNDOE@example.com')
+
+
+@pytest.mark.anyio
+async def test_unavailable_redis_does_not_block_sign_up(fake_redis):
+    # The database check still guards sign-ups
+    fake_redis.available = False
+    token = await reserve_email(email='johndoe@example.com')
+
+    assert token == UNRESERVED
+    await release_email(email='johndoe@example.com', token=token)
+
+
+@pytest.mark.anyio
+async def test_reserved_email_is_refused(fake_redis):
+    token = await reserve_email(email='johndoe@example.com')
+
+    assert token
+    assert await reserve_email(email='JohnDoe@example.com') is None
+
+    # Free again once released
+    await release_email(email='johndoe@example.com', token=token)
+    assert await reserve_email(email='johndoe@example.com')
+
+
+@pytest.mark.anyio
+async def test_release_keeps_another_callers_reservation(fake_redis):
+    token = await reserve_email(email='johndoe@example.com')
+
+    # A stale token, e.g. from a reservation that expired and was taken again
+    await release_email(email='johndoe@example.com', token='stale')
+
+    assert await fake_redis.get(email_reservation_key(email='johndoe@example.com').encode()) == token.encode()
+    assert await reserve_email(email='johndoe@example.com') is None
+
+
+@pytest.mark.anyio
+async def test_sign_up_keeps_the_reservation(fake_redis, sign_up, new_account):
+    await write_controller.create_new_account_controller(new_account=new_account)
+
+    assert len(sign_up['events']) == 1
+    assert await reserve_email(email=new_account.email) is None
+
+
+@pytest.mark.anyio
+async def test_concurrent_sign_up_is_refused(fake_redis, sign_up, new_account):
+    await reserve_email(email=new_account.email)
+
+    with pytest.raises(HTTPException) as err:
+        await write_controller.create_new_account_controller(new_account=new_account)
+
+    assert err.value.status_code == 409
+    assert sign_up['events'] == []
+
+
+@pytest.mark.anyio
+async def test_failed_produce_releases_the_reservation(fake_redis, sign_up, new_account):
+    sign_up['produce_error'] = RuntimeError('broker down')
+
+    with pytest.raises(RuntimeError):
+        await write_controller.create_new_account_controller(new_account=new_account)
+
+    assert await reserve_email(email=new_account.email)
+
+
+@pytest.mark.anyio
+async def test_existing_account_releases_the_reservation(fake_redis, sign_up, new_account):
+    sign_up['account_exists'] = True
+
+    with pytest.raises(HTTPException) as err:
+        await write_controller.create_new_account_controller(new_account=new_account)
+
+    assert err.value.status_code == 409
+    assert await reserve_email(email=new_account.email)
@@ -0,0 +1,63 @@
+from core.event.event_serializer import serialize_event, load_event_serializers, parsed_schemas, EVENT_MODELS
+from core.model.account_model import AccountAvroOut, AccountID, Disable_Enable_Account, UpdatePhoneNumberOut
+from core.model.avro_model import AccountEmailUpdate
+from core.model.otp_model import OTPAvroOut
+from core.model.invalidate_cache_model import InvalidateCache
+from core.enums.enum import OTP_Purpose
+
+
+test_account = {
+    "password": "stringst",
+    "confirm_password": "stringst",
+    "email": "johndoe@example.com",
+    "firstname": "John",
+    "lastname": "Doe",
+    "phone_number": "915 1234 789",
+    "country_code": "+234",
+    "country": "Nigeria",
+    "username": "ID used to retrieve the account username",
+    "device": {
+        "device_name": "Samsong s23 ultra",
+        "platform": "IOS",
+        "ip_address": "127.0.0.1",
+        "device_model": "string",
+        "device_id": "string",
+        "screen_info": {
+            "height": 1920,
+            "width": 720,
+            "resolution": 1200
+        },
+        "device_serial_number": "124578963",
+        "is_active": True
+    },
+    "display_pics": "https://example.com/"
+}
+
+
+def test_load_event_serializers_parses_every_model():
+    load_event_serializers()
+
+    assert set(EVENT_MODELS) <= set(parsed_schemas)
+
+
+def test_registry_matches_model_serialize():
+    test_events = [
+        (AccountAvroOut, test_account),
+        (OTPAvroOut, {'purpose': 'forgot password', 'firstname': 'John', 'email': 'johndoe@example.com', 'phone_number': '915 1234 789'}),
+        (AccountID, {'id': '7845941214687'}),
+        (Disable_Enable_Account, {'id': '7845941214687', 'disabled': True}),
+        (AccountEmailUpdate, {'email': 'johndoe@example.com', 'otp': 'abc', 'purpose': OTP_Purpose.email_verification.value}),
+        (UpdatePhoneNumberOut, {'id': '7845941214687', 'new_phone_number': '08145632147', 'firstname': 'John', 'email': 'johndoe@example.com'}),
+        (InvalidateCache, {'key': 'otp:johndoe@example.com'}),
+    ]
+
+    for model, data in test_events:
+        assert serialize_event(model, data) == model(**data).serialize()
+
+
+def test_buffer_reuse_returns_independent_bytes():
+    first_event = serialize_event(AccountID, {'id': 'first'})
+    second_event = serialize_event(AccountID, {'id': 'second-and-longer'})
+
+    assert AccountID.deserialize(first_event).id == 'first'
+    assert AccountID.deserialize(second_event).id == 'second-and-longer'
@@ -0,0 +1,85 @@
+import os
+import pytest
+from core.event.event_spool import EventSpool, SpoolFullError, encode_events, decode_events
+
+
+test_event = ('account_create', b'\x02avro-payload', 'johndoe@example.com', [('trace-id', b'123')])
+
+
+def drain(spool: EventSpool) -> list:
+    events = []
+    record = spool.peek()
+    while record is not None:
+        record_events, segment, next_pos = record
+        events.extend(record_events)
+        spool.commit(segment=segment, next_pos=next_pos)
+        record = spool.peek()
+    return events
+
+
+def test_encode_decode_round_trip():
+    unkeyed_event = ('account_delete', b'', None, None)
+
+    assert decode_events(encode_events([test_event, unkeyed_event])) == [test_event, unkeyed_event]
+
+
+def test_spool_replays_in_order(tmp_path):
+    spool = EventSpool(directory=str(tmp_path), segment_bytes=4096, max_segments=4)
+    spool.open()
+
+    for i in range(5):
+        spool.append(events=[('account_create', f'{i}'.encode(), None, None)])
+
+    assert spool.pending
+    assert [value for _, value, _, _ in drain(spool)] == [b'0', b'1', b'2', b'3', b'4']
+    assert not spool.pending
+    assert spool.metrics()['replayed_records'] == 5
+
+
+def test_spool_survives_restart(tmp_path):
+    spool = EventSpool(directory=str(tmp_path), segment_bytes=4096, max_segments=4)
+    spool.open()
+    spool.append(events=[test_event])
+    spool.append(events=[test_event, test_event])
+    spool.close()
+
+    reopened_spool = EventSpool(directory=str(tmp_path), segment_bytes=4096, max_segments=4)
+    reopened_spool.open()
+
+    assert reopened_spool.pending_records == 2
+    assert drain(reopened_spool) == [test_event] * 3
+
+
+def test_spool_rolls_segments_and_is_bounded(tmp_path):
+    spool = EventSpool(directory=str(tmp_path), segment_bytes=256, max_segments=2)
+    spool.open()
+
+    with pytest.raises(SpoolFullError):
+        for _ in range(100):
+            spool.append(events=[test_event])
+
+    assert spool.metrics()['segments'] == 2
+    assert spool.metrics()['rejected_records'] == 1
+
+    # Replayed segments free up room
+    drain(spool)
+    spool.append(events=[test_event])
+    assert len(os.listdir(tmp_path)) <= 2
+
+
+def test_spool_ignores_torn_tail(tmp_path):
+    spool = EventSpool(directory=str(tmp_path), segment_bytes=4096, max_segments=4)
+    spool.open()
+    spool.append(events=[test_event])
+    spool.append(events=[test_event])
+
+    # Corrupt the last record body
+    segment = spool.segments[-1][1]
+    segment._map[segment.write_pos - 1] ^= 0xFF
+    spool.close()
+
+    reopened_spool = EventSpool(directory=str(tmp_path), segment_bytes=4096, max_segments=4)
+    reopened_spool.open()
+
+    assert reopened_spool.pending_records == 1
+    assert drain(reopened_spool) == [test_event]
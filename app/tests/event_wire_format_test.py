@@ -0,0 +1,98 @@
+import asyncio
+import pytest
+import struct
+from fastapi import HTTPException
+from core.event import event_serializer
+from core.event.event_serializer import encode_event, load_schema_ids, serialize_event, event_topic_models, stop_schema_ids
+from core.helper import schema_registry_helper
+from core.helper.local_schema_registry import LocalSchemaRegistryClient
+from core.model.account_model import AccountID, Disable_Enable_Account
+from core.utils.settings import settings
+
+
+@pytest.fixture(scope="session")
+def anyio_backend() -> str:
+    return 'asyncio'
+
+
+@pytest.fixture
+def local_registry(monkeypatch) -> LocalSchemaRegistryClient:
+    registry = LocalSchemaRegistryClient()
+    monkeypatch.setattr(schema_registry_helper, 'registry_client', registry)
+    monkeypatch.setattr(schema_registry_helper, 'schema_ids', {})
+    monkeypatch.setattr(event_serializer, 'wire_headers', {})
+    monkeypatch.setattr(settings, 'api_event_wire_format', 'confluent')
+    return registry
+
+
+@pytest.mark.anyio
+async def test_event_has_magic_byte_and_schema_id(local_registry: LocalSchemaRegistryClient):
+    event = await encode_event(settings.api_delete_account_topic, AccountID, {'id': '7845941214687'})
+
+    magic, schema_id = struct.unpack('>bI', event[:5])
+    registered_schema = await local_registry.get_by_id(schema_id)
+
+    assert magic == 0
+    assert registered_schema.raw_schema == AccountID.avro_schema_to_python()
+    assert event[5:] == serialize_event(AccountID, {'id': '7845941214687'})
+
+
+@pytest.mark.anyio
+async def test_schema_ids_are_resolved_once(local_registry: LocalSchemaRegistryClient):
+    await load_schema_ids()
+    startup_requests = local_registry.requests
+
+    for _ in range(10):
+        await encode_event(settings.api_disable_enable_account_topic, Disable_Enable_Account, {'id': '7845941214687', 'disabled': True})
+
+    assert startup_requests == len(event_topic_models())
+    assert local_registry.requests == startup_requests
+
+
+@pytest.mark.anyio
+async def test_schemaless_wire_format(local_registry: LocalSchemaRegistryClient, monkeypatch):
+    monkeypatch.setattr(settings, 'api_event_wire_format', 'schemaless')
+
+    event = await encode_event(settings.api_delete_account_topic, AccountID, {'id': '7845941214687'})
+
+    assert event == serialize_event(AccountID, {'id': '7845941214687'})
+    assert local_registry.requests == 0
+
+
+class UnavailableRegistry(LocalSchemaRegistryClient):
+    async def register(self, subject: str, schema, **kwargs) -> int:
+        self.requests += 1
+        raise ConnectionError('registry unavailable')
+
+
+@pytest.mark.anyio
+async def test_failed_lookup_backs_off(local_registry: LocalSchemaRegistryClient, monkeypatch):
+    registry = UnavailableRegistry()
+    monkeypatch.setattr(schema_registry_helper, 'registry_client', registry)
+    monkeypatch.setattr(event_serializer, '_failed_lookups', {})
+
+    for _ in range(5):
+        with pytest.raises(HTTPException) as err:
+            await encode_event(settings.api_delete_account_topic, AccountID, {'id': '7845941214687'})
+        assert err.value.status_code == 503
+
+    assert registry.requests == 1
+
+
+@pytest.mark.anyio
+async def test_failed_startup_load_is_retried_in_background(local_registry: LocalSchemaRegistryClient, monkeypatch):
+    monkeypatch.setattr(schema_registry_helper, 'registry_client', UnavailableRegistry())
+    monkeypatch.setattr(settings, 'api_schema_registry_retry_interval', 0.01)
+
+    await load_schema_ids()
+    assert event_serializer._load_task is not None
+
+    # Registry recovers
+    monkeypatch.setattr(schema_registry_helper, 'registry_client', local_registry)
+    for _ in range(100):
+        if event_serializer._load_task is None:
+            break
+        await asyncio.sleep(0.01)
+
+    await stop_schema_ids()
+    assert len(event_serializer.wire_headers) == len(event_topic_models())
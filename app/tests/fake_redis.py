@@ -0,0 +1,254 @@
+import time
+from core.helper import cache_helper, email_filter_helper, otp_helper
+
+
+class FakeScript:
+    def __init__(self, redis: 'FakeRedis', run):
+        self.redis = redis
+        self.run = run
+
+    async def __call__(self, keys: list = [], args: list = []):
+        self.redis.check_available()
+        return self.run(self.redis, [FakeRedis.encode(key) for key in keys], [FakeRedis.encode(arg) for arg in args])
+
+
+class FakePipeline:
+    # Queues commands and runs them in order on execute
+    def __init__(self, redis: 'FakeRedis'):
+        self.redis = redis
+        self.commands = []
+
+    async def __aenter__(self) -> 'FakePipeline':
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        self.commands = []
+
+    def __getattr__(self, name: str):
+        def queue(*args, **kwargs):
+            self.commands.append((name, args, kwargs))
+            return self
+        return queue
+
+    async def execute(self) -> list:
+        self.redis.check_available()
+        return [await getattr(self.redis, name)(*args, **kwargs) for name, args, kwargs in self.commands]
+
+
+class FakeRedis:
+    """
+    In-memory stand-in for redis.asyncio.Redis covering the commands and scripts this service uses.
+    Scripts are run by their Python equivalents in SCRIPTS.
+    """
+
+    def __init__(self):
+        self.data: dict[bytes, object] = {}
+        self.expires_at: dict[bytes, float] = {}
+        self.available = True
+        self.calls: list[str] = []
+
+    @staticmethod
+    def encode(value) -> bytes:
+        if isinstance(value, (bytes, bytearray)):
+            return bytes(value)
+        return str(value).encode()
+
+    def check_available(self) -> None:
+        if not self.available:
+            raise ConnectionError('redis unavailable')
+
+    def _expire(self, key: bytes) -> None:
+        if key in self.expires_at and self.expires_at[key] <= time.monotonic():
+            self.data.pop(key, None)
+            self.expires_at.pop(key, None)
+
+    def _get(self, key) -> object:
+        key = self.encode(key)
+        self._expire(key)
+        return self.data.get(key)
+
+    def _command(self, name: str) -> None:
+        self.check_available()
+        self.calls.append(name)
+
+    def pipeline(self, transaction: bool = True) -> FakePipeline:
+        return FakePipeline(self)
+
+    def register_script(self, source: str) -> FakeScript:
+        return FakeScript(self, SCRIPTS[source])
+
+    async def ping(self) -> bool:
+        self._command('ping')
+        return True
+
+    async def get(self, key):
+        self._command('get')
+        value = self._get(key)
+        return bytes(value) if value is not None else None
+
+    async def mget(self, keys: list):
+        self._command('mget')
+        return [bytes(value) if value is not None else None for value in map(self._get, keys)]
+
+    async def set(self, key, value, ex: int | None = None, px: int | None = None, nx: bool = False):
+        self._command('set')
+        key = self.encode(key)
+        if nx and self._get(key) is not None:
+            return None
+
+        self.data[key] = self.encode(value)
+        self.expires_at.pop(key, None)
+        if ex is not None:
+            self.expires_at[key] = time.monotonic() + int(ex)
+        if px is not None:
+            self.expires_at[key] = time.monotonic() + int(px) / 1000
+        return True
+
+    async def delete(self, *keys) -> int:
+        self._command('delete')
+        deleted = 0
+        for key in map(self.encode, keys):
+            if self._get(key) is not None:
+                deleted += 1
+            self.data.pop(key, None)
+            self.expires_at.pop(key, None)
+        return deleted
+
+    async def exists(self, *keys) -> int:
+        self._command('exists')
+        return sum(self._get(key) is not None for key in keys)
+
+    async def pttl(self, key) -> int:
+        self._command('pttl')
+        key = self.encode(key)
+        if self._get(key) is None:
+            return -2
+        if key not in self.expires_at:
+            return -1
+        return int((self.expires_at[key] - time.monotonic()) * 1000)
+
+    async def getbit(self, key, offset: int) -> int:
+        self._command('getbit')
+        bits = self._get(key) or b''
+        index = offset >> 3
+        return int(index < len(bits) and bool(bits[index] & (0x80 >> (offset & 7))))
+
+    async def setbit(self, key, offset: int, value: int) -> int:
+        self._command('setbit')
+        key = self.encode(key)
+        bits = bytearray(self._get(key) or b'')
+        index = offset >> 3
+        if index >= len(bits):
+            bits.extend(bytes(index + 1 - len(bits)))
+        previous = int(bool(bits[index] & (0x80 >> (offset & 7))))
+        if value:
+            bits[index] |= 0x80 >> (offset & 7)
+        else:
+            bits[index] &= ~(0x80 >> (offset & 7)) & 0xFF
+        self.data[key] = bytes(bits)
+        return previous
+
+    async def bitop(self, operation: str, destination, *keys) -> int:
+        self._command('bitop')
+        assert operation == 'OR'
+        sources = [self._get(key) or b'' for key in keys]
+        size = max(map(len, sources), default=0)
+        result = bytearray(size)
+        for source in sources:
+            for index, byte in enumerate(source):
+                result[index] |= byte
+        self.data[self.encode(destination)] = bytes(result)
+        return size
+
+    async def sadd(self, key, *members) -> int:
+        self._command('sadd')
+        key = self.encode(key)
+        members = {self.encode(member) for member in members}
+        current = self._get(key) or set()
+        added = len(members - current)
+        self.data[key] = current | members
+        return added
+
+    async def smembers(self, key) -> set:
+        self._command('smembers')
+        return set(self._get(key) or set())
+
+    async def srem(self, key, *members) -> int:
+        self._command('srem')
+        key = self.encode(key)
+        current = self._get(key) or set()
+        members = {self.encode(member) for member in members}
+        if current - members:
+            self.data[key] = current - members
+        else:
+            self.data.pop(key, None)
+        return len(current & members)
+
+
+def release_lock(redis: FakeRedis, keys: list, args: list):
+    if redis._get(keys[0]) == args[0]:
+        redis.data.pop(keys[0], None)
+        return 1
+    return 0
+
+
+def cache_account(redis: FakeRedis, keys: list, args: list):
+    if redis._get(keys[1]) is not None:
+        return 0
+    redis.data[keys[0]] = args[0]
+    redis.expires_at[keys[0]] = time.monotonic() + int(args[1])
+    return 1
+
+
+def consume_read_otp(redis: FakeRedis, keys: list, args: list):
+    if redis._get(keys[0]) == args[0]:
+        for key in keys:
+            redis.data.pop(key, None)
+        return 1
+    return 0
+
+
+def consume_otp(redis: FakeRedis, keys: list, args: list):
+    for index, key in enumerate(keys):
+        value = redis._get(key)
+        if value is None:
+            continue
+        ttl = int((redis.expires_at[key] - time.monotonic()) * 1000) if key in redis.expires_at else -1
+        otp = value if ttl < 0 or args[index] != b'1' else None
+        for other_key in keys:
+            redis.data.pop(other_key, None)
+        return [ttl, otp] if otp is not None else [ttl]
+    return None
+
+
+def add_email(redis: FakeRedis, keys: list, args: list):
+    meta = redis._get(keys[1])
+    if meta is None or redis._get(keys[0]) is None:
+        redis.data[keys[2]] = (redis._get(keys[2]) or set()) | {args[1]}
+        return 0
+    if not args[0] or not meta.endswith(args[0]):
+        return -1
+    bits = bytearray(redis._get(keys[0]))
+    for position in map(int, args[2:]):
+        if position >> 3 >= len(bits):
+            bits.extend(bytes((position >> 3) + 1 - len(bits)))
+        bits[position >> 3] |= 0x80 >> (position & 7)
+    redis.data[keys[0]] = bytes(bits)
+    return 1
+
+
+def publish_email_filter(redis: FakeRedis, keys: list, args: list):
+    if redis._get(keys[1]):
+        return 0
+    redis.data[keys[0]] = args[0]
+    return 1
+
+
+SCRIPTS = {
+    cache_helper.RELEASE_LOCK_SCRIPT: release_lock,
+    cache_helper.CACHE_ACCOUNT_SCRIPT: cache_account,
+    otp_helper.CONSUME_READ_OTP_SCRIPT: consume_read_otp,
+    otp_helper.CONSUME_OTP_SCRIPT: consume_otp,
+    email_filter_helper.ADD_EMAIL_SCRIPT: add_email,
+    email_filter_helper.PUBLISH_EMAIL_FILTER_SCRIPT: publish_email_filter,
+}
@@ -0,0 +1,29 @@
+from core.helper.index_helper import plan_problem, plan_stages, winning_plan
+
+
+def explain(plan: dict) -> dict:
+    return {'queryPlanner': {'winningPlan': plan}}
+
+
+def test_covered_lookup_has_no_fetch():
+    plan = {'stage': 'LIMIT', 'inputStage': {'stage': 'PROJECTION_COVERED', 'inputStage': {'stage': 'IXSCAN', 'indexName': 'email_unique'}}}
+
+    stages = plan_stages(winning_plan(explain(plan)))
+
+    assert stages == ['LIMIT', 'PROJECTION_COVERED', 'IXSCAN']
+    assert plan_problem(stages=stages, covered=True) is None
+
+
+def test_fetch_is_only_a_problem_for_covered_lookups():
+    plan = {'stage': 'FETCH', 'inputStage': {'stage': 'IXSCAN'}}
+    stages = plan_stages(winning_plan(explain(plan)))
+
+    assert plan_problem(stages=stages, covered=True) == 'not covered by its index'
+    assert plan_problem(stages=stages, covered=False) is None
+
+
+def test_collection_scan_is_reported():
+    # Slot based engine plans are nested under queryPlan
+    plan = {'queryPlan': {'stage': 'PROJECTION_SIMPLE', 'inputStage': {'stage': 'COLLSCAN'}}}
+
+    assert plan_problem(stages=plan_stages(winning_plan(explain(plan))), covered=False) == 'not indexed'
@@ -0,0 +1,65 @@
+from core.helper.local_cache import LocalCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_hit_and_miss():
+    cache = LocalCache(max_bytes=10_000, ttl=5)
+    cache.set('1', {'id': '1'}, size=20)
+
+    assert cache.get('1') == {'id': '1'}
+    assert cache.get('2') is None
+    assert cache.metrics()['hits'] == 1
+    assert cache.metrics()['misses'] == 1
+
+
+def test_entries_expire():
+    clock = Clock()
+    cache = LocalCache(max_bytes=10_000, ttl=5, clock=clock)
+    cache.set('1', {'id': '1'}, size=20)
+
+    clock.now = 5
+    assert cache.get('1') is None
+    assert cache.metrics()['expirations'] == 1
+    assert cache.size_bytes == 0
+
+
+def test_least_recently_used_is_evicted_within_budget():
+    entry_size = 100 + LocalCache.ENTRY_OVERHEAD
+    cache = LocalCache(max_bytes=entry_size * 2, ttl=5)
+    cache.set('1', 'a', size=100)
+    cache.set('2', 'b', size=100)
+
+    # Touch 1 so 2 becomes the least recently used
+    cache.get('1')
+    cache.set('3', 'c', size=100)
+
+    assert cache.get('2') is None
+    assert cache.get('1') == 'a'
+    assert cache.get('3') == 'c'
+    assert cache.size_bytes <= cache.max_bytes
+    assert cache.metrics()['evictions'] == 1
+
+
+def test_oversized_and_disabled_cache_store_nothing():
+    cache = LocalCache(max_bytes=0, ttl=5)
+    cache.set('1', 'a', size=1)
+
+    assert len(cache) == 0
+
+
+def test_invalidate():
+    cache = LocalCache(max_bytes=10_000, ttl=5)
+    cache.set('1', 'a', size=10)
+    cache.set('1', 'b', size=30)
+    cache.invalidate('1')
+
+    assert cache.get('1') is None
+    assert cache.size_bytes == 0
+    assert cache.metrics()['invalidations'] == 1
@@ -0,0 +1,10 @@
+import json
+from core.helper.metrics_helper import service_metrics
+
+
+def test_every_component_reports_metrics():
+    metrics = service_metrics()
+
+    assert set(metrics) == {'redis_pool', 'local_accounts', 'single_flight', 'missing_accounts', 'email_filter', 'event_spool'}
+    assert 'coalescing_ratio' in metrics['single_flight']['account_reads']
+    assert json.dumps(metrics, default=str)
@@ -0,0 +1,39 @@
+import pytest
+from core.helper import negative_cache_helper
+from core.helper.local_cache import LocalCache
+from core.helper.negative_cache_helper import forget_missing, is_known_missing, is_missing_locally, missing_account_key, remember_missing
+
+
+@pytest.fixture(scope="session")
+def anyio_backend() -> str:
+    return 'asyncio'
+
+
+@pytest.fixture(autouse=True)
+def missing_accounts(monkeypatch) -> LocalCache:
+    cache = LocalCache(max_bytes=10_000, ttl=2)
+    monkeypatch.setattr(negative_cache_helper, 'missing_accounts', cache)
+    return cache
+
+
+def test_keys_are_namespaced_by_field():
+    assert missing_account_key(field='email', value='johndoe@example.com') == 'missing:account:email:johndoe@example.com'
+    assert missing_account_key(field='id', value='1') != missing_account_key(field='phone_number', value='1')
+
+
+@pytest.mark.anyio
+async def test_misses_are_remembered_locally(missing_accounts: LocalCache):
+    await remember_missing(field='email', value='johndoe@example.com')
+
+    assert is_missing_locally(field='email', value='johndoe@example.com')
+    assert not is_missing_locally(field='phone_number', value='johndoe@example.com')
+    assert await is_known_missing(field='email', value='johndoe@example.com')
+
+
+@pytest.mark.anyio
+async def test_created_account_is_forgotten(missing_accounts: LocalCache):
+    await remember_missing(field='email', value='johndoe@example.com')
+    await forget_missing(field='email', value='johndoe@example.com')
+
+    assert not is_missing_locally(field='email', value='johndoe@example.com')
+    assert missing_accounts.metrics()['invalidations'] == 1
@@ -0,0 +1,246 @@
+import asyncio
+import pytest
+from fastapi import HTTPException
+from core.controller import write_controller
+from core.helper.encryption_helper import encrypt
+from core.helper import otp_helper
+from core.helper.otp_helper import OTP_KEY_V1, OTP_KEY_V2, consume_read_otp, is_live, is_valid_otp, otp_key, otp_key_versions, otp_keys, otp_ttl_ms, read_otp, store_otp, trusted_ttls
+from core.enums.enum import OTP_Purpose
+from core.model.account_model import UpdatePhoneNumber, VerifyAccountEmail
+from core.model.otp_model import OTPAvroIn
+from core.utils.settings import settings
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from tests.fake_redis import FakeRedis
+
+
+def otp(expires_in: timedelta) -> OTPAvroIn:
+    return OTPAvroIn(
+        purpose='email verification',
+        firstname='John',
+        email='johndoe@example.com',
+        phone_number='915 1234 789',
+        otp='123456',
+        created_on=datetime.now(timezone.utc),
+        expires_on=datetime.now(timezone.utc) + expires_in,
+    )
+
+
+def test_otp_key_matches_the_otp_writer():
+    key = otp_key(otp='123456', email_or_phone_number='johndoe@example.com', purpose='email verification')
+
+    assert key == f"otp:johndoe@example.com-{encrypt('123456')}-email verification"
+
+
+def test_ttl_matches_expiry():
+    assert 599_000 < otp_ttl_ms(otp(timedelta(minutes=10))) <= 600_000
+    assert otp_ttl_ms(otp(timedelta(minutes=-1))) < 0
+
+
+def test_legacy_keys_are_checked_against_expires_on():
+    assert is_live(otp(timedelta(minutes=10)).serialize()).phone_number == '915 1234 789'
+    assert is_live(otp(timedelta(minutes=-1)).serialize()) is None
+
+
+def test_v2_key_is_short_and_keyed(monkeypatch):
+    monkeypatch.setattr(settings, 'api_otp_key_secret', 'secret')
+    key = otp_key(otp='123456', email_or_phone_number='johndoe@example.com', purpose='email verification', version=OTP_KEY_V2)
+
+    monkeypatch.setattr(settings, 'api_otp_key_secret', 'other-secret')
+    other_key = otp_key(otp='123456', email_or_phone_number='johndoe@example.com', purpose='email verification', version=OTP_KEY_V2)
+
+    assert key.startswith('otp:2:')
+    assert len(key) == 28
+    assert key != other_key
+
+
+def test_readers_accept_both_versions_during_migration(monkeypatch):
+    monkeypatch.setattr(settings, 'api_otp_key_secret', '')
+    assert otp_key_versions() == [OTP_KEY_V1]
+
+    monkeypatch.setattr(settings, 'api_otp_key_secret', 'secret')
+    monkeypatch.setattr(settings, 'api_otp_key_version', OTP_KEY_V1)
+    assert otp_key_versions() == [OTP_KEY_V1, OTP_KEY_V2]
+
+    monkeypatch.setattr(settings, 'api_otp_key_version', OTP_KEY_V2)
+    assert otp_key_versions() == [OTP_KEY_V2, OTP_KEY_V1]
+
+    monkeypatch.setattr(settings, 'api_otp_key_accept_v1', False)
+    keys = otp_keys(otp='123456', email_or_phone_number='johndoe@example.com', purpose='email verification')
+    assert keys == [otp_key(otp='123456', email_or_phone_number='johndoe@example.com', purpose='email verification', version=OTP_KEY_V2).encode()]
+
+
+@pytest.fixture(scope="session")
+def anyio_backend() -> str:
+    return 'asyncio'
+
+
+class OTPStore:
+    # Redis stand-in holding OTP payloads by key
+    def __init__(self, payloads: dict[bytes, bytes]):
+        self.payloads = payloads
+
+    async def mget(self, keys: list[bytes]) -> list[bytes | None]:
+        return [self.payloads.get(key) for key in keys]
+
+
+@pytest.mark.anyio
+async def test_reading_an_otp_does_not_consume_it(monkeypatch):
+    monkeypatch.setattr(settings, 'api_otp_key_secret', '')
+    key = otp_key(otp='123456', email_or_phone_number='johndoe@example.com', purpose='phone verification').encode()
+    payload = otp(timedelta(minutes=10)).serialize()
+    store = OTPStore({key: payload})
+    monkeypatch.setattr(otp_helper, 'redis', store)
+
+    keys, read_payload, otp_obj = await read_otp(otp='123456', email_or_phone_number='johndoe@example.com', purpose='phone verification')
+
+    assert keys == [key]
+    assert read_payload == payload
+    assert otp_obj.phone_number == '915 1234 789'
+    assert store.payloads == {key: payload}
+
+
+@pytest.mark.anyio
+async def test_expired_otp_is_not_read(monkeypatch):
+    monkeypatch.setattr(settings, 'api_otp_key_secret', '')
+    key = otp_key(otp='123456', email_or_phone_number='johndoe@example.com', purpose='phone verification').encode()
+    monkeypatch.setattr(otp_helper, 'redis', OTPStore({key: otp(timedelta(minutes=-1)).serialize()}))
+
+    assert await read_otp(otp='123456', email_or_phone_number='johndoe@example.com', purpose='phone verification') is None
+
+
+@pytest.fixture
+def fake_redis(monkeypatch) -> FakeRedis:
+    fake = FakeRedis()
+    monkeypatch.setattr(otp_helper, 'redis', fake)
+    monkeypatch.setattr(otp_helper, 'consume_otp_script', fake.register_script(otp_helper.CONSUME_OTP_SCRIPT))
+    monkeypatch.setattr(otp_helper, 'consume_read_otp_script', fake.register_script(otp_helper.CONSUME_READ_OTP_SCRIPT))
+    return fake
+
+
+@pytest.fixture
+def v2_keys(monkeypatch):
+    monkeypatch.setattr(settings, 'api_otp_key_secret', 'secret')
+    monkeypatch.setattr(settings, 'api_otp_key_version', OTP_KEY_V2)
+    monkeypatch.setattr(settings, 'api_otp_key_accept_v1', True)
+
+
+@pytest.mark.anyio
+async def test_redis_failures_fail_the_otp_check(fake_redis):
+    fake_redis.available = False
+
+    assert not await consume_read_otp(keys=[b'otp:missing'], payload=b'payload')
+    assert not await is_valid_otp(otp='123456', email_or_phone_number='johndoe@example.com', purpose='email verification')
+
+
+@pytest.mark.anyio
+async def test_live_v2_otp_is_accepted_once(fake_redis, v2_keys):
+    await store_otp(otp_obj=otp(timedelta(minutes=10)), otp='123456', email_or_phone_number='johndoe@example.com', purpose='email verification')
+
+    assert await is_valid_otp(otp='123456', email_or_phone_number='johndoe@example.com', purpose='email verification')
+    assert not await is_valid_otp(otp='123456', email_or_phone_number='johndoe@example.com', purpose='email verification')
+
+
+@pytest.mark.anyio
+async def test_expired_v2_otp_is_rejected(fake_redis, v2_keys):
+    await store_otp(otp_obj=otp(timedelta(milliseconds=20)), otp='123456', email_or_phone_number='johndoe@example.com', purpose='email verification')
+    await asyncio.sleep(0.03)
+
+    # Redis dropped the key at expires_on
+    assert not await is_valid_otp(otp='123456', email_or_phone_number='johndoe@example.com', purpose='email verification')
+
+
+@pytest.mark.anyio
+async def test_v2_otp_without_ttl_is_checked_against_expires_on(fake_redis, v2_keys):
+    key = otp_key(otp='123456', email_or_phone_number='johndoe@example.com', purpose='email verification', version=OTP_KEY_V2).encode()
+    await fake_redis.set(key, otp(timedelta(minutes=-1)).serialize())
+
+    assert not await is_valid_otp(otp='123456', email_or_phone_number='johndoe@example.com', purpose='email verification')
+
+
+@pytest.mark.anyio
+async def test_v1_otp_is_checked_against_expires_on(fake_redis, v2_keys):
+    # Written before the migration, with a TTL that may outlive expires_on
+    key = otp_key(otp='123456', email_or_phone_number='johndoe@example.com', purpose='email verification', version=OTP_KEY_V1).encode()
+    await fake_redis.set(key, otp(timedelta(minutes=-1)).serialize(), ex=600)
+
+    assert not await is_valid_otp(otp='123456', email_or_phone_number='johndoe@example.com', purpose='email verification')
+
+
+@pytest.mark.anyio
+async def test_email_verification_accepts_a_v2_otp(fake_redis, v2_keys, monkeypatch):
+    events = []
+
+    async def has_account(field: str, value: str) -> bool:
+        return True
+
+    async def encode_event(topic: str, model, data: dict) -> bytes:
+        return b'event'
+
+    async def produce_event(topic: str, value, key: str | None = None, headers: tuple | None = None) -> None:
+        events.append(topic)
+
+    monkeypatch.setattr(write_controller, 'has_account', has_account)
+    monkeypatch.setattr(write_controller, 'encode_event', encode_event)
+    monkeypatch.setattr(write_controller, 'produce_event', produce_event)
+    await store_otp(otp_obj=otp(timedelta(minutes=10)), otp='123456', email_or_phone_number='johndoe@example.com', purpose=OTP_Purpose.email_verification.value)
+
+    data = VerifyAccountEmail(email='johndoe@example.com', otp='123456')
+    response = await write_controller.verify_account_email_ctrl(data=data)
+
+    assert response.status_code == 200
+    assert events == [settings.api_email_verified_topic]
+    with pytest.raises(HTTPException):
+        await write_controller.verify_account_email_ctrl(data=data)
+
+
+def test_only_v2_key_ttls_are_trusted(monkeypatch):
+    monkeypatch.setattr(settings, 'api_otp_key_secret', '')
+    assert trusted_ttls() == ['0']
+
+    monkeypatch.setattr(settings, 'api_otp_key_secret', 'secret')
+    monkeypatch.setattr(settings, 'api_otp_key_version', OTP_KEY_V2)
+    monkeypatch.setattr(settings, 'api_otp_key_accept_v1', True)
+    assert trusted_ttls() == ['1', '0']
+
+
+@pytest.mark.anyio
+async def test_changed_otp_is_not_consumed(fake_redis, monkeypatch):
+    monkeypatch.setattr(settings, 'api_otp_key_secret', '')
+    await store_otp(otp_obj=otp(timedelta(minutes=10)), otp='123456', email_or_phone_number='johndoe@example.com', purpose='phone verification')
+    keys, payload, _ = await read_otp(otp='123456', email_or_phone_number='johndoe@example.com', purpose='phone verification')
+
+    # Sent again between the read and the consume
+    reissued = otp(timedelta(minutes=20)).serialize()
+    await fake_redis.set(keys[0], reissued, ex=1200)
+
+    assert not await consume_read_otp(keys=keys, payload=payload)
+    assert await fake_redis.get(keys[0]) == reissued
+
+
+@pytest.mark.anyio
+async def test_phone_number_update_refuses_an_otp_changed_after_the_check(fake_redis, monkeypatch):
+    monkeypatch.setattr(settings, 'api_otp_key_secret', '')
+    events = []
+
+    async def produce_event(topic: str, value, key: str | None = None, headers: tuple | None = None) -> None:
+        events.append(topic)
+
+    async def get_valid_otp(**kwargs):
+        valid_otp = await otp_helper.get_valid_otp(**kwargs)
+
+        # Another request re-sends the OTP while this one checks the phone number
+        await fake_redis.set(valid_otp[0][0], otp(timedelta(minutes=20)).serialize(), ex=1200)
+        return valid_otp
+
+    monkeypatch.setattr(write_controller, 'produce_event', produce_event)
+    monkeypatch.setattr(write_controller, 'get_valid_otp', get_valid_otp)
+    await store_otp(otp_obj=otp(timedelta(minutes=10)), otp='123456', email_or_phone_number='johndoe@example.com', purpose=OTP_Purpose.phone_verification.value.lower())
+
+    current_account = SimpleNamespace(id='7845941214687', email='johndoe@example.com', firstname='John')
+    update = UpdatePhoneNumber(otp='123456', new_phone_number='915 1234 789')
+    with pytest.raises(HTTPException) as err:
+        await write_controller.update_phone_number_ctrl(current_account=current_account, phone_number_update=update)
+
+    assert err.value.status_code == 400
+    assert events == []
@@ -0,0 +1,43 @@
+from core.event.partition_key import event_key, ConsistentHashPartitioner, jump_consistent_hash
+from core.utils.settings import settings
+
+
+def test_account_events_share_a_key():
+    first_key = event_key(topic=settings.api_disable_enable_account_topic, account_id='7845941214687')
+    second_key = event_key(topic=settings.api_disable_enable_account_topic, account_id='7845941214687')
+
+    assert first_key == second_key == '7845941214687'
+
+
+def test_email_keyed_topic_normalizes_email():
+    key = event_key(topic=settings.api_create_account_topic, account_id=None, email=' JohnDoe@Example.com')
+
+    assert key == 'johndoe@example.com'
+
+
+def test_key_falls_back_to_email_when_id_is_missing():
+    key = event_key(topic=settings.api_delete_account_topic, email='johndoe@example.com')
+
+    assert key == 'johndoe@example.com'
+
+
+def test_unkeyed_events_get_distinct_keys():
+    assert event_key(topic=settings.api_delete_account_topic) != event_key(topic=settings.api_delete_account_topic)
+
+
+def test_consistent_hash_partitioner_is_stable():
+    partitioner = ConsistentHashPartitioner()
+    partitions = list(range(10))
+
+    partition = partitioner(b'johndoe@example.com', partitions, partitions)
+
+    assert partition in partitions
+    assert partition == partitioner(b'johndoe@example.com', partitions, partitions)
+
+
+def test_jump_consistent_hash_only_moves_keys_to_new_buckets():
+    for key in range(1000):
+        before = jump_consistent_hash(key, 10)
+        after = jump_consistent_hash(key, 11)
+
+        assert after in (before, 10)
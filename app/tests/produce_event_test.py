@@ -0,0 +1,112 @@
+import asyncio
+import pytest
+from aiokafka.errors import KafkaConnectionError, MessageSizeTooLargeError
+from core.event import produce_event
+from core.event.event_spool import EventSpool
+from core.event.produce_event import is_retriable, replay_window
+
+
+@pytest.fixture(scope="session")
+def anyio_backend() -> str:
+    return 'asyncio'
+
+
+@pytest.fixture
+def spool(tmp_path, monkeypatch) -> EventSpool:
+    spool = EventSpool(directory=str(tmp_path), segment_bytes=64 * 1024, max_segments=4)
+    spool.open()
+    monkeypatch.setattr(produce_event, 'event_spool', spool)
+    yield spool
+    spool.close()
+
+
+class Broker:
+    # Accepts events up to a size limit, enqueued events are delivered when the test resolves them
+    def __init__(self, max_size: int = 1000, connected: bool = True):
+        self.max_size = max_size
+        self.connected = connected
+        self.delivered = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def enqueue_event(self, topic: str, value, key: str, headers: tuple | None = None) -> asyncio.Future:
+        if not self.connected:
+            raise KafkaConnectionError()
+        if len(value) > self.max_size:
+            raise MessageSizeTooLargeError()
+
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        delivery = asyncio.get_running_loop().create_future()
+
+        def deliver():
+            self.in_flight -= 1
+            self.delivered.append(value)
+            delivery.set_result(None)
+
+        asyncio.get_running_loop().call_soon(deliver)
+        return delivery
+
+
+@pytest.fixture
+def broker(monkeypatch) -> Broker:
+    broker = Broker()
+    monkeypatch.setattr(produce_event, 'enqueue_event', broker.enqueue_event)
+    return broker
+
+
+def test_only_transient_failures_are_retriable():
+    assert is_retriable(KafkaConnectionError())
+    assert is_retriable(asyncio.TimeoutError())
+    assert not is_retriable(MessageSizeTooLargeError())
+
+
+@pytest.mark.anyio
+async def test_oversized_event_is_raised_not_spooled(spool: EventSpool, broker: Broker):
+    with pytest.raises(MessageSizeTooLargeError):
+        await produce_event.produce_event(topic='account_create', value=b'x' * 2000, key='johndoe@example.com')
+
+    assert not spool.pending
+
+
+@pytest.mark.anyio
+async def test_unavailable_broker_spools_the_event(spool: EventSpool, broker: Broker):
+    broker.connected = False
+    await produce_event.produce_event(topic='account_create', value=b'1', key='johndoe@example.com')
+
+    assert spool.pending_records == 1
+
+
+@pytest.mark.anyio
+async def test_replay_dead_letters_a_record_that_never_succeeds(spool: EventSpool, broker: Broker):
+    spool.append(events=[('account_create', b'x' * 2000, 'johndoe@example.com', None)])
+    for i in range(5):
+        spool.append(events=[('account_create', f'{i}'.encode(), 'johndoe@example.com', None)])
+
+    assert await replay_window(records=spool.peek_many(limit=10))
+
+    assert broker.delivered == [b'0', b'1', b'2', b'3', b'4']
+    assert spool.metrics()['pending_records'] == 0
+    assert spool.metrics()['dead_letter_records'] == 1
+
+
+@pytest.mark.anyio
+async def test_replay_sends_a_window_before_awaiting_deliveries(spool: EventSpool, broker: Broker):
+    for i in range(20):
+        spool.append(events=[('account_create', f'{i}'.encode(), 'johndoe@example.com', None)])
+
+    assert await replay_window(records=spool.peek_many(limit=20))
+
+    assert broker.max_in_flight == 20
+    assert broker.delivered == [f'{i}'.encode() for i in range(20)]
+    assert not spool.pending
+
+
+@pytest.mark.anyio
+async def test_replay_keeps_records_after_a_transient_failure(spool: EventSpool, broker: Broker):
+    broker.connected = False
+    spool.append(events=[('account_create', b'0', 'johndoe@example.com', None)])
+
+    assert not await replay_window(records=spool.peek_many(limit=10))
+    assert spool.pending_records == 1
+    assert spool.metrics()['dead_letter_records'] == 0
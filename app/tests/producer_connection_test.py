@@ -0,0 +1,206 @@
+import asyncio
+import pytest
+from aiokafka.errors import KafkaConnectionError, MessageSizeTooLargeError
+from contextlib import asynccontextmanager
+from core.connection import producer_connection
+from core.connection.producer_connection import transactional_producer
+from core.event import produce_event
+from core.event.event_spool import EventSpool
+from core.utils.settings import settings
+
+
+@pytest.fixture(scope="session")
+def anyio_backend() -> str:
+    return 'asyncio'
+
+
+class StubProducer:
+    # Records what the service does with an AIOKafkaProducer
+    instances: list['StubProducer'] = []
+    start_errors: list[BaseException] = []
+
+    def __init__(self, **config):
+        self.config = config
+        self.started = False
+        self.stopped = False
+        self.flushed = False
+        self.sent = []
+        self.transactions = []
+        self.error: BaseException | None = None
+        self.blocked: asyncio.Event | None = None
+        StubProducer.instances.append(self)
+
+    async def start(self) -> None:
+        if StubProducer.start_errors:
+            raise StubProducer.start_errors.pop(0)
+        self.started = True
+
+    async def stop(self) -> None:
+        self.stopped = True
+
+    async def flush(self) -> None:
+        self.flushed = True
+
+    async def send(self, topic: str, value, key: bytes | None = None, headers: tuple | None = None) -> asyncio.Future:
+        if self.blocked is not None:
+            await self.blocked.wait()
+        if self.error is not None:
+            raise self.error
+
+        self.sent.append((topic, value))
+        delivery = asyncio.get_running_loop().create_future()
+        delivery.set_result(None)
+        return delivery
+
+    @asynccontextmanager
+    async def transaction(self):
+        # Like aiokafka, any exception leaving the block aborts the transaction
+        try:
+            yield
+        except BaseException:
+            self.transactions.append('abort')
+            raise
+        self.transactions.append('commit')
+
+
+@pytest.fixture
+def stub_producer(monkeypatch) -> type[StubProducer]:
+    StubProducer.instances = []
+    StubProducer.start_errors = []
+    monkeypatch.setattr(producer_connection, 'AIOKafkaProducer', StubProducer)
+    monkeypatch.setattr(producer_connection, 'producers', {})
+    monkeypatch.setattr(producer_connection, '_producer_lock', asyncio.Lock())
+    monkeypatch.setattr(producer_connection, 'transactional_producers', None)
+    monkeypatch.setattr(settings, 'api_event_transactional_producers', 1)
+
+    async def ensure_topic(topic: str) -> None:
+        return None
+
+    monkeypatch.setattr(produce_event, 'ensure_topic', ensure_topic)
+    return StubProducer
+
+
+@pytest.fixture
+def codecs(monkeypatch):
+    monkeypatch.setattr(settings, 'api_event_compression_type', 'lz4')
+    monkeypatch.setattr(settings, 'api_event_topic_compression', {'account_otp': 'none', 'account_update': 'gzip'})
+
+
+@pytest.mark.anyio
+async def test_lifespan_starts_and_stops_one_producer_per_codec(stub_producer, codecs):
+    await producer_connection.start_producer()
+
+    producers = dict(producer_connection.producers)
+    assert set(producers) == {'lz4', None, 'gzip'}
+    assert all(producer.started for producer in producers.values())
+    assert {producer.config['compression_type'] for producer in producers.values()} == {'lz4', None, 'gzip'}
+
+    await producer_connection.stop_producer()
+
+    # Pending batches are delivered before closing
+    assert producer_connection.producers == {}
+    assert all(producer.flushed and producer.stopped for producer in producers.values())
+
+
+@pytest.mark.anyio
+async def test_topics_share_the_producer_of_their_codec(stub_producer, codecs):
+    await producer_connection.start_producer()
+
+    assert await producer_connection.get_producer(topic='account_otp') is producer_connection.producers[None]
+    assert await producer_connection.get_producer(topic='account_update') is producer_connection.producers['gzip']
+    assert await producer_connection.get_producer(topic='account_create') is producer_connection.producers['lz4']
+    assert len(stub_producer.instances) == 3
+
+
+@pytest.mark.anyio
+async def test_batching_settings_reach_the_producer(stub_producer, monkeypatch):
+    monkeypatch.setattr(settings, 'api_event_linger_ms', 20)
+    monkeypatch.setattr(settings, 'api_event_max_batch_size', 131072)
+    monkeypatch.setattr(settings, 'api_event_request_timeout_ms', 3000)
+
+    producer = await producer_connection.get_producer(topic='account_create')
+
+    assert producer.config['linger_ms'] == 20
+    assert producer.config['max_batch_size'] == 131072
+    assert producer.config['request_timeout_ms'] == 3000
+    assert producer.config['enable_idempotence'] == settings.api_event_enable_idempotence
+
+
+@pytest.mark.anyio
+async def test_failed_start_is_retried_on_first_send(stub_producer):
+    stub_producer.start_errors = [KafkaConnectionError()]
+
+    # The lifespan hook logs the failure, events are spooled until a producer starts
+    await producer_connection.start_producer()
+    assert producer_connection.producers == {}
+
+    producer = await producer_connection.get_producer(topic='account_create')
+    assert producer.started
+    assert stub_producer.instances[0].stopped
+
+
+EVENTS = [('account_otp', b'1', 'johndoe@example.com', None), ('account_update', b'2', 'johndoe@example.com', None)]
+
+
+@pytest.mark.anyio
+async def test_transaction_commits_and_returns_the_producer(stub_producer):
+    await produce_event.send_events(events=EVENTS)
+    await produce_event.send_events(events=EVENTS)
+
+    # One producer serves both transactions
+    [producer] = stub_producer.instances
+    assert producer.transactions == ['commit', 'commit']
+    assert producer.sent == [('account_otp', b'1'), ('account_update', b'2')] * 2
+    assert not producer.stopped
+
+
+@pytest.mark.anyio
+async def test_failed_transaction_aborts_and_drops_the_producer(stub_producer):
+    async with transactional_producer() as producer:
+        producer.error = MessageSizeTooLargeError()
+
+    with pytest.raises(MessageSizeTooLargeError):
+        await produce_event.send_events(events=EVENTS)
+
+    assert producer.transactions == ['abort']
+    assert producer.stopped
+
+    # The slot gets a fresh producer
+    async with transactional_producer() as replacement:
+        assert replacement is not producer
+
+
+@pytest.mark.anyio
+async def test_cancelled_transaction_drops_the_producer(stub_producer):
+    async with transactional_producer() as producer:
+        producer.blocked = asyncio.Event()
+
+    send = asyncio.create_task(produce_event.send_events(events=EVENTS))
+    await asyncio.sleep(0)
+    send.cancel()
+
+    with pytest.raises(asyncio.CancelledError):
+        await send
+
+    # No producer with an open transaction goes back to the pool
+    assert producer.transactions == ['abort']
+    assert producer.stopped
+    assert producer_connection.transactional_producers.get_nowait() == (0, None)
+
+
+@pytest.mark.anyio
+async def test_unavailable_broker_spools_the_group(stub_producer, tmp_path, monkeypatch):
+    spool = EventSpool(directory=str(tmp_path), segment_bytes=64 * 1024, max_segments=4)
+    spool.open()
+    monkeypatch.setattr(produce_event, 'event_spool', spool)
+
+    async with transactional_producer() as producer:
+        producer.error = KafkaConnectionError()
+
+    await produce_event.produce_events(events=[produce_event.EventOut(topic=topic, value=value, key=key) for topic, value, key, _ in EVENTS])
+
+    # The group is spooled as one record and replayed in one transaction
+    [(events, _, _)] = spool.peek_many(limit=10)
+    assert len(events) == 2
+    assert producer.transactions == ['abort']
+    spool.close()
@@ -0,0 +1,87 @@
+import httpx
+import json
+import pytest
+from core.helper import schema_helper, schema_registry_helper
+from core.helper.local_schema_registry import LocalSchemaRegistryClient
+from core.helper.schema_registry_helper import PooledSchemaRegistryClient, get_subjects, register_schema, register_schemas
+from core.model.account_model import AccountID, Disable_Enable_Account
+from core.utils.settings import settings
+
+
+@pytest.fixture(scope="session")
+def anyio_backend() -> str:
+    return 'asyncio'
+
+
+@pytest.fixture
+def local_registry(monkeypatch) -> LocalSchemaRegistryClient:
+    registry = LocalSchemaRegistryClient()
+    monkeypatch.setattr(schema_registry_helper, 'registry_client', registry)
+    monkeypatch.setattr(schema_registry_helper, 'schema_ids', {})
+    monkeypatch.setattr(schema_registry_helper, 'subjects_cache', None)
+    monkeypatch.setattr(schema_registry_helper, 'latest_versions', {})
+    return registry
+
+
+@pytest.mark.anyio
+async def test_schema_ids_are_cached(local_registry: LocalSchemaRegistryClient):
+    first_id = await register_schema('account-value', AccountID.avro_schema())
+    second_id = await register_schema('account-value', AccountID.avro_schema())
+
+    assert first_id == second_id
+    assert local_registry.requests == 1
+
+
+@pytest.mark.anyio
+async def test_bulk_registration_is_one_request_per_subject(local_registry: LocalSchemaRegistryClient):
+    schema_ids = await register_schemas({
+        'delete-value': AccountID.avro_schema(),
+        'disable-value': Disable_Enable_Account.avro_schema(),
+    })
+
+    assert set(schema_ids) == {'delete-value', 'disable-value'}
+    assert local_registry.requests == 2
+
+
+@pytest.mark.anyio
+async def test_subjects_are_cached_until_ttl(local_registry: LocalSchemaRegistryClient, monkeypatch):
+    await schema_helper.deploy_schema('account-value', AccountID.avro_schema())
+    await schema_helper.deploy_schema('account-value', AccountID.avro_schema())
+    assert local_registry.requests == 2
+
+    monkeypatch.setattr(settings, 'api_schema_registry_cache_ttl', 0)
+    assert 'account-value' in await get_subjects()
+    assert local_registry.requests == 3
+
+
+@pytest.mark.anyio
+async def test_pooled_client_looks_up_before_registering():
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        if request.url.path == '/subjects/account-value':
+            # Already registered, a read-only registry answers this lookup
+            return httpx.Response(200, json={'subject': 'account-value', 'id': 42, 'version': 1, 'schema': json.dumps(AccountID.avro_schema_to_python())})
+        return httpx.Response(403, json={'error_code': 40301, 'message': 'read-only'})
+
+    client = PooledSchemaRegistryClient(url='http://registry:8081')
+    client._http = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    try:
+        assert await client.register('account-value', json.dumps(AccountID.avro_schema_to_python())) == 42
+        assert await client.register('account-value', json.dumps(AccountID.avro_schema_to_python())) == 42
+    finally:
+        await client.aclose()
+
+    assert [(request.method, request.url.path) for request in requests] == [('POST', '/subjects/account-value')]
+
+
+@pytest.mark.anyio
+async def test_pooled_client_accepts_a_timeout():
+    client = PooledSchemaRegistryClient(url='http://registry:8081', timeout=httpx.Timeout(1.0), pool_limits=httpx.Limits(max_connections=2))
+
+    try:
+        assert client._get_http_client().timeout == httpx.Timeout(1.0)
+    finally:
+        await client.aclose()
@@ -0,0 +1,75 @@
+import asyncio
+import pytest
+from core.helper.single_flight import SingleFlight
+
+
+@pytest.fixture(scope="session")
+def anyio_backend() -> str:
+    return 'asyncio'
+
+
+@pytest.mark.anyio
+async def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    executions = 0
+
+    async def lookup():
+        nonlocal executions
+        executions += 1
+        await asyncio.sleep(0.01)
+        return {'id': '7845941214687'}
+
+    results = await asyncio.gather(*(flight.do('id:7845941214687', lookup) for _ in range(10)))
+
+    assert executions == 1
+    assert all(result == {'id': '7845941214687'} for result in results)
+    assert flight.metrics()['coalescing_ratio'] == 0.9
+    assert flight.metrics()['in_flight'] == 0
+
+
+@pytest.mark.anyio
+async def test_keys_do_not_share_calls():
+    flight = SingleFlight()
+
+    async def lookup(value):
+        await asyncio.sleep(0.01)
+        return value
+
+    results = await asyncio.gather(flight.do('email:a', lambda: lookup('a')), flight.do('email:b', lambda: lookup('b')))
+
+    assert results == ['a', 'b']
+    assert flight.coalesced == 0
+
+
+@pytest.mark.anyio
+async def test_errors_reach_every_caller_and_are_not_cached():
+    flight = SingleFlight()
+
+    async def failing_lookup():
+        await asyncio.sleep(0.01)
+        raise ConnectionError('database unavailable')
+
+    results = await asyncio.gather(*(flight.do('id:1', failing_lookup) for _ in range(3)), return_exceptions=True)
+    assert all(isinstance(result, ConnectionError) for result in results)
+
+    async def lookup():
+        return 'found'
+
+    assert await flight.do('id:1', lookup) == 'found'
+    assert flight.executions == 2
+
+
+@pytest.mark.anyio
+async def test_cancelled_caller_does_not_cancel_others():
+    flight = SingleFlight()
+
+    async def lookup():
+        await asyncio.sleep(0.02)
+        return 'found'
+
+    first = asyncio.ensure_future(flight.do('id:1', lookup))
+    second = asyncio.ensure_future(flight.do('id:1', lookup))
+    await asyncio.sleep(0)
+    first.cancel()
+
+    assert await second == 'found'
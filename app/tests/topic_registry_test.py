@@ -0,0 +1,112 @@
+import asyncio
+import pytest
+from aiokafka.errors import KafkaConnectionError
+from core.event import produce_event
+from core.event.event_spool import EventSpool
+from core.helper import producer_helper
+from core.helper.producer_helper import ensure_topic, provision_topics, settings_topics, topic_exists
+
+
+@pytest.fixture(scope="session")
+def anyio_backend() -> str:
+    return 'asyncio'
+
+
+class StubAdmin:
+    # Cluster topics and the admin requests made, list_topics fails while the cluster is down
+    def __init__(self, topics: set[str]):
+        self.topics = set(topics)
+        self.available = True
+        self.listings = 0
+        self.created = []
+        self.closed = False
+
+    async def start(self) -> None:
+        if not self.available:
+            raise KafkaConnectionError()
+
+    async def close(self) -> None:
+        self.closed = True
+
+    async def list_topics(self) -> list[str]:
+        if not self.available:
+            raise KafkaConnectionError()
+        self.listings += 1
+        return list(self.topics)
+
+    async def create_topics(self, new_topics: list, validate_only: bool = False) -> None:
+        if not self.available:
+            raise KafkaConnectionError()
+        self.created.append(sorted(topic.name for topic in new_topics))
+        self.topics.update(topic.name for topic in new_topics)
+
+
+@pytest.fixture
+def admin(monkeypatch) -> StubAdmin:
+    admin = StubAdmin(topics={'account_otp'})
+    monkeypatch.setattr(producer_helper, 'AIOKafkaAdminClient', lambda **config: admin)
+    monkeypatch.setattr(producer_helper, 'admin_client', None)
+    monkeypatch.setattr(producer_helper, 'known_topics', set())
+    monkeypatch.setattr(producer_helper, 'topics_refreshed_at', 0.0)
+    monkeypatch.setattr(producer_helper, '_registry_lock', asyncio.Lock())
+    return admin
+
+
+@pytest.mark.anyio
+async def test_missing_settings_topics_are_created_in_one_request(admin):
+    await provision_topics()
+
+    assert admin.created == [sorted(settings_topics() - {'account_otp'})]
+    assert settings_topics() <= producer_helper.known_topics
+
+
+@pytest.mark.anyio
+async def test_known_topics_skip_the_cluster(admin):
+    await provision_topics()
+    listings = admin.listings
+
+    for topic in settings_topics():
+        await ensure_topic(topic=topic)
+
+    assert admin.listings == listings
+    assert len(admin.created) == 1
+
+
+@pytest.mark.anyio
+async def test_unknown_topic_is_created_once(admin):
+    await asyncio.gather(*(ensure_topic(topic='account_audit') for _ in range(5)))
+
+    assert admin.created == [['account_audit']]
+    assert admin.listings == 1
+
+
+@pytest.mark.anyio
+async def test_admin_outage_raises_instead_of_creating(admin):
+    admin.available = False
+
+    with pytest.raises(KafkaConnectionError):
+        await topic_exists(topic='account_audit')
+    with pytest.raises(KafkaConnectionError):
+        await ensure_topic(topic='account_audit')
+
+    assert admin.created == []
+    assert producer_helper.admin_client is None
+
+
+@pytest.mark.anyio
+async def test_admin_outage_spools_the_event(admin, tmp_path, monkeypatch):
+    spool = EventSpool(directory=str(tmp_path), segment_bytes=64 * 1024, max_segments=4)
+    spool.open()
+    monkeypatch.setattr(produce_event, 'event_spool', spool)
+
+    async def get_producer(topic: str | None = None):
+        return None
+
+    monkeypatch.setattr(produce_event, 'get_producer', get_producer)
+    admin.available = False
+
+    await produce_event.produce_event(topic='account_audit', value=b'1', key='johndoe@example.com')
+
+    assert spool.pending_records == 1
+    assert admin.created == []
+    spool.close()